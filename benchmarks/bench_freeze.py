@@ -0,0 +1,186 @@
+"""End-to-end benchmarks of freeze() on synthetic sites
+
+Run directly to measure pages per second, peak memory and time per phase
+of handling pages, for WSGI and ASGI apps saved with the `dict` and `dir`
+savers:
+
+    python benchmarks/bench_freeze.py --pages 2000 --fanout 10
+
+Each benchmark runs in a new process, so peak memory is measured
+separately. Run with --help for the options.
+
+The `test_*` functions are for pytest-benchmark
+(benchmarks/pytest.ini makes pytest collect the `bench_*.py` files):
+
+    python -m pytest benchmarks
+"""
+
+import sys
+import time
+import argparse
+import tempfile
+import dataclasses
+import multiprocessing
+import concurrent.futures
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from freezeyt import freeze
+from freezeyt.stats import FreezeStats
+
+import benchutil
+from synthetic_site import SiteShape, make_asgi_app, make_wsgi_app
+
+
+INTERFACES = ('wsgi', 'asgi')
+SAVERS = ('dict', 'dir')
+
+
+def run_case(
+    shape: SiteShape, interface: str, saver: str, output_dir: Optional[str],
+) -> Dict[str, Any]:
+    """Freeze a synthetic site once and return the measurements"""
+    if interface == 'wsgi':
+        app = make_wsgi_app(shape)
+    else:
+        app = make_asgi_app(shape)
+    stats = FreezeStats()
+    config: Dict[str, Any] = {
+        'prefix': 'http://localhost:8000/',
+        'plugins': [stats],
+        'app_interface': interface,
+    }
+    if saver == 'dict':
+        config['output'] = {'type': 'dict'}
+    else:
+        assert output_dir is not None
+        config['output'] = {'type': 'dir', 'dir': output_dir}
+    if shape.redirect_ratio:
+        config['status_handlers'] = {'3xx': 'follow'}
+
+    start = time.perf_counter()
+    freeze(app, config)
+    seconds = time.perf_counter() - start
+
+    summary = stats.as_dict()
+    return {
+        'pages': summary['page_count'],
+        'seconds': seconds,
+        'rate': summary['page_count'] / seconds,
+        'rate_unit': 'pages/s',
+        'peak_rss': benchutil.peak_rss(),
+        'phase_totals': summary['phase_totals'],
+    }
+
+
+def run_case_in_process(
+    shape: SiteShape, interface: str, saver: str,
+) -> Dict[str, Any]:
+    """Run `run_case` in a new process, so its peak memory is measured"""
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as tmp:
+        with concurrent.futures.ProcessPoolExecutor(
+            1, mp_context=context,
+        ) as executor:
+            future = executor.submit(
+                run_case, shape, interface, saver, str(Path(tmp) / 'output'),
+            )
+            return future.result()
+
+
+def format_result(name: str, result: Dict[str, Any]) -> str:
+    lines = [
+        f'{name}: {result["pages"]} pages in {result["seconds"]:.2f} s, '
+        + f'{result["rate"]:.1f} pages/s'
+    ]
+    if result['peak_rss'] is not None:
+        lines[0] += f', peak RSS {result["peak_rss"] / 2**20:.0f} MiB'
+    lines.append('    ' + ', '.join(
+        f'{phase} {seconds:.2f} s'
+        for phase, seconds in result['phase_totals'].items()
+    ))
+    return '\n'.join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    defaults = SiteShape()
+    for field in dataclasses.fields(SiteShape):
+        parser.add_argument(
+            '--' + field.name.replace('_', '-'),
+            type=field.type,
+            default=getattr(defaults, field.name),
+            help=f'(default: {getattr(defaults, field.name)})',
+        )
+    parser.add_argument(
+        '--interface', choices=INTERFACES, action='append',
+        help='App interface to benchmark (may be repeated; default: all)',
+    )
+    parser.add_argument(
+        '--saver', choices=SAVERS, action='append',
+        help='Saver to benchmark (may be repeated; default: all)',
+    )
+    parser.add_argument(
+        '--repeat', type=int, default=3,
+        help='Number of runs of each benchmark; the fastest is reported '
+            + '(default: 3)',
+    )
+    benchutil.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    shape = SiteShape(**{
+        field.name: getattr(args, field.name)
+        for field in dataclasses.fields(SiteShape)
+    })
+    results: benchutil.Results = {}
+    for interface in args.interface or INTERFACES:
+        for saver in args.saver or SAVERS:
+            name = f'freeze[{interface}-{saver}]'
+            runs = [
+                run_case_in_process(shape, interface, saver)
+                for i in range(args.repeat)
+            ]
+            result = max(runs, key=lambda r: r['rate'])
+            result['shape'] = dataclasses.asdict(shape)
+            results[name] = result
+            print(format_result(name, result))
+    return benchutil.finish(results, args)
+
+
+# pytest-benchmark
+
+BENCHMARK_SHAPE = SiteShape(pages=300, redirect_ratio=0.05)
+
+
+def _benchmark(benchmark, tmp_path, interface, saver):
+    counter = iter(range(1_000_000))
+
+    def run():
+        return run_case(
+            BENCHMARK_SHAPE, interface, saver,
+            str(tmp_path / f'output{next(counter)}'),
+        )
+
+    result = benchmark.pedantic(run, rounds=3)
+    benchmark.extra_info.update(result)
+    assert result['pages'] > BENCHMARK_SHAPE.pages
+
+
+def test_freeze_wsgi_dict(benchmark, tmp_path):
+    _benchmark(benchmark, tmp_path, 'wsgi', 'dict')
+
+
+def test_freeze_wsgi_dir(benchmark, tmp_path):
+    _benchmark(benchmark, tmp_path, 'wsgi', 'dir')
+
+
+def test_freeze_asgi_dict(benchmark, tmp_path):
+    _benchmark(benchmark, tmp_path, 'asgi', 'dict')
+
+
+def test_freeze_asgi_dir(benchmark, tmp_path):
+    _benchmark(benchmark, tmp_path, 'asgi', 'dir')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,229 @@
+"""Micro-benchmarks of the URL finders
+
+Run directly to measure how fast each finder processes a corpus of
+documents, in MB/s and links/s:
+
+    python benchmarks/bench_url_finders.py
+
+The `_async` finders run in a pool of worker processes; their results
+include the overhead of sending pages to the workers, and the time of
+the first run (which starts the pool) is reported separately.
+Run with --help for the options.
+
+The `test_*` functions are for pytest-benchmark
+(benchmarks/pytest.ini makes pytest collect the `bench_*.py` files):
+
+    python -m pytest benchmarks
+"""
+
+import io
+import sys
+import time
+import asyncio
+import argparse
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from freezeyt import url_finders
+from freezeyt.finder_pool import FinderPool, current_finder_pool
+
+import benchutil
+from finder_corpus import Corpus, all_corpora
+
+
+BASE_URL = 'http://localhost:8000/section/page.html'
+
+# Finders to benchmark, by the kind of document they handle
+FINDERS = {
+    'html': [
+        'get_html_links', 'get_html_links_fast', 'get_html_links_fast.stream',
+        'get_html_links_async',
+    ],
+    'css': ['get_css_links', 'get_css_links_async'],
+}
+
+# Size of chunks fed to streaming finders
+STREAM_CHUNK_SIZE = 16 * 1024
+
+
+def _find_sync(finder: Callable, corpus: Corpus) -> int:
+    link_count = 0
+    for document in corpus.documents:
+        with io.BytesIO(document) as f:
+            link_count += len(list(finder(f, BASE_URL, corpus.headers)))
+    return link_count
+
+
+def _find_streaming(finder: Callable, corpus: Corpus) -> int:
+    link_count = 0
+    for document in corpus.documents:
+        parser = finder.stream(BASE_URL, corpus.headers)  # type: ignore
+        for start in range(0, len(document), STREAM_CHUNK_SIZE):
+            chunk = document[start:start + STREAM_CHUNK_SIZE]
+            link_count += len(list(parser.feed(chunk)))
+        link_count += len(list(parser.close()))
+    return link_count
+
+
+async def _find_async(finder: Callable, corpus: Corpus) -> int:
+    async def find(document: bytes) -> int:
+        with io.BytesIO(document) as f:
+            links = await finder(f, BASE_URL, corpus.headers)
+            return len(list(links))
+
+    # Process all documents concurrently, as the freezer would
+    counts = await asyncio.gather(*(
+        find(document) for document in corpus.documents
+    ))
+    return sum(counts)
+
+
+def make_runner(
+    finder_name: str, corpus: Corpus, pool: Optional[FinderPool] = None,
+) -> Callable[[], int]:
+    """Return a function that runs a finder on a corpus
+
+    The function returns the number of links found.
+    Async finders need a `pool`.
+    """
+    name, dot, mode = finder_name.partition('.')
+    finder = getattr(url_finders, name)
+    if mode == 'stream':
+        return lambda: _find_streaming(finder, corpus)
+    if not name.endswith('_async'):
+        return lambda: _find_sync(finder, corpus)
+    assert pool is not None
+
+    def run() -> int:
+        async def run_with_pool() -> int:
+            token = current_finder_pool.set(pool)
+            try:
+                return await _find_async(finder, corpus)
+            finally:
+                current_finder_pool.reset(token)
+        return asyncio.run(run_with_pool())
+
+    return run
+
+
+def get_cases(
+    corpora: List[Corpus], finder_names: Optional[List[str]] = None,
+) -> List[Tuple[str, Corpus]]:
+    return [
+        (finder_name, corpus)
+        for corpus in corpora
+        for finder_name in FINDERS[corpus.kind]
+        if finder_names is None or finder_name in finder_names
+    ]
+
+
+def run_case(
+    finder_name: str, corpus: Corpus, repeat: int, workers: Optional[int],
+) -> Dict[str, Any]:
+    """Benchmark a finder on a corpus; return the fastest of `repeat` runs"""
+    pool = None
+    if finder_name.endswith('_async'):
+        pool = FinderPool(workers)
+    try:
+        run = make_runner(finder_name, corpus, pool)
+        start = time.perf_counter()
+        link_count = run()
+        first_seconds = time.perf_counter() - start
+        times = []
+        for i in range(repeat):
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    seconds = min(times)
+    result = {
+        'documents': len(corpus.documents),
+        'bytes': corpus.size,
+        'links': link_count,
+        'seconds': seconds,
+        'rate': corpus.size / seconds / 1e6,
+        'rate_unit': 'MB/s',
+        'links_per_second': link_count / seconds,
+    }
+    if pool is not None:
+        result['first_run_seconds'] = first_seconds
+    return result
+
+
+def format_result(name: str, result: Dict[str, Any]) -> str:
+    line = (
+        f'{name:50} {result["rate"]:8.2f} MB/s '
+        + f'{result["links_per_second"]:12,.0f} links/s'
+    )
+    if 'first_run_seconds' in result:
+        line += f'  (first run: {result["first_run_seconds"]:.3f} s)'
+    return line
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument(
+        '--finder', action='append',
+        choices=[name for names in FINDERS.values() for name in names],
+        help='Finder to benchmark (may be repeated; default: all)',
+    )
+    parser.add_argument(
+        '--corpus', action='append',
+        choices=[corpus.name for corpus in all_corpora()],
+        help='Corpus to use (may be repeated; default: all)',
+    )
+    parser.add_argument(
+        '--repeat', type=int, default=5,
+        help='Number of runs; the fastest is reported (default: 5)',
+    )
+    parser.add_argument(
+        '--workers', type=int,
+        help='Number of worker processes for async finders '
+            + '(default: number of CPUs)',
+    )
+    benchutil.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    corpora = [
+        corpus for corpus in all_corpora()
+        if args.corpus is None or corpus.name in args.corpus
+    ]
+    results: benchutil.Results = {}
+    for finder_name, corpus in get_cases(corpora, args.finder):
+        name = f'{finder_name}[{corpus.name}]'
+        results[name] = run_case(finder_name, corpus, args.repeat, args.workers)
+        print(format_result(name, results[name]))
+    return benchutil.finish(results, args)
+
+
+# pytest-benchmark
+
+def pytest_generate_tests(metafunc):
+    if 'finder_case' in metafunc.fixturenames:
+        cases = get_cases(all_corpora())
+        metafunc.parametrize(
+            'finder_case', cases,
+            ids=[f'{finder_name}-{corpus.name}' for finder_name, corpus in cases],
+        )
+
+
+def test_url_finder(benchmark, finder_case):
+    finder_name, corpus = finder_case
+    pool = None
+    if finder_name.endswith('_async'):
+        pool = FinderPool()
+    try:
+        run = make_runner(finder_name, corpus, pool)
+        # Start the pool (if any) before measuring
+        expected_links = run()
+        benchmark.extra_info['bytes'] = corpus.size
+        benchmark.extra_info['links'] = expected_links
+        assert benchmark(run) == expected_links
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""Helpers shared by the benchmark scripts
+
+Each benchmark produces a dict of results with at least a `rate`
+(higher is better, in units given by `rate_unit`).
+Results can be saved to a JSON file and later used as a baseline:
+`compare` reports benchmarks whose rate got worse by more than
+a given fraction.
+"""
+
+import sys
+import json
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:
+    # Windows
+    resource = None  # type: ignore[assignment]
+
+
+Results = Dict[str, Dict[str, Any]]
+
+# Default allowed slowdown compared to the baseline
+DEFAULT_MAX_SLOWDOWN = 0.2
+
+
+def peak_rss() -> Optional[int]:
+    """Return the peak memory usage of this process, in bytes"""
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return maxrss
+    # Linux and others report kilobytes
+    return maxrss * 1024
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add options for saving results and comparing to a baseline"""
+    parser.add_argument(
+        '--json', type=Path, metavar='FILE',
+        help='Save results to a JSON file (usable as --baseline)',
+    )
+    parser.add_argument(
+        '--baseline', type=Path, metavar='FILE',
+        help='Compare results to a previously saved JSON file, and fail '
+            + 'if any benchmark got slower than allowed',
+    )
+    parser.add_argument(
+        '--max-slowdown', type=float, default=DEFAULT_MAX_SLOWDOWN,
+        help='Allowed slowdown compared to the baseline, as a fraction '
+            + f'(default: {DEFAULT_MAX_SLOWDOWN})',
+    )
+
+
+def compare(
+    results: Results, baseline: Results, max_slowdown: float,
+) -> List[str]:
+    """Return descriptions of benchmarks that got slower than allowed"""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        old_rate = baseline[name]['rate']
+        new_rate = result['rate']
+        if new_rate < old_rate * (1 - max_slowdown):
+            regressions.append(
+                f'{name}: {new_rate:.1f} {result["rate_unit"]} '
+                + f'(baseline: {old_rate:.1f}, '
+                + f'{1 - new_rate / old_rate:.0%} slower)'
+            )
+    return regressions
+
+
+def finish(results: Results, args: argparse.Namespace) -> int:
+    """Save results and compare them to the baseline, as requested
+
+    Returns the exit code for the benchmark script.
+    """
+    if args.json is not None:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.max_slowdown)
+        if regressions:
+            print('Benchmarks slower than the baseline:', file=sys.stderr)
+            for regression in regressions:
+                print(f'  {regression}', file=sys.stderr)
+            return 1
+        print('No regressions against the baseline.', file=sys.stderr)
+    return 0
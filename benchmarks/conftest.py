@@ -0,0 +1,9 @@
+import importlib.util
+
+import pytest
+
+
+if importlib.util.find_spec('pytest_benchmark') is None:
+    @pytest.fixture
+    def benchmark():
+        pytest.skip('pytest-benchmark is not installed')
@@ -0,0 +1,146 @@
+"""Documents for benchmarking URL finders
+
+The documents are generated, so they don't need to be stored in the
+repository, but they are modelled on real pages: large HTML with
+thousands of links, many small pages, minified CSS with many `url()`s,
+and pages in legacy (non-UTF-8) encodings.
+"""
+
+import dataclasses
+import random
+from typing import List, Optional, Tuple
+
+
+Headers = Optional[List[Tuple[str, str]]]
+
+
+@dataclasses.dataclass
+class Corpus:
+    name: str
+    # 'html' or 'css'
+    kind: str
+    documents: List[bytes]
+    headers: Headers = None
+
+    @property
+    def size(self) -> int:
+        return sum(len(document) for document in self.documents)
+
+
+WORDS = (
+    'freeze static site page link image style script archive about '
+    + 'contact blog post tag category author feed index news article'
+).split()
+
+
+def _path(rng: random.Random) -> str:
+    depth = rng.randrange(1, 4)
+    parts = [rng.choice(WORDS) for _ in range(depth)]
+    return '/' + '/'.join(parts) + f'-{rng.randrange(10_000)}.html'
+
+
+def _html_body(rng: random.Random, links: int, text: str = '') -> str:
+    parts = []
+    for i in range(links):
+        kind = rng.random()
+        if kind < 0.7:
+            parts.append(
+                f'<li><a href="{_path(rng)}" class="nav">{rng.choice(WORDS)}'
+                + f' {text}</a></li>'
+            )
+        elif kind < 0.9:
+            src = f'/images/{rng.choice(WORDS)}-{i}'
+            parts.append(
+                f'<img src="{src}.png" srcset="{src}@2x.png 2x" alt="{text}">'
+            )
+        else:
+            parts.append(f'<script src="/js/{rng.choice(WORDS)}-{i}.js"></script>')
+        if i % 10 == 0:
+            parts.append(f'<p>{" ".join(rng.choices(WORDS, k=30))} {text}</p>')
+    return '\n'.join(parts)
+
+
+def _html_page(
+    rng: random.Random, links: int, text: str = '', meta: str = '',
+) -> str:
+    return (
+        '<!DOCTYPE html>\n<html><head>' + meta
+        + '<title>Benchmark</title>'
+        + '<link rel="stylesheet" href="/static/style.css">'
+        + '</head><body><ul>'
+        + _html_body(rng, links, text)
+        + '</ul></body></html>'
+    )
+
+
+def large_html(seed: int = 0) -> Corpus:
+    """One large page (about 1 MB) with 5000 links"""
+    rng = random.Random(seed)
+    page = _html_page(rng, 5000, meta='<meta charset="utf-8">')
+    return Corpus('large_html', 'html', [page.encode('utf-8')])
+
+
+def small_html(seed: int = 0) -> Corpus:
+    """200 small pages (about 5 kB) with 20 links each"""
+    rng = random.Random(seed)
+    pages = [
+        _html_page(rng, 20, meta='<meta charset="utf-8">').encode('utf-8')
+        for _ in range(200)
+    ]
+    return Corpus('small_html', 'html', pages)
+
+
+def windows_1250_html(seed: int = 0) -> Corpus:
+    """Czech pages encoded in windows-1250, declared in a <meta> tag"""
+    rng = random.Random(seed)
+    text = 'Příliš žluťoučký kůň úpěl ďábelské ódy'
+    pages = [
+        _html_page(
+            rng, 200, text,
+            meta='<meta http-equiv="Content-Type" '
+                + 'content="text/html; charset=windows-1250">',
+        ).encode('windows-1250')
+        for _ in range(20)
+    ]
+    return Corpus('windows_1250_html', 'html', pages)
+
+
+def shift_jis_html(seed: int = 0) -> Corpus:
+    """Japanese pages encoded in Shift JIS, declared in HTTP headers"""
+    rng = random.Random(seed)
+    text = '静的なウェブサイトを生成する'
+    pages = [
+        _html_page(rng, 200, text).encode('shift_jis')
+        for _ in range(20)
+    ]
+    return Corpus(
+        'shift_jis_html', 'html', pages,
+        headers=[('Content-Type', 'text/html; charset=Shift_JIS')],
+    )
+
+
+def minified_css(seed: int = 0) -> Corpus:
+    """Minified stylesheet (on one line) with 3000 url()s"""
+    rng = random.Random(seed)
+    rules = []
+    for i in range(3000):
+        selector = f'.{rng.choice(WORDS)}-{i}'
+        if i % 3 == 0:
+            url = f'url("/images/{rng.choice(WORDS)}-{i}.png")'
+        elif i % 3 == 1:
+            url = f"url('../fonts/{rng.choice(WORDS)}-{i}.woff2')"
+        else:
+            url = f'url(/icons/{rng.choice(WORDS)}-{i}.svg)'
+        rules.append(
+            f'{selector}{{background:{url} no-repeat;margin:{i % 17}px;'
+            + f'color:#{rng.randrange(16**6):06x}}}'
+        )
+    imports = '@import url("/static/base.css");@import "/static/print.css";'
+    return Corpus('minified_css', 'css', [(imports + ''.join(rules)).encode()])
+
+
+def all_corpora() -> List[Corpus]:
+    return [
+        large_html(), small_html(), windows_1250_html(), shift_jis_html(),
+        minified_css(),
+    ]
@@ -0,0 +1,159 @@
+"""Synthetic web apps of configurable shape, for benchmarking freezeyt
+
+The site is a tree of HTML pages: the page number `n` links to pages
+`n*fanout + 1` to `n*fanout + fanout`, so all pages are reachable from
+the homepage. Some pages link to stylesheets, which in turn link to
+binary assets (images); some links go through redirects.
+"""
+
+import dataclasses
+import random
+from typing import Dict, List, Tuple
+
+
+LOREM = (
+    b'Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do '
+    + b'eiusmod tempor incididunt ut labore et dolore magna aliqua. '
+)
+
+
+@dataclasses.dataclass(frozen=True)
+class SiteShape:
+    # Number of HTML pages
+    pages: int = 1000
+    # Number of links from each page to other pages
+    fanout: int = 5
+    # Approximate size of each HTML page, in bytes
+    page_size: int = 10_000
+    # Fraction of pages that link to a stylesheet
+    css_ratio: float = 0.5
+    # Number of assets (like images), as a fraction of the number of pages
+    asset_ratio: float = 0.2
+    # Size of each asset, in bytes
+    asset_size: int = 20_000
+    # Fraction of links between pages that go through a redirect
+    redirect_ratio: float = 0.0
+    # Seed for choosing which pages have stylesheets, redirects etc.
+    seed: int = 0
+
+    @property
+    def stylesheets(self) -> int:
+        return max(1, self.pages // 50)
+
+    @property
+    def assets(self) -> int:
+        return int(self.pages * self.asset_ratio)
+
+
+Response = Tuple[str, str, List[Tuple[str, str]], bytes]
+
+
+def build_site(shape: SiteShape) -> Dict[str, Response]:
+    """Return the responses of a synthetic site, by URL path
+
+    Values are (status, content type, extra headers, body).
+    """
+    rng = random.Random(shape.seed)
+    site: Dict[str, Response] = {}
+
+    asset_body = bytes(rng.getrandbits(8) for _ in range(256))
+    asset_body = (asset_body * (shape.asset_size // 256 + 1))[:shape.asset_size]
+    for i in range(shape.assets):
+        site[f'/assets/{i}.png'] = ('200 OK', 'image/png', [], asset_body)
+
+    for i in range(shape.stylesheets):
+        rules = []
+        for j in range(20):
+            rules.append(f'.c{j} {{ color: #{j:06x}; margin: {j}px; }}')
+        if shape.assets:
+            for j in range(5):
+                asset = rng.randrange(shape.assets)
+                rules.append(
+                    f'.bg{j} {{ background: url("../assets/{asset}.png"); }}'
+                )
+        site[f'/static/style{i}.css'] = (
+            '200 OK', 'text/css', [], '\n'.join(rules).encode(),
+        )
+
+    for n in range(shape.pages):
+        links = []
+        for child in range(n * shape.fanout + 1, n * shape.fanout + shape.fanout + 1):
+            if child >= shape.pages:
+                break
+            if rng.random() < shape.redirect_ratio:
+                links.append(f'/redirect/{child}.html')
+                site[f'/redirect/{child}.html'] = (
+                    '301 Moved Permanently', 'text/html',
+                    [('Location', page_path(child))], b'',
+                )
+            else:
+                links.append(page_path(child))
+        head = [b'<title>Page %d</title>' % n]
+        if rng.random() < shape.css_ratio:
+            stylesheet = rng.randrange(shape.stylesheets)
+            head.append(
+                b'<link rel="stylesheet" href="/static/style%d.css">'
+                % stylesheet
+            )
+        body = [b'<h1>Page %d</h1>' % n]
+        for link in links:
+            body.append(b'<p><a href="%s">%s</a></p>' % (link.encode(), link.encode()))
+        if shape.assets:
+            asset = rng.randrange(shape.assets)
+            body.append(b'<img src="/assets/%d.png" alt="">' % asset)
+        start = b'<!DOCTYPE html><html><head>' + b''.join(head) + b'</head><body>'
+        end = b'</body></html>'
+        size = len(start) + sum(len(b) for b in body) + len(end)
+        if size < shape.page_size:
+            padding = (LOREM * (shape.page_size // len(LOREM) + 1))
+            body.append(b'<p>' + padding[:shape.page_size - size - 7] + b'</p>')
+        site[page_path(n)] = (
+            '200 OK', 'text/html; charset=utf-8', [],
+            start + b''.join(body) + end,
+        )
+    return site
+
+
+def page_path(n: int) -> str:
+    if n == 0:
+        return '/'
+    return f'/page/{n}.html'
+
+
+def make_wsgi_app(shape: SiteShape):
+    """Return a WSGI app that serves a synthetic site"""
+    site = build_site(shape)
+
+    def app(environ, start_response):
+        status, content_type, headers, body = site[environ['PATH_INFO']]
+        start_response(status, [('Content-Type', content_type), *headers])
+        return [body]
+
+    return app
+
+
+def make_asgi_app(shape: SiteShape):
+    """Return an ASGI app that serves a synthetic site"""
+    site = {
+        path: (
+            int(status.split()[0]),
+            [
+                (b'content-type', content_type.encode()),
+                *((k.lower().encode(), v.encode()) for k, v in headers),
+            ],
+            body,
+        )
+        for path, (status, content_type, headers, body)
+        in build_site(shape).items()
+    }
+
+    async def app(scope, receive, send):
+        status, headers, body = site[scope['path']]
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': headers,
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    return app
@@ -43,7 +43,8 @@ def follow(task: TaskInfo) -> str:
 
     target_task = task._freezer.add_task(
         location,
-        reason=f'target of redirect from: {task._task.path}',
+        reason='target of redirect from',
+        source=task._task,
     )
 
     task._task.redirects_to = target_task
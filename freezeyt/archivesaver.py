@@ -0,0 +1,253 @@
+import io
+import os
+import time
+import shutil
+import asyncio
+import tarfile
+import zipfile
+import tempfile
+from pathlib import Path, PurePosixPath
+from typing import Any, BinaryIO, Dict, IO, List, Optional
+
+from .saver import Saver, SaverContent, iterate_content
+
+
+# Compression methods for ZIP archives
+ZIP_COMPRESSION = {
+    'stored': zipfile.ZIP_STORED,
+    'deflated': zipfile.ZIP_DEFLATED,
+    'bzip2': zipfile.ZIP_BZIP2,
+    'lzma': zipfile.ZIP_LZMA,
+}
+
+# Compression methods for tar archives
+TAR_COMPRESSION = (None, 'gz', 'bz2', 'xz', 'zst')
+
+# Page content smaller than this is held in memory before being added
+# to the archive; larger content goes to a temporary file.
+SPOOL_SIZE = 1024 * 1024
+
+
+class ArchiveSaver(Saver):
+    """Outputs frozen pages into a ZIP or tar archive.
+
+    archive_path - Filesystem path of the archive
+    archive_format - 'zip' or 'tar'
+    compression - For ZIP: 'stored', 'deflated' (default), 'bzip2' or 'lzma'.
+        For tar: None (default), 'gz', 'bz2', 'xz' or 'zst'.
+
+    The archive is written under a temporary name and renamed when
+    the freeze is finished.
+    Pages are added to the archive one at a time, as soon as their content
+    is complete.
+    A compressed tar archive can't be read while it's being written,
+    so an uncompressed copy of the pages is kept in a temporary file
+    for `open_filename`.
+    """
+    def __init__(
+        self,
+        archive_path: Path,
+        archive_format: str,
+        compression: Optional[str] = None,
+    ):
+        self.archive_path = archive_path.resolve()
+        self.tmp_path = self.archive_path.with_name(
+            f'.{self.archive_path.name}.freezeyt-tmp'
+        )
+        self.archive_format = archive_format
+        if archive_format == 'zip':
+            if compression is None:
+                compression = 'deflated'
+            if compression not in ZIP_COMPRESSION:
+                raise ValueError(
+                    f'unknown zip compression {compression!r}; use one of '
+                    + ', '.join(ZIP_COMPRESSION)
+                )
+        elif archive_format == 'tar':
+            if compression not in TAR_COMPRESSION:
+                raise ValueError(
+                    f'unknown tar compression {compression!r}; use one of '
+                    + ', '.join(str(c) for c in TAR_COMPRESSION)
+                )
+        else:
+            raise ValueError(f'unknown archive format {archive_format!r}')
+        self.compression = compression
+
+        self._zipfile: Optional[zipfile.ZipFile] = None
+        self._tarfile: Optional[tarfile.TarFile] = None
+        # Files that need closing after the tarfile, if it doesn't own them
+        self._tar_fileobjs: List[BinaryIO] = []
+        # Saved tar members, for reading back their content
+        self._tar_members: Dict[PurePosixPath, tarfile.TarInfo] = {}
+        # For compressed tar: uncompressed copy of the members' content.
+        # The members' offset_data points into this file.
+        self._tar_store: Optional[IO[bytes]] = None
+        # Only one page is added to the archive at a time
+        self._lock = asyncio.Lock()
+
+    async def prepare(self) -> None:
+        if self.archive_path.is_dir():
+            raise IsADirectoryError(
+                f'Cannot write archive to {self.archive_path}: '
+                + 'it is a directory'
+            )
+        self.archive_path.parent.mkdir(parents=True, exist_ok=True)
+        if self.archive_format == 'zip':
+            assert self.compression is not None
+            self._zipfile = zipfile.ZipFile(
+                self.tmp_path, 'w',
+                compression=ZIP_COMPRESSION[self.compression],
+            )
+        else:
+            self._tarfile = self._open_tarfile()
+            if self.compression is not None:
+                self._tar_store = tempfile.TemporaryFile()
+
+    def _open_tarfile(self) -> tarfile.TarFile:
+        if self.compression is None:
+            raw_file = open(self.tmp_path, 'wb')
+            self._tar_fileobjs = [raw_file]
+            return tarfile.open(fileobj=raw_file, mode='w')
+        if self.compression == 'zst' and 'zst' not in tarfile.TarFile.OPEN_METH:
+            # Python < 3.14 can't compress tar with zstd
+            try:
+                import zstandard
+            except ImportError:
+                raise ValueError(
+                    'tar compression "zst" needs Python 3.14 or the '
+                    + '"zstandard" package'
+                )
+            raw_file = open(self.tmp_path, 'wb')
+            writer = zstandard.ZstdCompressor().stream_writer(raw_file)
+            self._tar_fileobjs = [writer, raw_file]
+            return tarfile.open(fileobj=writer, mode='w|')
+        mode: Any = f'w:{self.compression}'
+        return tarfile.open(self.tmp_path, mode)
+
+    async def save_to_filename(
+        self,
+        filename: PurePosixPath,
+        content_iterable: SaverContent,
+    ) -> None:
+        # Entries can't be written to an archive concurrently.
+        # Collect the content first, so other pages can be added while
+        # this one is being generated.
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE) as spool:
+            async for chunk in iterate_content(content_iterable):
+                spool.write(chunk)
+            spool.seek(0)
+            loop = asyncio.get_running_loop()
+            async with self._lock:
+                await loop.run_in_executor(
+                    None, self._add_entry, filename, spool,
+                )
+
+    def _add_entry(self, filename: PurePosixPath, content: IO[bytes]) -> None:
+        if self._zipfile is not None:
+            zipinfo = zipfile.ZipInfo(
+                str(filename), date_time=time.localtime()[:6],
+            )
+            zipinfo.compress_type = self._zipfile.compression
+            zipinfo.external_attr = 0o644 << 16
+            with self._zipfile.open(zipinfo, 'w') as f:
+                shutil.copyfileobj(content, f)
+        else:
+            assert self._tarfile is not None
+            tarinfo = tarfile.TarInfo(str(filename))
+            tarinfo.size = content.seek(0, os.SEEK_END)
+            content.seek(0)
+            tarinfo.mtime = int(time.time())
+            tarinfo.mode = 0o644
+            if self._tar_store is not None:
+                store_offset = self._tar_store.seek(0, os.SEEK_END)
+                shutil.copyfileobj(content, self._tar_store)
+                content.seek(0)
+            self._tarfile.addfile(tarinfo, content)
+            if self._tar_store is not None:
+                tarinfo.offset_data = store_offset
+            else:
+                # addfile doesn't record where the data is; it was written
+                # just before the current offset, padded to whole blocks
+                blocks = -(-tarinfo.size // tarfile.BLOCKSIZE)
+                tarinfo.offset_data = (
+                    self._tarfile.offset - blocks * tarfile.BLOCKSIZE
+                )
+            self._tar_members[filename] = tarinfo
+
+    async def open_filename(self, filename: PurePosixPath) -> BinaryIO:
+        async with self._lock:
+            if self._zipfile is not None:
+                try:
+                    return io.BytesIO(self._zipfile.read(str(filename)))
+                except KeyError:
+                    raise FileNotFoundError(filename)
+            assert self._tarfile is not None
+            try:
+                tarinfo = self._tar_members[filename]
+            except KeyError:
+                raise FileNotFoundError(filename)
+            if tarinfo.islnk():
+                tarinfo = self._tar_members[PurePosixPath(tarinfo.linkname)]
+            if self._tar_store is not None:
+                self._tar_store.seek(tarinfo.offset_data)
+                return io.BytesIO(self._tar_store.read(tarinfo.size))
+            raw_file, = self._tar_fileobjs
+            raw_file.flush()
+            with open(self.tmp_path, 'rb') as f:
+                f.seek(tarinfo.offset_data)
+                return io.BytesIO(f.read(tarinfo.size))
+
+    async def copy_filename(
+        self,
+        source: PurePosixPath,
+        destination: PurePosixPath,
+    ) -> None:
+        if self._tarfile is None:
+            return await super().copy_filename(source, destination)
+        # In a tar archive, the copy can be stored as a hard link
+        async with self._lock:
+            try:
+                source_info = self._tar_members[source]
+            except KeyError:
+                raise FileNotFoundError(source)
+            tarinfo = tarfile.TarInfo(str(destination))
+            tarinfo.type = tarfile.LNKTYPE
+            if source_info.islnk():
+                tarinfo.linkname = source_info.linkname
+            else:
+                tarinfo.linkname = str(source)
+            tarinfo.mtime = int(time.time())
+            tarinfo.mode = 0o644
+            self._tarfile.addfile(tarinfo)
+            self._tar_members[destination] = tarinfo
+
+    def _close(self) -> None:
+        if self._zipfile is not None:
+            self._zipfile.close()
+            self._zipfile = None
+        if self._tarfile is not None:
+            self._tarfile.close()
+            self._tarfile = None
+            for fileobj in self._tar_fileobjs:
+                fileobj.close()
+        if self._tar_store is not None:
+            self._tar_store.close()
+            self._tar_store = None
+
+    def shutdown(self) -> None:
+        self._close()
+
+    async def finish(self, success: bool, cleanup: bool) -> None:
+        """Close the archive and move it to its final place.
+
+        After a failed freeze, the archive is removed if `cleanup` is true.
+        """
+        self._close()
+        if not self.tmp_path.exists():
+            return
+        if success or not cleanup:
+            os.replace(self.tmp_path, self.archive_path)
+        else:
+            self.tmp_path.unlink()
+
+
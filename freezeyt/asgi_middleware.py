@@ -6,6 +6,7 @@ from werkzeug.security import safe_join
 
 from freezeyt.types import asgi_types, Config
 from freezeyt.wsgi_to_asgi import WSGIToASGIMiddleware
+from freezeyt.wsgi_pool import get_wsgi_pool
 from freezeyt.urls import PrefixURL
 from freezeyt.extra_files import get_extra_files
 from freezeyt.mimetype_check import MimetypeChecker
@@ -29,11 +30,16 @@ class ASGIMiddleware:
 
         app_interface = config.get('app_interface', 'wsgi')
         if app_interface == 'wsgi':
+            wsgi_app = cast(WSGIApplication, app)
             self.app = WSGIToASGIMiddleware(
-                cast(WSGIApplication, app),
+                wsgi_app,
                 prefix=self.prefix,
+                pool=get_wsgi_pool(config, wsgi_app),
             )
         elif app_interface == 'asgi':
+            if config.get('wsgi_pool') is not None:
+                raise ValueError(
+                    'wsgi_pool can only be used with WSGI applications')
             self.app = cast(asgi_types.ASGI3Application, app)
         else:
             raise ValueError(
@@ -69,6 +75,11 @@ class ASGIMiddleware:
 
         self.static_mode = config.get('static_mode', False)
 
+    def shutdown(self) -> None:
+        """Release resources used to run the app (like worker processes)"""
+        if isinstance(self.app, WSGIToASGIMiddleware):
+            self.app.shutdown()
+
     async def __call__(
         self,
         scope: asgi_types.Scope,
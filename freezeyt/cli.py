@@ -1,6 +1,7 @@
 """Command-Line Interface for freezeyt"""
 
 import sys
+import json
 import shutil
 from typing import Optional, TextIO, BinaryIO, List, Literal
 try:
@@ -14,7 +15,8 @@ import yaml
 
 from freezeyt import freeze, MultiError
 from freezeyt.util import import_variable_from_module
-from freezeyt.types import Config
+from freezeyt.types import Config, ProfileAppConfig
+from freezeyt.stats import FreezeStats
 
 # Use -h as an alias for --help
 # (see https://click.palletsprojects.com/en/stable/documentation/#help-parameter-customization)
@@ -51,6 +53,21 @@ CONTEXT_SETTINGS = dict(help_option_names=['-h', '--help'])
 @click.option('-x', '--fail-fast/--no-fail-fast',
               default=None,
               help='Stop on the first error')
+@click.option('--concurrency',
+              help='Number of pages to handle at once, or "adaptive" '
+                + 'to adjust it automatically')
+@click.option('--stats', 'show_stats', is_flag=True, default=False,
+              help='Show timing statistics at the end')
+@click.option('--stats-json', type=click.File('w'),
+              help='Write timing statistics to a JSON file')
+@click.option('--profile-app', 'profile_output', type=click.Path(dir_okay=False),
+              help='Profile the app and write the results to a file '
+                + '(collapsed stacks if the name ends in .collapsed or '
+                + '.folded, otherwise pstats)')
+@click.option('--profile-sample', type=click.FloatRange(0, 1),
+              help='Fraction of pages to profile (default: all)')
+@click.option('--profile-pattern',
+              help='Only profile pages whose path matches this glob pattern')
 def main(
     app: str,
     dest_path: str,
@@ -64,6 +81,12 @@ def main(
     cleanup: Optional[bool],
     gh_pages: Optional[bool],
     fail_fast: Optional[bool],
+    concurrency: Optional[str],
+    show_stats: bool,
+    stats_json: Optional[TextIO],
+    profile_output: Optional[str],
+    profile_sample: Optional[float],
+    profile_pattern: Optional[str],
 ) -> None:
     """
     APP
@@ -147,6 +170,53 @@ def main(
     if fail_fast is not None:
         config['fail_fast'] = fail_fast
 
+    if concurrency == 'adaptive':
+        concurrency_config = config.get('concurrency')
+        if isinstance(concurrency_config, dict):
+            config['concurrency'] = {**concurrency_config, 'adaptive': True}
+        else:
+            config['concurrency'] = 'adaptive'
+    elif concurrency is not None:
+        try:
+            config['concurrency'] = int(concurrency)
+        except ValueError:
+            raise click.BadParameter(
+                'must be a number or "adaptive"',
+                param_hint='--concurrency',
+            )
+
+    if (
+        profile_output is not None
+        or profile_sample is not None
+        or profile_pattern is not None
+    ):
+        config_profile_app = config.get('profile_app')
+        profile_config: Optional[ProfileAppConfig] = None
+        if isinstance(config_profile_app, dict):
+            profile_config = {**config_profile_app}
+        elif config_profile_app is not None:
+            profile_config = {'output': config_profile_app}
+        if profile_output is not None:
+            if profile_config is None:
+                profile_config = {'output': profile_output}
+            else:
+                profile_config['output'] = profile_output
+        if profile_config is None:
+            raise click.UsageError(
+                '--profile-sample and --profile-pattern need --profile-app '
+                + 'or "profile_app" in config'
+            )
+        if profile_sample is not None:
+            profile_config['sample'] = profile_sample
+        if profile_pattern is not None:
+            profile_config['pattern'] = profile_pattern
+        config['profile_app'] = profile_config
+
+    stats = None
+    if show_stats or stats_json is not None:
+        stats = FreezeStats()
+        config['plugins'] = [*config.get('plugins', []), stats]
+
     try:
         freeze(app=None, config=config)
     except MultiError as multierr:
@@ -168,3 +238,11 @@ def main(
             for reason in task.reasons:
                 click.echo(f'    {reason}', file=sys.stderr)
         exit(1)
+    finally:
+        if stats is not None:
+            stats_dict = stats.as_dict()
+            if show_stats:
+                click.echo(file=sys.stderr)
+                click.echo(stats.format_report(stats_dict), file=sys.stderr)
+            if stats_json is not None:
+                json.dump(stats_dict, stats_json, indent=2)
@@ -0,0 +1,134 @@
+"""Limit on the number of pages that are handled at once"""
+
+import asyncio
+import statistics
+from typing import List, Mapping, Optional, Union
+
+
+# After each adjustment, the baseline latency may grow by this factor
+# (if pages get slower to render as the freeze goes on, the limit
+# shouldn't keep shrinking)
+BASELINE_DRIFT = 1.1
+
+# The limit is multiplied by this when the freezer seems overloaded
+DECREASE_FACTOR = 0.75
+
+# How often the event loop is checked for lag, in seconds
+LOOP_LAG_INTERVAL = 0.05
+
+
+class ConcurrencyLimit:
+    """The number of pages handled at once
+
+    limit: the number of pages (initial number, if adaptive)
+    adaptive: adjust the limit as pages are frozen
+    min_limit, max_limit: bounds of the adaptive limit
+    latency_tolerance: the limit is lowered when pages take this many times
+        longer than the baseline
+    max_loop_lag: the limit is lowered when the event loop is blocked
+        for more than this many seconds
+
+    The adaptive limit works like TCP congestion control
+    (additive increase, multiplicative decrease).
+    Each time `limit` pages are frozen, the median time it took to render
+    and save them is compared to the lowest median seen so far.
+    If pages got much slower, or the event loop was unresponsive, the limit
+    is lowered by a quarter. Otherwise it is raised by one.
+    """
+    def __init__(
+        self,
+        limit: int,
+        *,
+        adaptive: bool = False,
+        min_limit: int = 1,
+        max_limit: Optional[int] = None,
+        latency_tolerance: float = 2.0,
+        max_loop_lag: float = 0.25,
+    ):
+        if max_limit is None:
+            max_limit = limit * 10 if adaptive else limit
+        if not 1 <= min_limit <= limit <= max_limit:
+            raise ValueError(
+                'concurrency limits must satisfy 1 <= min <= limit <= max; '
+                + f'got min={min_limit}, limit={limit}, max={max_limit}'
+            )
+        if latency_tolerance <= 1:
+            raise ValueError('concurrency latency_tolerance must be above 1')
+        self.limit = limit
+        self.adaptive = adaptive
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_tolerance = latency_tolerance
+        self.max_loop_lag = max_loop_lag
+
+        self.base_latency: Optional[float] = None
+        self._latencies: List[float] = []
+        self._loop_lag = 0.0
+
+    @classmethod
+    def from_config(
+        cls,
+        config: Union[None, int, str, Mapping],
+        default: int,
+    ) -> 'ConcurrencyLimit':
+        """Create a ConcurrencyLimit for the `concurrency` configuration key"""
+        if config is None:
+            return cls(default)
+        if config == 'adaptive':
+            return cls(default, adaptive=True)
+        if isinstance(config, int) and not isinstance(config, bool):
+            return cls(config)
+        if isinstance(config, Mapping):
+            kwargs = {}
+            for key, argname in (
+                ('adaptive', 'adaptive'),
+                ('min', 'min_limit'),
+                ('max', 'max_limit'),
+                ('latency_tolerance', 'latency_tolerance'),
+                ('max_loop_lag', 'max_loop_lag'),
+            ):
+                if key in config:
+                    kwargs[argname] = config[key]
+            return cls(config.get('limit', default), **kwargs)
+        raise ValueError(
+            'concurrency must be a number, "adaptive" or a dict; '
+            + f'got {config!r}'
+        )
+
+    def record_latency(self, seconds: float) -> None:
+        """Record how long it took to handle a page"""
+        if not self.adaptive:
+            return
+        self._latencies.append(seconds)
+        if len(self._latencies) >= self.limit:
+            self._adjust()
+
+    def record_loop_lag(self, seconds: float) -> None:
+        """Record how long the event loop was late"""
+        self._loop_lag = max(self._loop_lag, seconds)
+
+    def _adjust(self) -> None:
+        latency = statistics.median(self._latencies)
+        self._latencies.clear()
+        loop_lag = self._loop_lag
+        self._loop_lag = 0.0
+        if self.base_latency is None:
+            self.base_latency = latency
+        else:
+            self.base_latency = min(latency, self.base_latency * BASELINE_DRIFT)
+        overloaded = (
+            latency > self.base_latency * self.latency_tolerance
+            or loop_lag > self.max_loop_lag
+        )
+        if overloaded:
+            self.limit = max(self.min_limit, int(self.limit * DECREASE_FACTOR))
+        else:
+            self.limit = min(self.max_limit, self.limit + 1)
+
+    async def monitor_loop_lag(self) -> None:
+        """Measure event loop lag until cancelled"""
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(LOOP_LAG_INTERVAL)
+            self.record_loop_lag(loop.time() - start - LOOP_LAG_INTERVAL)
@@ -1,12 +1,13 @@
 from io import BytesIO
 from pathlib import PurePosixPath
-from typing import Dict, Union, Iterable, Tuple
+from typing import Dict, Union, Mapping, MutableMapping, Iterator, Tuple
+from typing import Any, Optional, Set
 
-from .saver import Saver
+from .saver import Saver, SaverContent, iterate_content
 
 
 # Type for holding simulated directory contents.
-DictSaverContents = Dict[
+DictSaverContents = Mapping[
     str,  # filename; maps to either:
     Union[
         bytes,  # file content, or
@@ -14,45 +15,152 @@ DictSaverContents = Dict[
     ]
 ]
 
+
 class DictSaver(Saver):
     """Outputs frozen pages into a dict.
+
+    Files are stored in a flat dict, keyed by their path.
+    The nested dicts returned by `finish` are only built when the result
+    is used as a dict (see DictSaverResult).
     """
     def __init__(self):
-        self.root_dir: DictSaverContents = {}
+        # File contents by path (like 'a/b/index.html')
+        self.files: Dict[str, bytes] = {}
+        # Paths of directories ('' is the root)
+        self.directories: Set[str] = {''}
 
     async def save_to_filename(
         self,
         filepath: PurePosixPath,
-        content_iterable: Iterable[bytes],
+        content_iterable: SaverContent,
     ) -> None:
-        parent_dir, name = get_parent_and_name(self.root_dir, filepath)
+        parent, name = split_path(filepath)
+        key = join_path(parent, name)
 
-        if isinstance(parent_dir.get(name), dict):
+        if key in self.directories:
             raise IsADirectoryError(filepath)
-        parent_dir[name] = b''.join(content_iterable)
+        chunks = [chunk async for chunk in iterate_content(content_iterable)]
+        parent_key = '/'.join(parent)
+        if parent_key not in self.directories:
+            # Check for files in the way before adding any directories
+            parent_keys = ['/'.join(parent[:i + 1]) for i in range(len(parent))]
+            if any(k in self.files for k in parent_keys):
+                raise NotADirectoryError(PurePosixPath(*parent))
+            self.directories.update(parent_keys)
+        if len(chunks) == 1 and type(chunks[0]) is bytes:
+            # Keep a single chunk as it is, without copying
+            self.files[key] = chunks[0]
+        else:
+            self.files[key] = b''.join(chunks)
 
     async def open_filename(self, filepath: PurePosixPath) -> BytesIO:
-        parent_dir, name = get_parent_and_name(self.root_dir, filepath)
+        parent, name = split_path(filepath)
+        key = join_path(parent, name)
 
         try:
-            file_content = parent_dir[name]
+            file_content = self.files[key]
         except KeyError:
+            if key in self.directories:
+                raise IsADirectoryError(filepath)
+            for i in range(len(parent)):
+                if '/'.join(parent[:i + 1]) in self.files:
+                    raise NotADirectoryError(PurePosixPath(*parent))
             raise FileNotFoundError(filepath)
-        if isinstance(file_content, dict):
-            raise IsADirectoryError(filepath)
+        # BytesIO shares the content's buffer (until it's written to),
+        # so this doesn't copy the content
         return BytesIO(file_content)
 
-    async def finish(self, success: bool, cleanup: bool) -> DictSaverContents:
-        return self.root_dir
+    async def finish(self, success: bool, cleanup: bool) -> 'DictSaverResult':
+        return DictSaverResult(self.files)
+
+
+class DictSaverResult(MutableMapping[str, Any]):
+    """Frozen pages, as nested dicts of file and directory names
+
+    Maps names of files to their contents, and names of directories to
+    dicts. The dicts are built when this is first used as a mapping;
+    `walk_files` can be used before that, to avoid building them.
+    This is not a dict itself; use `to_dict` to get one.
+    """
+    def __init__(self, files: Dict[str, bytes]):
+        self._files = files
+        self._root: Optional[Dict[str, Any]] = None
+
+    @property
+    def _contents(self) -> Dict[str, Any]:
+        if self._root is None:
+            self._root = self._build()
+        return self._root
+
+    def _build(self) -> Dict[str, Any]:
+        root: Dict[str, Any] = {}
+        for key, content in self._files.items():
+            directory = root
+            *parent, name = key.split('/')
+            for part in parent:
+                directory = directory.setdefault(part, {})
+            directory[name] = content
+        return root
+
+    def __getitem__(self, name: str) -> Any:
+        return self._contents[name]
+
+    def __setitem__(self, name: str, value: Any) -> None:
+        self._contents[name] = value
+
+    def __delitem__(self, name: str) -> None:
+        del self._contents[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._contents)
+
+    def __len__(self) -> int:
+        return len(self._contents)
+
+    def __bool__(self) -> bool:
+        # Truth testing doesn't need the nested dicts
+        if self._root is None:
+            return bool(self._files)
+        return bool(self._root)
+
+    def __repr__(self) -> str:
+        # Don't keep the dicts; repr might be called just for debugging
+        if self._root is None:
+            return repr(self._build())
+        return repr(self._root)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the contents as a dict
+
+        The dict is not a copy: changes to it show in this mapping,
+        and vice versa.
+        """
+        return self._contents
+
+    def walk_files(self) -> Iterator[Tuple[str, bytes]]:
+        """Iterate over (path, content) of all files
+
+        Paths use forward slashes, like 'a/b/index.html'.
+        """
+        if self._root is None:
+            yield from self._files.items()
+        else:
+            yield from _walk_dict(self._root, '')
+
+
+def _walk_dict(
+    directory: Mapping[str, Any], prefix: str,
+) -> Iterator[Tuple[str, bytes]]:
+    for name, value in directory.items():
+        if isinstance(value, Mapping):
+            yield from _walk_dict(value, f'{prefix}{name}/')
+        else:
+            yield f'{prefix}{name}', value
+
 
-def get_parent_and_name(
-    root_dir: DictSaverContents,
-    filepath: PurePosixPath,
-) -> Tuple[DictSaverContents, str]:
-    """Return a dict representing the parent directory of the given file, and
-    the name of the file.
+def split_path(filepath: PurePosixPath) -> Tuple[Tuple[str, ...], str]:
+    """Return the parts of the parent directory's path, and the file name
 
-    root_dir: a dict representing the root directory (DictSaver.root_dir)
     filepath: relative path to the file
     """
     path = PurePosixPath(filepath)
@@ -61,12 +169,8 @@ def get_parent_and_name(
     parts = path.parts
     if not parts:
         raise IsADirectoryError('.')
+    return parts[:-1], parts[-1]
 
-    current_directory: DictSaverContents = root_dir
-    for part in parts[:-1]:
-        new_curdir = current_directory.setdefault(part, {})
-        if not isinstance(new_curdir, dict):
-            raise NotADirectoryError(PurePosixPath(*parts[:-1]))
-        current_directory = new_curdir
 
-    return current_directory, parts[-1]
+def join_path(parent: Tuple[str, ...], name: str) -> str:
+    return '/'.join([*parent, name])
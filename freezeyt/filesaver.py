@@ -1,13 +1,123 @@
 import os
+import sys
 import stat
+import uuid
 import asyncio
+import hashlib
+import concurrent.futures
 from pathlib import Path, PurePosixPath
 
 from . import compat
-from .saver import Saver
+from .saver import Saver, SaverContent, iterate_content
 from .urls import PrefixURL
+from .precompress import Precompressor
+from .incremental import FileStat
 
-from typing import Callable, Iterable, BinaryIO
+from typing import Callable, BinaryIO, Set, Dict, Optional, List, Sequence
+from typing import Any, TypeVar
+
+
+T = TypeVar('T')
+
+
+# Ways to store files with the same content as an earlier file
+DEDUP_METHODS = ('hardlink', 'symlink', 'reflink')
+
+# ioctl request to share a file's data with another file (Linux)
+_FICLONE = 0x40049409
+
+# Content is collected up to this size (in bytes) before it's written.
+# Smaller files are opened, written and closed in a single writer job.
+WRITE_BUFFER_SIZE = 256 * 1024
+
+# Maximum number of buffers for one os.writev call
+try:
+    _IOV_MAX = os.sysconf('SC_IOV_MAX')
+except (AttributeError, ValueError, OSError):
+    _IOV_MAX = 16
+if _IOV_MAX <= 0:
+    _IOV_MAX = 16
+
+
+def write_all(fd: int, chunks: Sequence[bytes]) -> None:
+    """Write all the chunks to a file descriptor
+
+    Uses vectored writes (os.writev) where available.
+    """
+    buffers = [memoryview(chunk) for chunk in chunks if chunk]
+    while buffers:
+        if hasattr(os, 'writev') and len(buffers) > 1:
+            written = os.writev(fd, buffers[:_IOV_MAX])
+        else:
+            written = os.write(fd, buffers[0])
+        # Drop what was written; the write might have been partial
+        while buffers and written >= len(buffers[0]):
+            written -= len(buffers[0])
+            del buffers[0]
+        if written:
+            buffers[0] = buffers[0][written:]
+
+
+def file_sha256(path: Path) -> str:
+    """Return the SHA-256 hex digest of a file's content"""
+    content_hash = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(WRITE_BUFFER_SIZE)
+            if not chunk:
+                return content_hash.hexdigest()
+            content_hash.update(chunk)
+
+
+async def run_in_executor(
+    executor: concurrent.futures.Executor,
+    function: Callable[..., T],
+    *args: Any,
+) -> T:
+    """Run a function in an executor
+
+    If the caller is cancelled while the function is running, wait for
+    the function to finish (it can't be interrupted) before propagating
+    the cancellation, so that the caller can clean up after it.
+    """
+    future = executor.submit(function, *args)
+    try:
+        return await asyncio.wrap_future(future)
+    except asyncio.CancelledError:
+        # wrap_future cancelled `future`, unless it's already running
+        await asyncio.wait([asyncio.wrap_future(future)])
+        raise
+
+
+class _TmpFile:
+    """A temporary file, written by writer jobs"""
+    def __init__(self, path: Path):
+        self.path = path
+        self.file: Optional[BinaryIO] = None
+
+    def write(self, chunks: Sequence[bytes]) -> None:
+        """Write chunks, opening the file first if needed
+
+        On error, the file is removed.
+        """
+        try:
+            if self.file is None:
+                self.file = open(self.path, 'wb', buffering=0)
+            write_all(self.file.fileno(), chunks)
+        except BaseException:
+            self.discard()
+            raise
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def discard(self) -> None:
+        """Close and remove the file"""
+        self.close()
+        if os.path.lexists(self.path):
+            os.unlink(self.path)
 
 
 class DirectoryExistsError(Exception):
@@ -20,6 +130,19 @@ class FileSaver(Saver):
     base - Filesystem base path (eg. /tmp/)
     prefix - Base URL to deploy web app in production
         (eg. url_parse('http://example.com:8000/foo/')
+    incremental - If true, keep the existing content of the directory
+        and only remove files that were not saved (or kept) by the end
+        of a successful freeze
+    dedup - If given, a file with the same content as an earlier file
+        is stored as a 'hardlink', 'symlink' or 'reflink' to that file
+    precompress - If given, compressed copies of files are saved
+        alongside them (for example, index.html.gz)
+    writers - Number of threads that write files
+    restore_on_failure - If true, the previous content of the directory
+        is put back if a freeze fails (and is cleaned up)
+
+    Previous content of the directory is renamed aside when the freeze
+    starts, and removed in the background while pages are saved.
     """
     @staticmethod
     def add_write_flag(
@@ -40,13 +163,72 @@ class FileSaver(Saver):
         else:
             raise exception
 
-    def __init__(self, base_path: Path, prefix: PrefixURL):
+    def __init__(
+        self,
+        base_path: Path,
+        prefix: PrefixURL,
+        *,
+        incremental: bool = False,
+        dedup: Optional[str] = None,
+        precompress: Optional[Precompressor] = None,
+        writers: Optional[int] = None,
+        restore_on_failure: bool = False,
+    ):
         self.base_path = base_path.resolve()
         self.prefix = prefix
+        self.incremental = incremental
+        # Files saved or kept in this freeze (only tracked if incremental)
+        self.saved_filenames: Set[PurePosixPath] = set()
+        # Files written (not kept) in this freeze (only tracked if incremental)
+        self.written_filenames: Set[PurePosixPath] = set()
+        if dedup is not None and dedup not in DEDUP_METHODS:
+            raise ValueError(
+                f'unknown dedup method {dedup!r}; '
+                + f'use one of {", ".join(DEDUP_METHODS)}'
+            )
+        self.dedup = dedup
+        # For deduplication: the first file saved with a given content,
+        # by SHA-256 digest
+        self.files_by_digest: Dict[bytes, Path] = {}
+        self.digests_by_file: Dict[Path, bytes] = {}
+        # Originals whose content is still being written
+        self.unwritten_originals: Dict[Path, asyncio.Event] = {}
+        # Files linked to each original, and the originals of linked files
+        self.links: Dict[Path, List[Path]] = {}
+        self.link_targets: Dict[Path, Path] = {}
+        self.precompress = precompress
+        self.writers = writers
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        # Directories known to exist, so they're not created again
+        # for each file
+        self.created_dirs: Set[Path] = set()
+        self.restore_on_failure = restore_on_failure
+        # Previous content of the directory, renamed aside by prepare()
+        self.old_path: Optional[Path] = None
+        # Removal of old output, running in the background
+        self._removal: Optional[concurrent.futures.Future] = None
+        self._removal_executor: Optional[
+            concurrent.futures.ThreadPoolExecutor
+        ] = None
+
+    @property
+    def executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        """Threads that open, write and close files"""
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                self.writers, thread_name_prefix='freezeyt-writer',
+            )
+        return self._executor
 
     async def prepare(self) -> None:
+        self.created_dirs.clear()
+        # Remove anything renamed aside by a freeze that didn't finish
+        # (for example, one stopped by fail_fast)
+        leftovers = list(self.base_path.parent.glob(
+            f'.{self.base_path.name}.freezeyt-old-*',
+        ))
         if self.base_path.exists():
-            has_files = list(self.base_path.iterdir())
+            has_files = any(self.base_path.iterdir())
             has_index = self.base_path.joinpath('index.html').exists()
             if has_files and not has_index:
                 raise DirectoryExistsError(
@@ -56,22 +238,309 @@ class FileSaver(Saver):
                     + 'freezeyt.'
                 )
 
+            if not self.incremental:
+                self.old_path = self._rename_aside()
+            elif self.dedup == 'symlink':
+                # Files kept from the previous freeze may be symlinks
+                self._find_symlinks(self.base_path)
+        if self.old_path is not None and not self.restore_on_failure:
+            leftovers.append(self.old_path)
+        if leftovers:
+            self._remove_in_background(leftovers)
+
+    def _rename_aside(self) -> Optional[Path]:
+        """Move the content of the directory out of the way
+
+        Return the new name, or None if the content was removed instead.
+        """
+        old_path = self.base_path.with_name(
+            f'.{self.base_path.name}.freezeyt-old-{uuid.uuid4().hex[:12]}'
+        )
+        try:
+            # The new name is in the same directory (so, on the same
+            # filesystem), so this is fast and atomic
+            self.base_path.rename(old_path)
+        except OSError:
+            # The directory can't be renamed (it might be a mount point,
+            # or in use on Windows); remove it right away
             compat.rmtree(self.base_path, onexc=self.add_write_flag)
+            return None
+        return old_path
+
+    def _remove_in_background(self, paths: List[Path]) -> None:
+        def remove() -> None:
+            for path in paths:
+                compat.rmtree(path, onexc=self.add_write_flag)
+
+        self._removal_executor = concurrent.futures.ThreadPoolExecutor(
+            1, thread_name_prefix='freezeyt-remove',
+        )
+        self._removal = self._removal_executor.submit(remove)
+
+    async def _wait_for_removal(self) -> None:
+        if self._removal is not None:
+            try:
+                await asyncio.wrap_future(self._removal)
+            finally:
+                assert self._removal_executor is not None
+                self._removal_executor.shutdown()
+                self._removal = None
+                self._removal_executor = None
 
     async def save_to_filename(
         self,
         filename: PurePosixPath,
-        content_iterable: Iterable[bytes],
+        content_iterable: SaverContent,
     ) -> None:
         absolute_filename = self.base_path / filename
         assert self.base_path in absolute_filename.parents
 
-        loop = asyncio.get_running_loop()
+        # Write to a temporary file, and rename it when all content
+        # is written. This way, a page is never saved incomplete, and
+        # the content can be written as it comes.
+        tmp_file = _TmpFile(absolute_filename.with_name(
+            f'.{absolute_filename.name}.freezeyt-tmp'
+        ))
+        content_hash = hashlib.sha256()
+        sidecars = None
+        if self.precompress is not None:
+            sidecars = self.precompress.start(absolute_filename)
+        if sidecars is not None:
+            # Sidecars are written next to the file from the start
+            await run_in_executor(
+                self.executor, self._make_parent_dir, absolute_filename,
+            )
+        # The file is opened by the first writer job; small files are
+        # opened, written, closed and renamed all in one job.
+        chunks: List[bytes] = []
+        buffered_size = 0
+        try:
+            async for item in iterate_content(content_iterable):
+                if self.dedup:
+                    content_hash.update(item)
+                if sidecars is not None:
+                    assert self.precompress is not None
+                    await run_in_executor(
+                        self.precompress.executor, sidecars.write, item,
+                    )
+                chunks.append(item)
+                buffered_size += len(item)
+                if buffered_size >= WRITE_BUFFER_SIZE:
+                    await run_in_executor(
+                        self.executor, self._write_chunks, tmp_file, chunks,
+                    )
+                    chunks = []
+                    buffered_size = 0
+            original = None
+            symlinks: List[Path] = []
+            if self.dedup:
+                symlinks = self._detach_links(absolute_filename)
+                original = await self._find_original(
+                    absolute_filename, content_hash.digest(),
+                )
+                if original is not None:
+                    self._add_link(absolute_filename, original)
+            await run_in_executor(
+                self.executor, self._write_last_chunks,
+                tmp_file, chunks, absolute_filename, original, symlinks,
+            )
+            if self.dedup:
+                self._original_written(absolute_filename, success=True)
+            if sidecars is not None:
+                assert self.precompress is not None
+                await run_in_executor(
+                    self.precompress.executor, sidecars.close,
+                )
+        except BaseException:
+            # Any writer job for this file has finished by now
+            tmp_file.discard()
+            if sidecars is not None:
+                sidecars.discard()
+            if self.dedup:
+                self._original_written(absolute_filename, success=False)
+            raise
+        sidecar_paths = []
+        if sidecars is not None:
+            sidecar_paths = sidecars.commit()
+        if self.incremental:
+            for name in [filename] + [
+                filename.with_name(path.name) for path in sidecar_paths
+            ]:
+                self.saved_filenames.add(name)
+                self.written_filenames.add(name)
+
+    def _make_parent_dir(self, filename: Path) -> None:
+        directory = filename.parent
+        if directory in self.created_dirs:
+            return
+        directory.mkdir(parents=True, exist_ok=True)
+        # The parents (up to base_path) exist now as well
+        while directory not in self.created_dirs:
+            self.created_dirs.add(directory)
+            if directory == self.base_path:
+                break
+            directory = directory.parent
+
+    def _write_chunks(self, tmp_file: _TmpFile, chunks: List[bytes]) -> None:
+        """Write chunks to a temporary file, creating it if needed
+
+        Runs in the writer pool.
+        """
+        if tmp_file.file is None:
+            self._make_parent_dir(tmp_file.path)
+        tmp_file.write(chunks)
+
+    def _write_last_chunks(
+        self,
+        tmp_file: _TmpFile,
+        chunks: List[bytes],
+        final_filename: Path,
+        original: Optional[Path],
+        symlinks: Sequence[Path] = (),
+    ) -> None:
+        """Write the remaining chunks, close the file and rename it
+
+        If `original` is given, the file is replaced by a link to it
+        before it's renamed.
+        The file's previous content is moved under `symlinks`
+        (see _detach_links).
+        Runs in the writer pool. On error, the temporary file is removed.
+        """
+        self._write_chunks(tmp_file, chunks)
+        try:
+            tmp_file.close()
+            if original is not None:
+                self._link(original, tmp_file.path, final_filename)
+            if symlinks:
+                self._move_under_symlinks(final_filename, symlinks)
+            os.replace(tmp_file.path, final_filename)
+        except BaseException:
+            tmp_file.discard()
+            raise
 
-        absolute_filename.parent.mkdir(parents=True, exist_ok=True)
-        with open(absolute_filename, "wb") as f:
-            for item in content_iterable:
-                await loop.run_in_executor(None, f.write, item)
+    async def _find_original(
+        self, absolute_filename: Path, digest: bytes,
+    ) -> Optional[Path]:
+        """Return the file to link to, if the content was saved before
+
+        If it wasn't, absolute_filename becomes the original for this
+        content; _original_written must be called when it's written.
+        If the original is still being written, wait for it.
+        """
+        self._forget_original(absolute_filename)
+        while True:
+            original = self.files_by_digest.get(digest)
+            if original is None:
+                self.files_by_digest[digest] = absolute_filename
+                self.digests_by_file[absolute_filename] = digest
+                self.unwritten_originals[absolute_filename] = asyncio.Event()
+                return None
+            event = self.unwritten_originals.get(original)
+            if event is None:
+                return original
+            await event.wait()
+
+    def _original_written(self, absolute_filename: Path, success: bool) -> None:
+        event = self.unwritten_originals.pop(absolute_filename, None)
+        if event is None:
+            return
+        if not success:
+            # Files waiting for this one will look for another original
+            self._forget_original(absolute_filename)
+        event.set()
+
+    def _forget_original(self, absolute_filename: Path) -> None:
+        digest = self.digests_by_file.pop(absolute_filename, None)
+        if digest is not None:
+            del self.files_by_digest[digest]
+
+    def _add_link(self, absolute_filename: Path, original: Path) -> None:
+        self.links.setdefault(original, []).append(absolute_filename)
+        self.link_targets[absolute_filename] = original
+
+    def _detach_links(self, absolute_filename: Path) -> List[Path]:
+        """Prepare to replace a file that other files may be linked to
+
+        The first file linked to this one becomes the original for its
+        content. Hard links and reflinks keep the content when the file
+        is replaced, but symlinks would change along with the file.
+        So, with symlinks, return them: before the file is replaced,
+        _move_under_symlinks must move its content to the first symlink,
+        and point the others there.
+        """
+        # The file itself is no longer a link
+        target = self.link_targets.pop(absolute_filename, None)
+        if target is not None:
+            self.links[target].remove(absolute_filename)
+        links = self.links.pop(absolute_filename, [])
+        if not links:
+            return []
+        first, *rest = links
+        del self.link_targets[first]
+        for link in rest:
+            self._add_link(link, first)
+        digest = self.digests_by_file.pop(absolute_filename, None)
+        if digest is not None:
+            self.files_by_digest[digest] = first
+            self.digests_by_file[first] = digest
+        if self.dedup == 'symlink':
+            return links
+        return []
+
+    def _move_under_symlinks(self, path: Path, links: Sequence[Path]) -> None:
+        """Move a file to the first of its symlinks; repoint the others
+
+        Runs in the writer pool.
+        """
+        first, *rest = links
+        os.replace(path, first)
+        for link in rest:
+            tmp_link = link.with_name(f'.{link.name}.freezeyt-tmp-link')
+            os.symlink(os.path.relpath(first, link.parent), tmp_link)
+            os.replace(tmp_link, link)
+
+    def _find_symlinks(self, directory: Path) -> None:
+        """Find symlinks to files in the output from a previous freeze"""
+        for dirpath, dirnames, filenames in os.walk(directory):
+            for name in filenames:
+                path = Path(dirpath, name)
+                if not path.is_symlink():
+                    continue
+                target = Path(os.path.normpath(
+                    path.parent / os.readlink(path)
+                ))
+                if self.base_path in target.parents and target.is_file():
+                    self._add_link(path, target)
+
+    def _link(
+        self, original: Path, tmp_filename: Path, absolute_filename: Path,
+    ) -> None:
+        """Replace tmp_filename by a link to original
+
+        If linking is not possible, tmp_filename is left as it is.
+        Runs in the writer pool.
+        """
+        try:
+            if self.dedup == 'reflink':
+                if sys.platform != 'linux':
+                    return
+                import fcntl
+                with open(original, 'rb') as src, open(tmp_filename, 'r+b') as dst:
+                    fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+                return
+            link_filename = tmp_filename.with_name(tmp_filename.name + '-link')
+            if self.dedup == 'hardlink':
+                os.link(original, link_filename)
+            else:
+                os.symlink(
+                    os.path.relpath(original, absolute_filename.parent),
+                    link_filename,
+                )
+        except OSError:
+            # Linking is not supported here (for example, the filesystem
+            # doesn't support it); keep the copy
+            return
+        os.replace(link_filename, tmp_filename)
 
     async def open_filename(self, filename: PurePosixPath) -> BinaryIO:
         absolute_filename = self.base_path / filename
@@ -79,7 +548,145 @@ class FileSaver(Saver):
 
         return open(absolute_filename, 'rb')
 
+    async def keep_filename(
+        self,
+        filename: PurePosixPath,
+        sha256: Optional[str] = None,
+        stat: Optional[FileStat] = None,
+    ) -> bool:
+        if not self.incremental:
+            return False
+        absolute_filename = self.base_path / filename
+        assert self.base_path in absolute_filename.parents
+
+        current_stat = self._stat(absolute_filename)
+        if current_stat is None:
+            return False
+        if sha256 is not None and current_stat != stat:
+            digest = await run_in_executor(
+                self.executor, file_sha256, absolute_filename,
+            )
+            if digest != sha256:
+                # The file was changed (or truncated) since it was saved
+                return False
+        self.saved_filenames.add(filename)
+        if self.precompress is not None:
+            for extension in self.precompress.extensions:
+                sidecar_name = filename.with_name(filename.name + extension)
+                if (self.base_path / sidecar_name).is_file():
+                    self.saved_filenames.add(sidecar_name)
+        return True
+
+    async def stat_filename(
+        self,
+        filename: PurePosixPath,
+    ) -> Optional[FileStat]:
+        absolute_filename = self.base_path / filename
+        assert self.base_path in absolute_filename.parents
+
+        return self._stat(absolute_filename)
+
+    def _stat(self, path: Path) -> Optional[FileStat]:
+        """Return the size and modification time of a file
+
+        Return None if the file doesn't exist or is not a regular file.
+        """
+        try:
+            result = path.stat()
+        except OSError:
+            return None
+        if not stat.S_ISREG(result.st_mode):
+            return None
+        return FileStat(size=result.st_size, mtime_ns=result.st_mtime_ns)
+
     async def finish(self, success: bool, cleanup: bool) -> None:
-        """Delete incomplete directory after a failed freeze."""
+        """Delete incomplete directory after a failed freeze.
+
+        With restore_on_failure, put the previous content back.
+        Wait until the previous content is removed, if it's not restored.
+
+        In incremental mode, only delete the files written in a failed
+        freeze: the rest is the previous output, which the manifest
+        describes. After a successful freeze, remove files that are
+        no longer part of the site.
+        """
+        self._shutdown_writers()
+        await self._wait_for_removal()
         if not success and cleanup and self.base_path.exists():
-            compat.rmtree(self.base_path)
+            if self.incremental:
+                self._remove_written_files()
+            else:
+                compat.rmtree(self.base_path)
+        if self.old_path is not None and self.restore_on_failure:
+            if not success and cleanup:
+                self.old_path.rename(self.base_path)
+            else:
+                compat.rmtree(self.old_path, onexc=self.add_write_flag)
+            self.old_path = None
+        if success and self.incremental and self.base_path.exists():
+            self._remove_unsaved_files(self.base_path)
+
+    def _shutdown_writers(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self.precompress is not None:
+            self.precompress.shutdown()
+
+    def shutdown(self) -> None:
+        self._shutdown_writers()
+        if self._removal_executor is not None:
+            # Lets the removal finish
+            self._removal_executor.shutdown()
+            self._removal = None
+            self._removal_executor = None
+
+    def _remove_written_files(self) -> None:
+        """Remove files written in this freeze
+
+        Directories left empty are removed as well.
+        """
+        directories: Set[Path] = set()
+        for filename in self.written_filenames:
+            path = self.base_path / filename
+            if os.path.lexists(path):
+                path.unlink()
+            directories.update(
+                parent for parent in path.parents
+                if parent == self.base_path or self.base_path in parent.parents
+            )
+        # Deepest directories first
+        for directory in sorted(
+            directories, key=lambda d: len(d.parts), reverse=True,
+        ):
+            if directory.is_dir() and not any(directory.iterdir()):
+                directory.rmdir()
+        self.written_filenames.clear()
+
+    def _remove_unsaved_files(self, directory: Path) -> None:
+        """Remove files in `directory` that weren't saved in this freeze
+
+        Directories left empty are removed as well.
+        """
+        for path in directory.iterdir():
+            if path.is_dir() and not path.is_symlink():
+                self._remove_unsaved_files(path)
+                if not any(path.iterdir()):
+                    path.rmdir()
+            else:
+                if not self._is_saved(path):
+                    links = []
+                    if self.dedup == 'symlink':
+                        links = [
+                            link for link in self.links.get(path, [])
+                            if self._is_saved(link)
+                        ]
+                    if links:
+                        # Kept symlinks point to this file; keep its content
+                        self._move_under_symlinks(path, links)
+                    else:
+                        path.unlink()
+
+    def _is_saved(self, path: Path) -> bool:
+        relative = PurePosixPath(path.relative_to(self.base_path).as_posix())
+        return relative in self.saved_filenames
@@ -0,0 +1,229 @@
+"""Process pool for CPU-heavy URL finders
+
+The asynchronous URL finders (get_html_links_async, get_css_links_async)
+parse pages in worker processes.
+The pool is created by the Freezer, configured by the `finder_pool`
+config key; its worker processes are only started when a finder needs them.
+
+Pages are sent to the workers in batches: when all workers are busy,
+pages wait and are sent together when a worker is free, so many small
+pages need only one round-trip between processes.
+"""
+
+import os
+import asyncio
+import functools
+import collections
+import contextvars
+import multiprocessing
+import concurrent.futures
+from typing import Any, Callable, Iterable, List, Mapping, Optional, Tuple
+from typing import Deque
+
+from freezeyt.types import WSGIHeaderList
+
+
+# Default limit for the size of pages being processed (or waiting for
+# a worker) at a time
+DEFAULT_MAX_INFLIGHT_BYTES = 64 * 1024 * 1024
+
+# Default limit for the total size of pages sent to a worker at once
+DEFAULT_MAX_BATCH_BYTES = 256 * 1024
+
+FinderFunction = Callable[
+    [bytes, str, Optional[WSGIHeaderList]], Iterable[str],
+]
+FinderCall = Tuple[FinderFunction, bytes, str, Optional[WSGIHeaderList]]
+
+
+class _PendingPage:
+    def __init__(self, call: FinderCall, future: asyncio.Future):
+        self.call = call
+        self.future = future
+        self.size = len(call[1])
+
+
+class FinderPool:
+    """Runs URL finder functions in a pool of worker processes
+
+    workers: number of worker processes (default: number of CPUs)
+    max_inflight_bytes: limit for the total size of pages in the pool;
+        if reached, finders wait for earlier pages to be processed
+    start_method: multiprocessing start method for the workers
+        ('fork', 'spawn' or 'forkserver'; default depends on the platform)
+    max_batch_bytes: limit for the total size of pages sent to
+        a worker at once
+    """
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        max_inflight_bytes: int = DEFAULT_MAX_INFLIGHT_BYTES,
+        start_method: Optional[str] = None,
+        max_batch_bytes: int = DEFAULT_MAX_BATCH_BYTES,
+    ):
+        if workers is not None and workers < 1:
+            raise ValueError('finder_pool workers must be at least 1')
+        self.workers = workers or os.cpu_count() or 1
+        self.max_inflight_bytes = max_inflight_bytes
+        self.start_method = start_method
+        self.max_batch_bytes = max_batch_bytes
+        if start_method is not None:
+            # Fail early for unknown start methods
+            multiprocessing.get_context(start_method)
+        self._executor: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @classmethod
+    def from_config(cls, config: Mapping) -> 'FinderPool':
+        """Create a pool as given by the `finder_pool` config key"""
+        pool_config = config.get('finder_pool', {})
+        return cls(
+            workers=pool_config.get('workers'),
+            max_inflight_bytes=pool_config.get(
+                'max_inflight_bytes', DEFAULT_MAX_INFLIGHT_BYTES,
+            ),
+            start_method=pool_config.get('start_method'),
+            max_batch_bytes=pool_config.get(
+                'max_batch_bytes', DEFAULT_MAX_BATCH_BYTES,
+            ),
+        )
+
+    def _get_executor(self) -> concurrent.futures.ProcessPoolExecutor:
+        if self._executor is None:
+            mp_context = None
+            if self.start_method is not None:
+                mp_context = multiprocessing.get_context(self.start_method)
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                self.workers, mp_context=mp_context,
+            )
+        return self._executor
+
+    def _attach_to_loop(self) -> asyncio.AbstractEventLoop:
+        """Set up the state for the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._pending: Deque[_PendingPage] = collections.deque()
+            self._running_batches = 0
+            self._inflight_bytes = 0
+            self._has_space = asyncio.Condition()
+        return loop
+
+    async def run(
+        self,
+        function: FinderFunction,
+        content: bytes,
+        base_url: str,
+        headers: Optional[WSGIHeaderList],
+    ) -> Iterable[str]:
+        """Call `function(content, base_url, headers)` in a worker"""
+        loop = self._attach_to_loop()
+        size = len(content)
+        async with self._has_space:
+            await self._has_space.wait_for(
+                lambda: (
+                    self._inflight_bytes == 0
+                    or self._inflight_bytes + size <= self.max_inflight_bytes
+                )
+            )
+            self._inflight_bytes += size
+        try:
+            future = loop.create_future()
+            call: FinderCall = (function, content, base_url, headers)
+            self._pending.append(_PendingPage(call, future))
+            self._dispatch()
+            return await future
+        finally:
+            async with self._has_space:
+                self._inflight_bytes -= size
+                self._has_space.notify_all()
+
+    def _dispatch(self) -> None:
+        """Send waiting pages to free workers"""
+        while self._pending and self._running_batches < self.workers:
+            batch: List[_PendingPage] = []
+            batch_bytes = 0
+            while self._pending and (
+                not batch
+                or batch_bytes + self._pending[0].size <= self.max_batch_bytes
+            ):
+                page = self._pending.popleft()
+                if page.future.done():
+                    # cancelled while waiting
+                    continue
+                batch.append(page)
+                batch_bytes += page.size
+            if not batch:
+                break
+            self._running_batches += 1
+            batch_future = asyncio.wrap_future(
+                self._get_executor().submit(
+                    _run_batch, [page.call for page in batch],
+                )
+            )
+            batch_future.add_done_callback(
+                functools.partial(self._batch_done, batch)
+            )
+
+    def _batch_done(
+        self,
+        batch: List[_PendingPage],
+        batch_future: asyncio.Future,
+    ) -> None:
+        self._running_batches -= 1
+        if batch_future.cancelled():
+            for page in batch:
+                page.future.cancel()
+        elif (exception := batch_future.exception()) is not None:
+            # The whole batch failed (for example, a worker crashed)
+            for page in batch:
+                if not page.future.done():
+                    page.future.set_exception(exception)
+        else:
+            for page, (ok, value) in zip(batch, batch_future.result()):
+                if page.future.done():
+                    continue
+                if ok:
+                    page.future.set_result(value)
+                else:
+                    page.future.set_exception(value)
+        self._dispatch()
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+def _run_batch(calls: List[FinderCall]) -> List[Tuple[bool, Any]]:
+    """Run finder calls in a worker process
+
+    Returns (True, result) or (False, exception) for each call.
+    """
+    results: List[Tuple[bool, Any]] = []
+    for function, content, base_url, headers in calls:
+        try:
+            results.append((True, function(content, base_url, headers)))
+        except Exception as e:
+            results.append((False, e))
+    return results
+
+
+# The pool of the running Freezer
+current_finder_pool: contextvars.ContextVar[FinderPool] = (
+    contextvars.ContextVar('current_finder_pool')
+)
+
+# Pool used when finders are called outside a Freezer, created when needed
+_default_finder_pool: Optional[FinderPool] = None
+
+
+def get_finder_pool() -> FinderPool:
+    """Get the finder pool of the running Freezer, or a default pool"""
+    global _default_finder_pool
+    try:
+        return current_finder_pool.get()
+    except LookupError:
+        if _default_finder_pool is None:
+            _default_finder_pool = FinderPool()
+        return _default_finder_pool
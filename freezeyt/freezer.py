@@ -1,12 +1,16 @@
 from pathlib import Path, PurePosixPath
-import functools
 import dataclasses
+import collections
 from typing import Callable, Optional, Mapping, Set, Generator, Dict, Union
-from typing import Tuple, List, TypeVar, Any, Iterable, cast
+from typing import Tuple, List, TypeVar, Any, Iterable, Deque, Hashable, cast
+from typing import Iterator, FrozenSet, AbstractSet
 import asyncio
 import inspect
+import hashlib
+import io
 import re
 import os
+import time
 
 from werkzeug.datastructures import Headers
 from werkzeug.http import parse_options_header, parse_list_header
@@ -17,16 +21,26 @@ from freezeyt.encoding import decode_input_path
 from freezeyt.encoding import encode_file_path
 from freezeyt.filesaver import FileSaver
 from freezeyt.dictsaver import DictSaver
+from freezeyt.archivesaver import ArchiveSaver
+from freezeyt.sqlitesaver import SQLiteSaver, DEFAULT_BATCH_SIZE
+from freezeyt.s3saver import S3Saver
+from freezeyt.precompress import Precompressor
+from freezeyt.mimetype_check import MimetypeChecker
 from freezeyt.util import import_variable_from_module
 from freezeyt.util import InfiniteRedirection, ExternalURLError
 from freezeyt.util import UnexpectedStatus, MultiError, TaskStatus
+from freezeyt.util import LRUCache, CacheInfo
 from freezeyt.urls import AppURL, PrefixURL
 from freezeyt.compat import warnings_warn, WSGIApplication
 from freezeyt import hooks
-from freezeyt.saver import Saver
+from freezeyt.saver import Saver, ContentStream
 from freezeyt.asgi_middleware import ASGIMiddleware
-from freezeyt.types import UrlFinder, ActionFunction
+from freezeyt.types import UrlFinder, UrlFinderParser, ActionFunction
 from freezeyt.extra_files import get_extra_files, get_url_parts_from_directory
+from freezeyt.incremental import Manifest, ManifestEntry
+from freezeyt.finder_pool import FinderPool, current_finder_pool
+from freezeyt.concurrency import ConcurrencyLimit
+from freezeyt.profiling import AppProfiler
 from freezeyt.types import Config, SaverResult, asgi_types, AnyApp
 
 
@@ -36,6 +50,12 @@ MAX_RUNNING_TASKS = 100
 # 3 digits, or 1 digit and 'xx'.
 STATUS_KEY_RE = re.compile('^[0-9]([0-9]{2}|xx)$')
 
+# Links that start with a URL scheme, like "https:"
+URL_SCHEME_RE = re.compile('^[a-zA-Z][a-zA-Z0-9+.-]*:')
+
+# Default number of entries in each of the URL caches
+DEFAULT_URL_CACHE_SIZE = 10_000
+
 
 def freeze(app: Optional[WSGIApplication], config: Config) -> SaverResult:
     return asyncio.run(freeze_async(app, config))
@@ -46,6 +66,7 @@ async def freeze_async(
     config: Config,
 ) -> SaverResult:
     freezer = Freezer(app, config)
+    finder_pool_token = current_finder_pool.set(freezer.finder_pool)
     try:
         await freezer.prepare()
         freezer.call_hook('start', freezer.freeze_info)
@@ -54,7 +75,13 @@ async def freeze_async(
         return await freezer.finish()
     except:
         await freezer.cancel_tasks()
+        await freezer.abort()
         raise
+    finally:
+        current_finder_pool.reset(finder_pool_token)
+        if freezer.app_profiler is not None:
+            freezer.app_profiler.save()
+        freezer.shutdown()
 
 
 DEFAULT_URL_FINDERS = {
@@ -131,17 +158,114 @@ class Response:
     status: str
 
 
-@dataclasses.dataclass
+class Reasons:
+    """Explanations of why a page is being frozen
+
+    Free-form reasons are kept as strings. Reasons that name another page,
+    like "linked from: index.html", are kept as the label and the path of
+    that page (which is shared with its task), and only formatted
+    when iterated over. A page linked from every page of the site
+    would otherwise keep a formatted string for each of them.
+    """
+    __slots__ = ('_texts', '_sources')
+
+    _texts: Optional[Set[str]]
+    _sources: Optional[Dict[str, Set[PurePosixPath]]]
+
+    def __init__(self, texts: Iterable[str] = ()):
+        self._texts = None
+        self._sources = None
+        for text in texts:
+            self.add(text)
+
+    def add(self, text: str) -> None:
+        if self._texts is None:
+            self._texts = set()
+        self._texts.add(text)
+
+    def add_source(self, label: str, path: PurePosixPath) -> None:
+        """Add a reason in the form "<label>: <path>\""""
+        if self._sources is None:
+            self._sources = {}
+        self._sources.setdefault(label, set()).add(path)
+
+    def __iter__(self) -> Iterator[str]:
+        texts = self._texts or set()
+        yield from texts
+        for label, paths in (self._sources or {}).items():
+            for path in paths:
+                text = f'{label}: {path}'
+                if text not in texts:
+                    yield text
+
+    def __len__(self) -> int:
+        return sum(1 for reason in self)
+
+    def __repr__(self) -> str:
+        return f'<Reasons {sorted(self)}>'
+
+
+# Shared (empty) default of Task.urls_redirecting_to_self
+NO_URLS: FrozenSet[AppURL] = frozenset()
+
+
 class Task:
+    """A page to freeze
+
+    Large sites have many tasks, so they are kept small: attributes are
+    in __slots__, and reasons are stored compactly (see Reasons).
+    """
+    __slots__ = (
+        'path', 'urls', 'freezer', 'response', 'redirects_to', 'reasons',
+        'urls_redirecting_to_self', 'exception', 'status', 'queued_at',
+        'timings',
+    )
+
     path: PurePosixPath
     urls: "Set[AppURL]"
     freezer: "Freezer"
-    response: Optional[Response] = None
-    redirects_to: "Optional[Task]" = None
-    reasons: set = dataclasses.field(default_factory=set)
-    asyncio_task: "Optional[FreezeytAsyncioTask]" = None
-    urls_redirecting_to_self: set = dataclasses.field(default_factory=set)
-    exception: Optional[Exception] = None
+    response: Optional[Response]
+    redirects_to: "Optional[Task]"
+    reasons: Reasons
+    urls_redirecting_to_self: "AbstractSet[AppURL]"
+    exception: Optional[Exception]
+    # Kept in sync with the freezer's task collections by update_status
+    status: TaskStatus
+    # When the task was created (by time.perf_counter)
+    queued_at: float
+    # Durations of the phases of handling the task, in seconds
+    # (see TaskInfo.timings)
+    timings: Dict[str, float]
+
+    def __init__(
+        self,
+        path: PurePosixPath,
+        urls: "Set[AppURL]",
+        freezer: "Freezer",
+        response: Optional[Response] = None,
+        redirects_to: "Optional[Task]" = None,
+        reasons: Iterable[str] = (),
+        urls_redirecting_to_self: "AbstractSet[AppURL]" = NO_URLS,
+        exception: Optional[Exception] = None,
+        status: TaskStatus = TaskStatus.IN_PROGRESS,
+        queued_at: Optional[float] = None,
+        timings: Optional[Dict[str, float]] = None,
+    ):
+        self.path = path
+        self.urls = urls
+        self.freezer = freezer
+        self.response = response
+        self.redirects_to = redirects_to
+        self.reasons = Reasons(reasons)
+        self.urls_redirecting_to_self = urls_redirecting_to_self
+        self.exception = exception
+        self.status = status
+        if queued_at is None:
+            queued_at = time.perf_counter()
+        self.queued_at = queued_at
+        if timings is None:
+            timings = {}
+        self.timings = timings
 
     def __repr__(self) -> str:
         return f"<Task for {self.path}, {self.status.name}>"
@@ -149,18 +273,22 @@ class Task:
     def add_url(self, url: AppURL) -> None:
         self.urls.add(url)
 
+    def add_url_redirecting_to_self(self, url: AppURL) -> None:
+        if not self.urls_redirecting_to_self:
+            self.urls_redirecting_to_self = set()
+        assert isinstance(self.urls_redirecting_to_self, set)
+        self.urls_redirecting_to_self.add(url)
+
     def get_a_url(self) -> AppURL:
         """Get an arbitrary one of the task's URLs."""
         # we need to ensure that get_a_url() will get the right one
         # when there are urls redirection to itself
-        return next(iter(self.urls - self.urls_redirecting_to_self))
-
-    @property
-    def status(self) -> TaskStatus:
-        for status, collection in self.freezer.task_collections.items():
-            if self.path in collection:
-                return status
-        raise ValueError(f'Task not registered with freezer: {self}')
+        if not self.urls_redirecting_to_self:
+            return next(iter(self.urls))
+        for url in self.urls:
+            if url not in self.urls_redirecting_to_self:
+                return url
+        raise LookupError(f'{self} has no URL that is not a redirect')
 
     def update_status(self, old_status, new_status):
         assert self.status == old_status
@@ -169,6 +297,7 @@ class Task:
         new_collection = self.freezer.task_collections[new_status]
         assert self.path not in new_collection
         new_collection[self.path] = self
+        self.status = new_status
 
     def fail(self, exception):
         if self.freezer.fail_fast:
@@ -181,14 +310,6 @@ class Task:
         self.update_status(self.status, TaskStatus.FAILED)
         self.freezer.call_hook('page_failed', hooks.TaskInfo(self))
 
-class FreezeytAsyncioTask(asyncio.Task):
-    """
-    asyncio.Task with an extra attribute to store the underlying freezeyt Task.
-
-    For typing only.
-    """
-    freezeyt_task: Task
-
 class IsARedirect(BaseException):
     """Raised when a page redirects and freezing it should be postponed"""
 
@@ -201,16 +322,6 @@ class IgnorePage(BaseException):
 class VersionMismatch(ValueError):
     """Raised when major version in config is not correct"""
 
-def needs_semaphore(func):
-    """Decorator for a "task" method that holds self.semaphore when running"""
-    @functools.wraps(func)
-    async def wrapper(self, *args, **kwargs):
-        async with self.semaphore:
-            result = await func(self, *args, **kwargs)
-        return result
-    return wrapper
-
-
 TaskCollection = Dict[PurePosixPath, Task]
 ExtraPagesConfig = Union[
     Dict[str, Union[Generator, str]],
@@ -222,6 +333,7 @@ ExtraPagesConfig = Union[
 class Freezer:
     config: Config
     saver: Saver
+    tasks: TaskCollection
     task_collections: Dict[TaskStatus, TaskCollection]
     done_tasks: TaskCollection
     redirecting_tasks: TaskCollection
@@ -232,8 +344,15 @@ class Freezer:
     url_to_path: Callable[[str], str]
     fail_fast: bool
     prefix: PrefixURL
+    manifest: Optional[Manifest]
+    stale_paths: Set[PurePosixPath]
 
     url_finders: Dict[str, UrlFinder]
+    finder_pool: FinderPool
+    concurrency: ConcurrencyLimit
+    app_profiler: Optional[AppProfiler]
+    join_cache: 'LRUCache[Hashable, Union[AppURL, ExternalURLError]]'
+    path_cache: 'LRUCache[str, PurePosixPath]'
     status_handlers: Dict[str, ActionFunction]
 
     def __init__(self, app: Optional[AnyApp], config: Config):
@@ -317,6 +436,22 @@ class Freezer:
             _status_handlers, default_module='freezeyt.actions', label="Status handler"
         )
 
+        incremental = self.config.get('incremental')
+        if incremental is None:
+            self.manifest = None
+        else:
+            if not isinstance(incremental, dict):
+                incremental = {'manifest': incremental}
+            try:
+                manifest_path = incremental['manifest']
+            except KeyError:
+                raise ValueError("incremental manifest not specified")
+            self.manifest = Manifest(manifest_path, self.prefix)
+        self.stale_paths = set()
+
+        # Worker processes for URL finders are only started when needed
+        self.finder_pool = FinderPool.from_config(self.config)
+
         output = self.config['output']
         if not isinstance(output, dict):
             output = {'type': 'dir', 'dir': output}
@@ -328,14 +463,59 @@ class Freezer:
                 output_dir = output['dir']
             except KeyError:
                 raise ValueError("output directory not specified")
-            self.saver = FileSaver(Path(output_dir), self.prefix)
+            precompress = None
+            precompress_config = output.get('precompress')
+            if precompress_config is not None:
+                precompress = Precompressor.from_config(
+                    precompress_config,
+                    MimetypeChecker(self.config).guess_mimetype,
+                )
+            self.saver = FileSaver(
+                Path(output_dir),
+                self.prefix,
+                incremental=self.manifest is not None,
+                dedup=output.get('dedup'),
+                precompress=precompress,
+                writers=output.get('writers'),
+                restore_on_failure=output.get('restore_on_failure', False),
+            )
+        elif output['type'] in ('zip', 'tar'):
+            try:
+                output_file = output['file']
+            except KeyError:
+                raise ValueError("output file not specified")
+            self.saver = ArchiveSaver(
+                Path(output_file),
+                output['type'],
+                compression=output.get('compression'),
+            )
+        elif output['type'] == 'sqlite':
+            try:
+                output_file = output['file']
+            except KeyError:
+                raise ValueError("output file not specified")
+            self.saver = SQLiteSaver(
+                Path(output_file),
+                self.prefix,
+                MimetypeChecker(self.config).guess_mimetype,
+                batch_size=output.get('batch_size', DEFAULT_BATCH_SIZE),
+            )
+        elif output['type'] == 's3':
+            self.saver = S3Saver.from_config(
+                output, MimetypeChecker(self.config).guess_mimetype,
+            )
         else:
             raise ValueError(f"unknown output type {output['type']}")
+        # Whether saver.prepare() and saver.finish() were called
+        self.saver_prepared = False
+        self.saver_finished = False
 
         self.warnings: List[str] = []
         # The tasks for individual pages are tracked in the followng sets
         # (actually dictionaries: {task.path: task})
-        # Each task must be in exactly in one of these.
+        # Each task must be in exactly in one of these, matching its status.
+        # All tasks are also in `self.tasks`.
+        self.tasks = {}
         self.done_tasks = {}
         self.redirecting_tasks = {}
         self.inprogress_tasks = {}
@@ -363,7 +543,37 @@ class Freezer:
                 plugin = import_variable_from_module(plugin)
             plugin(self.freeze_info)
 
-        self.semaphore = asyncio.Semaphore(MAX_RUNNING_TASKS)
+        self.concurrency = ConcurrencyLimit.from_config(
+            self.config.get('concurrency'), default=MAX_RUNNING_TASKS,
+        )
+
+        # Links (like navigation) repeat on many pages. Remember the
+        # results of joining them, and the paths for URLs.
+        url_cache_size = self.config.get(
+            'url_cache_size', DEFAULT_URL_CACHE_SIZE,
+        )
+        self.join_cache = LRUCache(url_cache_size)
+        self.path_cache = LRUCache(url_cache_size)
+
+        profile_app = self.config.get('profile_app')
+        if profile_app is None:
+            self.app_profiler = None
+        else:
+            if self.config.get('wsgi_pool') is not None:
+                raise ValueError('profile_app cannot be used with wsgi_pool')
+            self.app_profiler = AppProfiler.from_config(profile_app)
+
+        # Scheduling: in-progress tasks that weren't started yet wait
+        # in `task_queue`. Worker coroutines take tasks from the queue.
+        # There are as many workers as the concurrency limit allows.
+        self.task_queue: Deque[Task] = collections.deque()
+        self.workers: Set[asyncio.Task] = set()
+        # Resolved when all workers are done, or failed when one fails
+        self.workers_done: Optional[asyncio.Future] = None
+        # Number of tasks being handled by workers
+        self.running_task_count = 0
+        # Set when workers should check the queue again
+        self.queue_changed = asyncio.Event()
 
 
     def check_version(self, config_version: Union[str, int, None]) -> None:
@@ -398,24 +608,48 @@ class Freezer:
     def add_hook(self, hook_name: str, func: Callable) -> None:
         self.hooks.setdefault(hook_name, []).append(func)
 
+    def shutdown(self) -> None:
+        """Release resources like worker pools"""
+        self.saver.shutdown()
+        self.app.shutdown()
+        self.finder_pool.shutdown()
+
     async def cancel_tasks(self) -> None:
-        cancelled_atasks = []
-        while self.inprogress_tasks:
-            path, task = self.inprogress_tasks.popitem()
-            assert task.asyncio_task is not None
-            task.asyncio_task.cancel()
-            cancelled_atasks.append(task.asyncio_task)
-        for atask in cancelled_atasks:
+        self.task_queue.clear()
+        workers = list(self.workers)
+        for worker in workers:
+            worker.cancel()
+        for worker in workers:
             try:
-                await atask
+                await worker
             except asyncio.CancelledError:
                 pass
+            except Exception:
+                # The error is reported by handle_urls
+                pass
+        self.workers.clear()
+
+    async def abort(self) -> None:
+        """Let the saver clean up after a freeze stopped by an exception
+
+        This is a failed freeze, so (depending on `cleanup`) the incomplete
+        output is removed, or the saver's previous output is restored.
+        Nothing is done if the saver wasn't prepared, or was already
+        finished.
+        """
+        if not self.saver_prepared or self.saver_finished:
+            return
+        self.saver_finished = True
+        await self.saver.finish(False, self.config.get("cleanup", True))
 
     async def finish(self) -> SaverResult:
         success = not self.failed_tasks
         cleanup = self.config.get("cleanup", True)
+        self.saver_finished = True
         result = await self.saver.finish(success, cleanup)
         if success:
+            if self.manifest is not None:
+                self.manifest.save()
             self.call_hook('success', self.freeze_info)
 
             for task in self.done_tasks.values():
@@ -439,49 +673,89 @@ class Freezer:
         url: AppURL,
         *,
         reason: Optional[str] = None,
+        source: Optional[Task] = None,
     ) -> Optional[Task]:
         """Add a task to freeze the given URL
 
+        If `source` is given, the reason is "<reason>: <source path>".
+
         If no task is added (e.g. for external URLs), return None.
         """
-        task = self._add_task(url, reason=reason)
-        if task and task.asyncio_task is None:
-            coroutine = self.handle_one_task(task)
-            task.asyncio_task = cast(
-                FreezeytAsyncioTask,
-                asyncio.create_task(
-                    coroutine,
-                    name=str(task.path),
-                ),
-            )
-            task.asyncio_task.freezeyt_task = task
-        return task
-
-    def _add_task(
-        self,
-        url: AppURL,
-        *,
-        reason: Optional[str] = None,
-    ) -> Optional[Task]:
-        path = get_path_from_url(url, self.url_to_path)
+        path = self.get_path(url)
 
-        for collection in self.task_collections.values():
-            if path in collection:
-                task = collection[path]
-                task.add_url(url)
-                break
+        task = self.tasks.get(path)
+        if task is not None:
+            task.add_url(url)
         else:
-            # The `else` branch is entered if the loop ended normally
-            # (not with `break`, or exception, return, etc.)
-            # Here, this means the task wasn't found.
             task = Task(path, {url}, self)
+            self.tasks[path] = task
             self.inprogress_tasks[path] = task
-        if reason:
+            self.task_queue.append(task)
+            self.queue_changed.set()
+        if source is not None:
+            assert reason
+            task.reasons.add_source(reason, source.path)
+        elif reason:
             task.reasons.add(reason)
         return task
 
+    def mark_stale(self, url: AppURL) -> None:
+        """Mark a page as stale, so it isn't kept from a previous freeze"""
+        self.stale_paths.add(self.get_path(url))
+
+    def get_path(self, url: AppURL) -> PurePosixPath:
+        """Return the path a URL is saved to (see get_path_from_url)"""
+        return self.path_cache.get(
+            url.relative_path,
+            lambda: get_path_from_url(url, self.url_to_path),
+        )
+
+    def join_url(self, url: AppURL, link_text: str) -> AppURL:
+        """Return url.join(link_text), using a cache
+
+        Raises ExternalURLError if the link is outside the prefix.
+        """
+        # The result of some links doesn't depend on the whole base URL,
+        # so their cache entries can be shared by all pages.
+        # (The scheme and host of all AppURLs are the same as the prefix's.)
+        key: Hashable
+        if link_text.startswith('/') and not link_text.startswith('//'):
+            key = ('/', link_text)
+        elif URL_SCHEME_RE.match(link_text):
+            key = (':', link_text)
+        else:
+            key = (url.relative_path, url.query, link_text)
+
+        def join() -> Union[AppURL, ExternalURLError]:
+            try:
+                return url.join(link_text)
+            except ExternalURLError as e:
+                return e
+
+        result = self.join_cache.get(key, join)
+        if isinstance(result, ExternalURLError):
+            # Raise a new exception, so the cached one doesn't collect
+            # tracebacks
+            raise type(result)(*result.args)
+        return result
+
+    def cache_info(self) -> Dict[str, CacheInfo]:
+        return {
+            'url_join': self.join_cache.info(),
+            'url_to_path': self.path_cache.info(),
+        }
+
     async def prepare(self) -> None:
         """Preparatory method for creating tasks and preparing the saver."""
+        # find pages that need to be frozen again
+        incremental = self.config.get('incremental')
+        if isinstance(incremental, dict):
+            stale_pages = cast(
+                ExtraPagesConfig, incremental.get('stale_pages', ()),
+            )
+            for url in self._get_urls_from_config(stale_pages, 'stale_pages'):
+                self.mark_stale(url)
+
         # prepare the tasks
         self.add_task(self.prefix.as_app_url(), reason='site root (homepage)')
         for url_part, kind, content_or_path in get_extra_files(self.config):
@@ -512,7 +786,8 @@ class Freezer:
         self._add_extra_pages(self.extra_pages)
 
         # and at the end prepare the saver
-        return await self.saver.prepare()
+        await self.saver.prepare()
+        self.saver_prepared = True
 
     async def raise_for_status_action(
         self,
@@ -536,13 +811,11 @@ class Freezer:
             location = None
         if location is not None:
             try:
-                redirect_url = url.join(location)
+                redirect_url = self.join_url(url, location)
             except ExternalURLError:
                 pass
             else:
-                redirect_path = get_path_from_url(
-                    redirect_url, self.url_to_path,
-                )
+                redirect_path = self.get_path(redirect_url)
                 # compare if source path and final path of redirect are same
                 # If they are, apply special logic: consider the target of
                 # the redirection as the page we're supposed to save.
@@ -558,7 +831,7 @@ class Freezer:
                     # loop and will probably fail later.)
                     if redirect_url not in task.urls_redirecting_to_self:
                         task.add_url(redirect_url)
-                        task.urls_redirecting_to_self.add(url)
+                        task.add_url_redirecting_to_self(url)
                         task.response = None  # Ignore this response
                         raise RedirectToSamePath()
 
@@ -608,6 +881,26 @@ class Freezer:
     ) -> None:
         """Add URLs of extra pages from config.
 
+        Handles both literal URLs and generators.
+        """
+        for url in self._get_urls_from_config(extras, 'extra_pages'):
+            try:
+                self.add_task(
+                    url,
+                    reason='extra page',
+                )
+            except ExternalURLError:
+                raise ExternalURLError(
+                    f'External URL specified in extra_pages: {url}'
+                )
+
+    def _get_urls_from_config(
+        self,
+        extras: ExtraPagesConfig,
+        config_key: str,
+    ) -> Generator[AppURL, None, None]:
+        """Get URLs from a config entry like extra_pages.
+
         Handles both literal URLs and generators.
         """
         for extra in extras:
@@ -616,57 +909,117 @@ class Freezer:
                     generator = extra['generator']
                 except KeyError:
                     raise ValueError(
-                        'extra_pages must be strings or dicts with '
+                        f'{config_key} must be strings or dicts with '
                         + f'a "generator" key, not `{extra}`'
                     )
                 if isinstance(generator, str):
                     generator = import_variable_from_module(generator)
-                self._add_extra_pages(generator(self.user_app))
+                yield from self._get_urls_from_config(
+                    generator(self.user_app), config_key,
+                )
             elif isinstance(extra, str):
                 if extra.startswith('/'):
                     warnings_warn(
-                        f'extra page URL must not start with slash: {extra!r}',
+                        f'{config_key} URL must not start with slash: {extra!r}',
                         DeprecationWarning,
                         skip_file_prefixes=(
                             os.path.dirname(__file__),
                             os.path.dirname(asyncio.__file__),
                         ),
                     )
-                url = self.prefix.join(decode_input_path(extra))
-                try:
-                    self.add_task(
-                        url,
-                        reason='extra page',
-                    )
-                except ExternalURLError:
-                    raise ExternalURLError(
-                        f'External URL specified in extra_pages: {url}'
-                    )
+                yield self.prefix.join(decode_input_path(extra))
             else:
                 generator = extra
-                self._add_extra_pages(generator(self.user_app))
+                yield from self._get_urls_from_config(
+                    generator(self.user_app), config_key,
+                )
 
     async def handle_urls(self) -> None:
-        while self.inprogress_tasks:
-            done, pending = await asyncio.wait(
-                {t.asyncio_task for t in self.inprogress_tasks.values()
-                 if t.asyncio_task},
-                return_when=asyncio.FIRST_COMPLETED,
+        """Handle all queued tasks, and tasks they add
+
+        At most `self.concurrency.limit` tasks are handled at once.
+        """
+        self.workers_done = asyncio.get_running_loop().create_future()
+        self.start_workers()
+        lag_monitor = None
+        if self.concurrency.adaptive:
+            lag_monitor = asyncio.create_task(
+                self.concurrency.monitor_loop_lag(), name='loop lag monitor',
             )
-            for done_asyncio_task in done:
-                task = done_asyncio_task.freezeyt_task
-                assert task.asyncio_task is done_asyncio_task
+        try:
+            await self.workers_done
+        finally:
+            if lag_monitor is not None:
+                lag_monitor.cancel()
+
+    def start_workers(self) -> None:
+        """Start workers up to the concurrency limit"""
+        while len(self.workers) < self.concurrency.limit:
+            worker = asyncio.create_task(
+                self.run_worker(), name=f'worker {len(self.workers)}',
+            )
+            self.workers.add(worker)
+            worker.add_done_callback(self._worker_done)
+
+    def _worker_done(self, worker: asyncio.Task) -> None:
+        self.workers.discard(worker)
+        if self.workers_done is None or self.workers_done.done():
+            return
+        if worker.cancelled():
+            return
+        exception = worker.exception()
+        if exception is not None:
+            self.workers_done.set_exception(exception)
+        elif not self.workers:
+            self.workers_done.set_result(None)
 
+    async def run_worker(self) -> None:
+        """Handle tasks from the queue until all tasks are handled
+
+        The worker also stops if there are more workers than the
+        concurrency limit allows.
+        """
+        while True:
+            if len(self.workers) > self.concurrency.limit:
+                # Retire this worker. Leave the set right away, so other
+                # workers don't retire too.
+                current_task = asyncio.current_task()
+                assert current_task is not None
+                self.workers.discard(current_task)
+                return
+            while not self.task_queue:
+                if self.running_task_count == 0:
+                    # Nothing is queued, and no running task can add more
+                    self.queue_changed.set()
+                    return
+                self.queue_changed.clear()
+                await self.queue_changed.wait()
+            task = self.task_queue.popleft()
+            self.running_task_count += 1
+            started = time.perf_counter()
+            task.timings['queue'] = started - task.queued_at
+            try:
                 try:
-                    await task.asyncio_task
+                    await self.handle_one_task(task)
                 except Exception as exc:
+                    task.timings['total'] = time.perf_counter() - started
                     task.fail(exc)
-                if task.path in self.inprogress_tasks:
+                else:
+                    task.timings['total'] = time.perf_counter() - started
+                if task.status == TaskStatus.IN_PROGRESS:
                     raise ValueError(
                         f'{task} is in_progress after it was handled')
+            finally:
+                self.running_task_count -= 1
+                self.queue_changed.set()
+            if len(self.workers) < self.concurrency.limit:
+                self.start_workers()
 
-    @needs_semaphore
     async def handle_one_task(self, task: Task) -> None:
+        if self.manifest is not None:
+            if await self.keep_previous_page(task):
+                return
+
         # Get an URL from the task's set of URLs
         url = task.get_a_url()
 
@@ -710,6 +1063,9 @@ class Freezer:
         }
 
         sent_request = False
+        # For timings: when the app was called, and when it started
+        # the response
+        started = body_started = time.perf_counter()
 
         async def receive():
             """The app calls this to receive the next event.
@@ -725,15 +1081,34 @@ class Freezer:
                 # Wait forever
                 await asyncio.Future()
 
-        response_body = []
+        # The body is passed to the saver as the app sends it
+        content = ContentStream()
+        save_task: Optional[asyncio.Task] = None
+        content_hash = hashlib.sha256()
         done: asyncio.Future = asyncio.Future()
 
+        # URLs found in the page (also used for the incremental freezing
+        # manifest)
+        found_urls: Dict[AppURL, None] = {}
+
+        # Link finding: the page body is either fed to a streaming URL
+        # finder as it comes, or collected for a non-streaming finder.
+        # Links found by the streaming finder are only followed after
+        # the page is saved.
+        url_finder: Optional[UrlFinder] = None
+        link_parser: Optional[UrlFinderParser] = None
+        finder_body: List[bytes] = []
+        streamed_links: List[str] = []
+
         async def send(event):
             """The app calls this to send the next event to Freezeyt.
             """
+            nonlocal save_task, url_finder, link_parser, body_started
             if event['type'] == "http.response.start":
                 if task.response is not None:
                     raise AssertionError('App started a response twice')
+                body_started = time.perf_counter()
+                task.timings['app'] = body_started - started
                 headers = Headers(
                     (key.decode('latin-1'), value.decode('latin-1'))
                     for key, value in event.get('headers', [])
@@ -746,18 +1121,54 @@ class Freezer:
                 await self.raise_for_status_action(task, url, status, headers)
                 if event.get('trailers'):
                     raise NotImplementedError('trailers not supported')
+                # The page should be saved
+                save_task = asyncio.create_task(
+                    self.saver.save_to_filename(task.path, content),
+                    name=f"save: {task.path}",
+                )
+                save_task.add_done_callback(lambda t: content.abandon())
+                url_finder = self.get_url_finder(task)
+                start_streaming = getattr(url_finder, 'stream', None)
+                if start_streaming is not None:
+                    link_parser = start_streaming(
+                        url_string, task.response.headers.to_wsgi_list(),
+                    )
             elif event['type'] == "http.response.body":
-                response_body.append(event.get('body', b''))
+                if task.response is None:
+                    raise AssertionError('App sent body before response start')
+                body = event.get('body', b'')
+                if self.manifest is not None:
+                    content_hash.update(body)
+                if link_parser is not None:
+                    if body:
+                        streamed_links.extend(link_parser.feed(body))
+                elif url_finder is not None:
+                    finder_body.append(body)
+                await content.put(body)
                 if not event.get('more_body', False):
+                    content.close()
                     done.set_result(True)
+                    task.timings['body'] = time.perf_counter() - body_started
+
+        app_call = self.app(scope, receive, send)
+        profiler = self.app_profiler
+        if profiler is not None and profiler.should_profile(path_info):
+            app_call = profiler.wrap(path_info, app_call)
 
         try:
-            app_task = asyncio.create_task(
-                self.app(scope, receive, send),
-                name=f"freeze: {url}",
-            )
-            await app_task
-            await done
+            app_task = asyncio.create_task(app_call, name=f"freeze: {url}")
+            try:
+                await app_task
+                await done
+            except BaseException as exc:
+                if save_task is not None:
+                    # Don't save an incomplete page
+                    content.fail(exc)
+                    try:
+                        await save_task
+                    except BaseException:
+                        pass
+                raise
         except IsARedirect:
             return
         except IgnorePage:
@@ -766,22 +1177,22 @@ class Freezer:
         except RedirectToSamePath:
             return await self.handle_one_task(task)
 
-        await self.saver.save_to_filename(task.path, response_body)
+        assert save_task is not None
+        save_started = time.perf_counter()
+        await save_task
+        links_started = time.perf_counter()
+        task.timings['save'] = links_started - save_started
+        self.concurrency.record_latency(links_started - started)
 
         assert task.response is not None
-        finder_name = task.response.headers.get('Freezeyt-URL-Finder')
-        url_finder: Union[UrlFinder, None]
-        if finder_name is not None:
-            url_finder = import_variable_from_module(
-                finder_name,
-                default_module_name='freezeyt.url_finders',
-            )
-        else:
-            content_type = task.response.headers.get('Content-Type')
-            mime_type, encoding = parse_options_header(content_type)
-            url_finder = self.url_finders.get(mime_type)
-        if url_finder is not None:
-            with await self.saver.open_filename(task.path) as f:
+        if link_parser is not None:
+            streamed_links.extend(link_parser.close())
+            self.add_found_links(task, url, streamed_links, found_urls)
+        elif url_finder is not None:
+            # Give the finder the body we already have, rather than
+            # reading the saved file
+            with io.BytesIO(b''.join(finder_body)) as f:
+                del finder_body[:]
                 finder_result = url_finder(
                     f, url_string, task.response.headers.to_wsgi_list()
                 )
@@ -794,17 +1205,67 @@ class Freezer:
                     async for link in links:
                         new_links.append(link)
                     links = new_links
-                for link_text in links:
-                    try:
-                        new_url = url.join(link_text)
-                    except ExternalURLError:
-                        pass
-                    else:
-                        self.add_task(
-                            new_url,
-                            reason=f'linked from: {task.path}',
-                        )
+                self.add_found_links(task, url, links, found_urls)
+
+        self.add_link_header_tasks(task, url)
+        task.timings['links'] = time.perf_counter() - links_started
+
+        if self.manifest is not None:
+            self.manifest.record(task.path, ManifestEntry(
+                url=url_string,
+                sha256=content_hash.hexdigest(),
+                stat=await self.saver.stat_filename(task.path),
+                status=task.response.status,
+                headers=task.response.headers.to_wsgi_list(),
+                links=[str(u) for u in found_urls],
+            ))
+
+        task.update_status(TaskStatus.IN_PROGRESS, TaskStatus.DONE)
+
+        hooks_started = time.perf_counter()
+        self.call_hook('page_frozen', hooks.TaskInfo(task))
+        task.timings['hooks'] = time.perf_counter() - hooks_started
+
+    def get_url_finder(self, task: Task) -> Optional[UrlFinder]:
+        """Get the URL finder for a task's response, if any"""
+        assert task.response is not None
+        finder_name = task.response.headers.get('Freezeyt-URL-Finder')
+        if finder_name is not None:
+            return import_variable_from_module(
+                finder_name,
+                default_module_name='freezeyt.url_finders',
+            )
+        else:
+            content_type = task.response.headers.get('Content-Type')
+            mime_type, encoding = parse_options_header(content_type)
+            return self.url_finders.get(mime_type)
 
+    def add_found_links(
+        self,
+        task: Task,
+        url: AppURL,
+        links: Iterable[str],
+        found_urls: Dict[AppURL, None],
+    ) -> None:
+        """Add tasks for links found in a page
+
+        Internal URLs are recorded in `found_urls`.
+        """
+        for link_text in links:
+            try:
+                new_url = self.join_url(url, link_text)
+            except ExternalURLError:
+                pass
+            else:
+                self.add_task(
+                    new_url,
+                    reason='linked from', source=task,
+                )
+                found_urls[new_url] = None
+
+    def add_link_header_tasks(self, task: Task, url: AppURL) -> None:
+        """Add tasks for URLs in the Link headers of a task's response"""
+        assert task.response is not None
         if self.config.get('urls_from_link_headers', True):
             for link_header in task.response.headers.getlist('Link'):
                 for link in parse_list_header(link_header):
@@ -815,20 +1276,52 @@ class Freezer:
                     if not sep:
                         raise ValueError(f'Invalid Link header: {link!r}')
                     try:
-                        new_url = url.join(link_text)
+                        new_url = self.join_url(url, link_text)
                     except ExternalURLError:
                         pass
                     else:
                         self.add_task(
                             new_url,
-                            reason=f'Link header from: {task.path}',
+                            reason='Link header from', source=task,
                         )
 
+    async def keep_previous_page(self, task: Task) -> bool:
+        """Keep a page saved in a previous freeze, unless it is stale
+
+        Return true if the page was kept. In that case, links are taken
+        from the manifest instead of the page content.
+        """
+        assert self.manifest is not None
+        entry = self.manifest.get_previous(task.path)
+        if entry is None or task.path in self.stale_paths:
+            return False
+        if not await self.saver.keep_filename(
+            task.path, entry['sha256'], entry['stat'],
+        ):
+            return False
+        # If the file was touched but not changed, record the new
+        # modification time so it's not checked again in the next freeze
+        entry['stat'] = await self.saver.stat_filename(task.path)
+
+        task.response = Response(
+            headers=Headers(entry['headers']),
+            status=entry['status'],
+        )
+        for link in entry['links']:
+            self.add_task(
+                AppURL(link, self.prefix),
+                reason='linked from', source=task,
+            )
+        self.add_link_header_tasks(task, task.get_a_url())
+        self.manifest.record(task.path, entry)
+
         task.update_status(TaskStatus.IN_PROGRESS, TaskStatus.DONE)
 
+        hooks_started = time.perf_counter()
         self.call_hook('page_frozen', hooks.TaskInfo(task))
+        task.timings['hooks'] = time.perf_counter() - hooks_started
+        return True
 
-    @needs_semaphore
     async def handle_redirects(self) -> None:
         """Save copies of target pages for redirect_policy='follow'"""
         while self.redirecting_tasks:
@@ -842,8 +1335,9 @@ class Freezer:
                 if task.redirects_to.status != TaskStatus.DONE:
                     continue
 
-                with await self.saver.open_filename(task.redirects_to.path) as f:
-                    await self.saver.save_to_filename(task.path, f)
+                await self.saver.copy_filename(
+                    task.redirects_to.path, task.path,
+                )
                 self.call_hook('page_frozen', hooks.TaskInfo(task))
                 task.update_status(TaskStatus.REDIRECTING, TaskStatus.DONE)
                 saved_something = True
@@ -1,10 +1,12 @@
-from typing import Iterable, Callable, Optional, TYPE_CHECKING
+from typing import Iterable, Callable, Optional, Dict, TYPE_CHECKING
 
 from freezeyt.urls import AppURL
+from freezeyt.encoding import decode_input_path
 
 
 if TYPE_CHECKING:
     from freezeyt.freezer import Freezer, Task
+    from freezeyt.util import CacheInfo
 
 class TaskInfo:
     """Public information about a task that's being saved"""
@@ -37,6 +39,19 @@ class TaskInfo:
         """
         return sorted(self._task.reasons)
 
+    @property
+    def timings(self) -> Dict[str, float]:
+        """How long the phases of handling the page took, in seconds
+
+        Keys are 'queue' (waiting to be handled), 'app' (until the app
+        started the response), 'body' (receiving the body from the app),
+        'save' (finishing saving), 'links' (finding links), 'hooks'
+        (`page_frozen` hooks) and 'total' (all phases except 'queue').
+        Phases that weren't reached are missing; 'hooks' and 'total'
+        are only available after the `page_frozen` hooks are called.
+        """
+        return dict(self._task.timings)
+
 
 class FreezeInfo:
     """Public information about a freezer"""
@@ -50,15 +65,40 @@ class FreezeInfo:
     def add_hook(self, hook_name: str, func: Callable) -> None:
         self._freezer.add_hook(hook_name, func)
 
+    def mark_stale(self, url: str) -> None:
+        """Freeze the page again even if it was saved in a previous freeze
+
+        The URL is relative to the prefix, as in the `stale_pages` option
+        (an absolute URL within the prefix also works).
+        Only useful with incremental freezing, before the page is handled
+        (for example, in the `start` hook).
+        """
+        self._freezer.mark_stale(
+            self._freezer.prefix.join(decode_input_path(url)),
+        )
+
     @property
     def fail_fast(self) -> bool:
         return self._freezer.fail_fast
 
+    @property
+    def concurrency_limit(self) -> int:
+        """The number of pages that can be handled at once
+
+        With adaptive concurrency, this changes as the freeze goes on.
+        """
+        return self._freezer.concurrency.limit
+
+    def cache_info(self) -> Dict[str, 'CacheInfo']:
+        """Statistics of the freezer's caches, by name
+
+        Useful for tuning the `url_cache_size` option.
+        """
+        return self._freezer.cache_info()
+
     @property
     def total_task_count(self) -> int:
-        return sum(
-            len(tasks) for tasks in self._freezer.task_collections.values()
-        )
+        return len(self._freezer.tasks)
 
     @property
     def done_task_count(self) -> int:
@@ -0,0 +1,101 @@
+"""Support for incremental freezing
+
+A manifest records what was saved in a freeze: for each output path,
+the URL, a hash of the content, the size and modification time of the saved
+file, the response headers and the URLs of links found in the page.
+In the next freeze, pages that are not declared stale are not requested
+from the app again; their saved files are kept and the links are taken
+from the manifest.
+"""
+
+import os
+import json
+from pathlib import Path, PurePosixPath
+from typing import Dict, List, Optional, TypedDict, Union
+
+from freezeyt.compat import PathLike_str
+from freezeyt.types import WSGIHeaderList
+from freezeyt.urls import PrefixURL
+
+
+MANIFEST_VERSION = 1
+
+
+class FileStat(TypedDict):
+    """Size and modification time of a saved file"""
+    size: int
+    mtime_ns: int
+
+
+class ManifestEntry(TypedDict):
+    url: str
+    sha256: str
+    # None if the saver can't tell
+    stat: Optional[FileStat]
+    status: str
+    headers: WSGIHeaderList
+    links: List[str]
+
+
+class Manifest:
+    """Record of frozen pages, kept between freezes
+
+    path: the file the manifest is loaded from and saved to
+    prefix: the prefix of the current freeze. If the manifest was saved with
+        a different prefix, its entries are not used.
+    """
+    previous_entries: Dict[str, ManifestEntry]
+    entries: Dict[str, ManifestEntry]
+
+    def __init__(self, path: Union[str, PathLike_str], prefix: PrefixURL):
+        self.path = Path(path)
+        self.prefix = prefix
+        self.previous_entries = {}
+        self.entries = {}
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        if not isinstance(data, dict):
+            raise ValueError(f'{self.path} is not a freezeyt manifest')
+        if data.get('freezeyt_manifest') != MANIFEST_VERSION:
+            # Unknown format (or old version): do a full freeze
+            return
+        if data.get('prefix') != str(prefix):
+            # The URLs in the old manifest are not valid: do a full freeze
+            return
+        for filename, entry in data['pages'].items():
+            stat = entry.get('stat')
+            self.previous_entries[filename] = ManifestEntry(
+                url=entry['url'],
+                sha256=entry['sha256'],
+                stat=None if stat is None else FileStat(
+                    size=stat['size'],
+                    mtime_ns=stat['mtime_ns'],
+                ),
+                status=entry['status'],
+                headers=[(k, v) for k, v in entry['headers']],
+                links=list(entry['links']),
+            )
+
+    def get_previous(self, path: PurePosixPath) -> Optional[ManifestEntry]:
+        """Return the entry saved in the previous freeze, if any"""
+        return self.previous_entries.get(str(path))
+
+    def record(self, path: PurePosixPath, entry: ManifestEntry) -> None:
+        """Record an entry for the current freeze"""
+        self.entries[str(path)] = entry
+
+    def save(self) -> None:
+        """Save the entries of the current freeze"""
+        data = {
+            'freezeyt_manifest': MANIFEST_VERSION,
+            'prefix': str(self.prefix),
+            'pages': dict(sorted(self.entries.items())),
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=1)
+        os.replace(tmp_path, self.path)
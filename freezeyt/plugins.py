@@ -9,6 +9,7 @@ import click
 
 from freezeyt.hooks import FreezeInfo, TaskInfo
 from freezeyt.filesaver import FileSaver
+from freezeyt.stats import FreezeStats
 
 class GitCommandError(ValueError):
     """An exception occurred while executing git commands."""
@@ -63,6 +64,15 @@ class LogPlugin:
         if not task_info._freezer.freeze_info.fail_fast:
             traceback.print_exception(type(exc), exc, exc.__traceback__)
 
+class StatsPlugin:
+    def __init__(self, freeze_info: FreezeInfo):
+        self.stats = FreezeStats()
+        self.stats(freeze_info)
+        freeze_info.add_hook('success', self.print_report)
+
+    def print_report(self, freeze_info: FreezeInfo) -> None:
+        click.echo(self.stats.format_report(), file=sys.stderr)
+
 class GHPagesPlugin:
     def __init__(self, freeze_info: FreezeInfo):
         if freeze_info._freezer.prefix.path != "/":
@@ -0,0 +1,327 @@
+"""Compressed copies of saved files ("sidecars") for static servers
+
+For example, along with `index.html`, the FileSaver can write
+`index.html.gz` and `index.html.br`, which servers like nginx or CDNs
+can send to clients that accept compressed responses.
+"""
+
+import os
+import abc
+import zlib
+import fnmatch
+import concurrent.futures
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Iterable, List, Mapping
+from typing import Optional, Union
+
+
+# Filename extensions of the sidecars, by format name
+EXTENSIONS = {
+    'gzip': '.gz',
+    'br': '.br',
+    'zstd': '.zst',
+}
+
+# MIME types that are worth compressing, by default
+DEFAULT_MIME_TYPES = (
+    'text/*',
+    'application/javascript',
+    'application/json',
+    'application/ld+json',
+    'application/manifest+json',
+    'application/xml',
+    'application/*+xml',
+    'application/wasm',
+    'image/svg+xml',
+    'image/x-icon',
+    'image/vnd.microsoft.icon',
+    'font/ttf',
+    'font/otf',
+    'application/vnd.ms-fontobject',
+)
+
+# Files smaller than this (in bytes) are not compressed, by default
+DEFAULT_MIN_SIZE = 1024
+
+# Compression levels used by default. Pages are compressed as they're
+# saved, so these favor speed over the last few percent of size.
+DEFAULT_LEVELS = {
+    'gzip': 6,
+    'br': 5,
+    'zstd': 3,
+}
+
+# Lowest and highest compression level of each format
+LEVEL_RANGES = {
+    'gzip': (0, 9),
+    'br': (0, 11),
+    'zstd': (1, 22),
+}
+
+
+class _Compressor(abc.ABC):
+    """Incremental compressor for one format"""
+    @abc.abstractmethod
+    def compress(self, data: bytes) -> bytes:
+        """Compress a chunk of data; return compressed data, if any"""
+
+    @abc.abstractmethod
+    def flush(self) -> bytes:
+        """Return the rest of the compressed data"""
+
+
+class _GzipCompressor(_Compressor):
+    def __init__(self, level: int) -> None:
+        # wbits=31: zlib stream with a gzip header and trailer
+        self._compressobj = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressobj.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressobj.flush()
+
+
+class _BrotliCompressor(_Compressor):
+    def __init__(self, level: int) -> None:
+        import brotli
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _ZstdCompressor(_Compressor):
+    def __init__(self, level: int) -> None:
+        try:
+            # Python 3.14+
+            from compression import zstd  # type: ignore
+        except ImportError:
+            import zstandard
+            self._compressobj = zstandard.ZstdCompressor(
+                level=level,
+            ).compressobj()
+        else:
+            self._compressobj = zstd.ZstdCompressor(level=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressobj.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressobj.flush()
+
+
+_COMPRESSORS: Dict[str, Callable[[int], _Compressor]] = {
+    'gzip': _GzipCompressor,
+    'br': _BrotliCompressor,
+    'zstd': _ZstdCompressor,
+}
+
+
+def _check_format_available(format_name: str) -> None:
+    if format_name not in _COMPRESSORS:
+        raise ValueError(
+            f'unknown precompress format {format_name!r}; '
+            + f'use one of {", ".join(_COMPRESSORS)}'
+        )
+    try:
+        _COMPRESSORS[format_name](DEFAULT_LEVELS[format_name])
+    except ImportError:
+        package = {'br': 'brotli', 'zstd': 'zstandard'}[format_name]
+        raise ValueError(
+            f'precompress format {format_name!r} needs the '
+            + f'{package!r} package; install it, or install freezeyt '
+            + 'with the "precompress" extra: pip install freezeyt[precompress]'
+        )
+
+
+class Precompressor:
+    """Writes compressed sidecars of files saved by the FileSaver
+
+    formats: compression formats to use ('gzip', 'br', 'zstd')
+    guess_mimetype: function that returns the MIME type for a filename
+    min_size: files smaller than this (in bytes) are not compressed
+    mime_types: which files to compress. Either a list of MIME type
+        patterns (like 'text/*'), or a dict that maps patterns to lists
+        of formats to use for them. The first matching pattern is used.
+    workers: number of threads that compress the content
+    levels: compression levels, by format name. Formats not given here
+        use DEFAULT_LEVELS.
+    """
+    def __init__(
+        self,
+        formats: Iterable[str],
+        guess_mimetype: Callable[[str], str],
+        *,
+        min_size: int = DEFAULT_MIN_SIZE,
+        mime_types: Union[Iterable[str], Mapping[str, Iterable[str]]] = (
+            DEFAULT_MIME_TYPES
+        ),
+        workers: Optional[int] = None,
+        levels: Optional[Mapping[str, int]] = None,
+    ):
+        self.formats = list(formats)
+        for format_name in self.formats:
+            _check_format_available(format_name)
+        self.levels = dict(DEFAULT_LEVELS)
+        for format_name, level in (levels or {}).items():
+            if format_name not in self.formats:
+                raise ValueError(
+                    f'precompress level given for {format_name!r}, '
+                    + 'which is not listed in formats'
+                )
+            low, high = LEVEL_RANGES[format_name]
+            if not isinstance(level, int) or not low <= level <= high:
+                raise ValueError(
+                    f'precompress level for {format_name!r} must be '
+                    + f'an integer from {low} to {high}, not {level!r}'
+                )
+            self.levels[format_name] = level
+        self.guess_mimetype = guess_mimetype
+        self.min_size = min_size
+        self.mime_policy: Dict[str, List[str]]
+        if isinstance(mime_types, Mapping):
+            self.mime_policy = {
+                pattern: list(pattern_formats)
+                for pattern, pattern_formats in mime_types.items()
+            }
+            for pattern_formats in self.mime_policy.values():
+                for format_name in pattern_formats:
+                    if format_name not in self.formats:
+                        raise ValueError(
+                            f'precompress format {format_name!r} is not '
+                            + 'listed in formats'
+                        )
+        else:
+            self.mime_policy = {
+                pattern: self.formats for pattern in mime_types
+            }
+        self.workers = workers
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+
+    @classmethod
+    def from_config(
+        cls, config: Mapping, guess_mimetype: Callable[[str], str],
+    ) -> 'Precompressor':
+        """Create a Precompressor for the `precompress` output option"""
+        kwargs = {}
+        for key in 'min_size', 'mime_types', 'workers', 'levels':
+            if key in config:
+                kwargs[key] = config[key]
+        return cls(
+            config.get('formats', ['gzip']), guess_mimetype, **kwargs,
+        )
+
+    @property
+    def executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        # zlib, brotli and zstd release the GIL while compressing,
+        # so threads can compress in parallel
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                self.workers, thread_name_prefix='freezeyt-precompress',
+            )
+        return self._executor
+
+    @property
+    def extensions(self) -> List[str]:
+        return [EXTENSIONS[format_name] for format_name in self.formats]
+
+    def formats_for(self, filename: str) -> List[str]:
+        """Return the formats to use for a file, based on its MIME type"""
+        mimetype = self.guess_mimetype(filename)
+        for pattern, formats in self.mime_policy.items():
+            if fnmatch.fnmatchcase(mimetype, pattern):
+                return formats
+        return []
+
+    def start(self, path: Path) -> Optional['SidecarWriter']:
+        """Start writing sidecars for the file at `path`
+
+        Returns None if the file shouldn't be compressed.
+        """
+        formats = self.formats_for(path.name)
+        if not formats:
+            return None
+        return SidecarWriter(path, formats, self.min_size, self.levels)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+class SidecarWriter:
+    """Writes compressed sidecars of one file, fed chunk by chunk
+
+    The sidecars are written to temporary files; `commit` renames them
+    to their final names (next to `path`).
+    Nothing is written for content smaller than `min_size`.
+    """
+    def __init__(
+        self,
+        path: Path,
+        formats: List[str],
+        min_size: int,
+        levels: Mapping[str, int] = DEFAULT_LEVELS,
+    ):
+        self.path = path
+        self.formats = formats
+        self.min_size = min_size
+        self.levels = levels
+        self._pending: List[bytes] = []
+        self._pending_size = 0
+        self._compressors: Dict[str, _Compressor] = {}
+        self._files: Dict[str, BinaryIO] = {}
+
+    def _tmp_path(self, format_name: str) -> Path:
+        return self.path.with_name(
+            f'.{self.path.name}{EXTENSIONS[format_name]}.freezeyt-tmp'
+        )
+
+    def _start(self) -> None:
+        for format_name in self.formats:
+            self._compressors[format_name] = _COMPRESSORS[format_name](
+                self.levels[format_name],
+            )
+            self._files[format_name] = open(self._tmp_path(format_name), 'wb')
+
+    def write(self, data: bytes) -> None:
+        """Compress a chunk of the content (blocking)"""
+        if not self._compressors:
+            self._pending.append(data)
+            self._pending_size += len(data)
+            if self._pending_size < self.min_size:
+                return
+            self._start()
+            data = b''.join(self._pending)
+            self._pending = []
+        for format_name, compressor in self._compressors.items():
+            self._files[format_name].write(compressor.compress(data))
+
+    def close(self) -> None:
+        """Finish compressing (blocking)"""
+        for format_name, compressor in self._compressors.items():
+            with self._files[format_name] as f:
+                f.write(compressor.flush())
+
+    def commit(self) -> List[Path]:
+        """Rename the sidecars to their final names and return them"""
+        paths = []
+        for format_name in self._files:
+            final_path = self.path.with_name(
+                self.path.name + EXTENSIONS[format_name]
+            )
+            os.replace(self._tmp_path(format_name), final_path)
+            paths.append(final_path)
+        return paths
+
+    def discard(self) -> None:
+        """Remove any temporary files"""
+        for format_name, f in self._files.items():
+            f.close()
+            tmp_path = self._tmp_path(format_name)
+            if tmp_path.exists():
+                tmp_path.unlink()
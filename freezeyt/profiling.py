@@ -0,0 +1,214 @@
+"""Profiling the application while it renders pages
+
+Only the call of the app for a profiled page is profiled (including
+freezeyt's handling of the response body as the app sends it).
+While the page is waiting, time spent on other pages isn't counted.
+"""
+
+import os
+import sys
+import zlib
+import cProfile
+import fnmatch
+import collections
+from time import perf_counter
+from pathlib import Path
+from typing import Any, Awaitable, Coroutine, DefaultDict, Generator, List
+from typing import Mapping, Optional, Tuple, TypeVar, Union
+
+
+T = TypeVar('T')
+
+# Output files with these suffixes get collapsed stacks by default
+COLLAPSED_SUFFIXES = ('.collapsed', '.folded')
+
+FORMATS = ('pstats', 'collapsed')
+
+
+class _StackProfiler:
+    """Records time spent in each call stack, for flame graphs
+
+    The output has one line per call stack: function names separated
+    by semicolons, and the time spent in the innermost function
+    (in microseconds). This is the "collapsed stack" format used by
+    flamegraph.pl, speedscope and similar tools.
+    """
+    def __init__(self) -> None:
+        # Time spent in each stack, in seconds
+        self.stack_times: DefaultDict[Tuple[str, ...], float] = (
+            collections.defaultdict(float)
+        )
+        # Current stack: labels, start times, and time spent in callees
+        self._labels: List[str] = []
+        self._starts: List[float] = []
+        self._child_times: List[float] = []
+
+    def enable(self) -> None:
+        self._labels.clear()
+        self._starts.clear()
+        self._child_times.clear()
+        sys.setprofile(self._callback)
+
+    def disable(self) -> None:
+        sys.setprofile(None)
+
+    def _callback(self, frame: Any, event: str, arg: Any) -> None:
+        now = perf_counter()
+        if event == 'call':
+            code = frame.f_code
+            name = getattr(code, 'co_qualname', code.co_name)
+            self._push(f'{name} ({code.co_filename}:{code.co_firstlineno})', now)
+        elif event == 'c_call':
+            module = getattr(arg, '__module__', None) or 'builtins'
+            name = getattr(arg, '__qualname__', None) or repr(arg)
+            self._push(f'{module}.{name}', now)
+        elif event in ('return', 'c_return', 'c_exception'):
+            if not self._labels:
+                # The frame was entered before the profiler was enabled
+                return
+            elapsed = now - self._starts.pop()
+            child_time = self._child_times.pop()
+            self.stack_times[tuple(self._labels)] += elapsed - child_time
+            self._labels.pop()
+            if self._child_times:
+                self._child_times[-1] += elapsed
+
+    def _push(self, label: str, now: float) -> None:
+        self._labels.append(label.replace(';', ','))
+        self._starts.append(now)
+        self._child_times.append(0.0)
+
+    def dump(self, path: Path) -> None:
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, seconds in sorted(self.stack_times.items()):
+                microseconds = round(seconds * 1_000_000)
+                if microseconds:
+                    print(';'.join(stack), microseconds, file=f)
+
+
+class AppProfiler:
+    """Profiles the app while it renders some of the pages
+
+    output: file to write the results to
+    format: 'pstats' (for the `pstats` module, snakeviz and similar tools)
+        or 'collapsed' (for flame graph tools)
+    sample: fraction of pages to profile, between 0 and 1. Pages are
+        selected by a hash of their path, so the same pages are profiled
+        each time.
+    pattern: only profile pages whose path matches this glob pattern
+        (for example, '/blog/*')
+
+    Profiling only works for code that runs in freezeyt's thread,
+    so it can't be used with `wsgi_pool`.
+    """
+    def __init__(
+        self,
+        output: Union[str, 'os.PathLike[str]'],
+        *,
+        format: Optional[str] = None,
+        sample: float = 1.0,
+        pattern: Optional[str] = None,
+    ):
+        self.output = Path(output)
+        if format is None:
+            if self.output.suffix in COLLAPSED_SUFFIXES:
+                format = 'collapsed'
+            else:
+                format = 'pstats'
+        if format not in FORMATS:
+            raise ValueError(
+                f'unknown profile format {format!r}; use one of '
+                + ', '.join(FORMATS)
+            )
+        if not 0 <= sample <= 1:
+            raise ValueError(
+                f'profile sample must be between 0 and 1, got {sample!r}'
+            )
+        self.format = format
+        self.sample = sample
+        self.pattern = pattern
+        self.profiled_paths: List[str] = []
+        self._profiler: Union[cProfile.Profile, _StackProfiler]
+        if format == 'pstats':
+            self._profiler = cProfile.Profile()
+        else:
+            self._profiler = _StackProfiler()
+
+    @classmethod
+    def from_config(
+        cls, config: Union[str, 'os.PathLike[str]', Mapping],
+    ) -> 'AppProfiler':
+        """Create an AppProfiler for the `profile_app` configuration key"""
+        if not isinstance(config, Mapping):
+            return cls(config)
+        kwargs = {}
+        for key in 'format', 'sample', 'pattern':
+            if key in config:
+                kwargs[key] = config[key]
+        return cls(config['output'], **kwargs)
+
+    def should_profile(self, path: str) -> bool:
+        """Return true if the page at the given URL path should be profiled"""
+        if self.pattern is not None:
+            if not fnmatch.fnmatchcase(path, self.pattern):
+                return False
+        if self.sample >= 1:
+            return True
+        path_hash = zlib.crc32(path.encode('utf-8', 'surrogateescape'))
+        return path_hash < self.sample * 2**32
+
+    def wrap(
+        self, path: str, awaitable: Awaitable[T],
+    ) -> Coroutine[Any, Any, T]:
+        """Return a coroutine that runs `awaitable` under the profiler"""
+        self.profiled_paths.append(path)
+        return self._run_profiled(awaitable)
+
+    async def _run_profiled(self, awaitable: Awaitable[T]) -> T:
+        return await _ProfiledAwaitable(awaitable, self._profiler)
+
+    def save(self) -> None:
+        """Write the results to the output file"""
+        self.output.parent.mkdir(parents=True, exist_ok=True)
+        if isinstance(self._profiler, cProfile.Profile):
+            self._profiler.dump_stats(self.output)
+        else:
+            self._profiler.dump(self.output)
+
+
+class _ProfiledAwaitable:
+    """Runs an awaitable, enabling a profiler only while it runs
+
+    The profiler is turned off whenever the awaitable is suspended,
+    so code that runs meanwhile (other pages, freezeyt itself) isn't
+    profiled.
+    """
+    def __init__(
+        self,
+        awaitable: Awaitable[T],
+        profiler: Union[cProfile.Profile, _StackProfiler],
+    ):
+        self._iterator = awaitable.__await__()
+        self._profiler = profiler
+
+    def __await__(self) -> Generator[Any, Any, Any]:
+        iterator = self._iterator
+        value: Any = None
+        exception: Optional[BaseException] = None
+        while True:
+            self._profiler.enable()
+            try:
+                if exception is None:
+                    yielded = iterator.send(value)
+                else:
+                    yielded = iterator.throw(exception)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                self._profiler.disable()
+            try:
+                value = yield yielded
+                exception = None
+            except BaseException as exc:
+                value = None
+                exception = exc
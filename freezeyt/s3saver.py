@@ -0,0 +1,620 @@
+"""Saver that uploads frozen pages to an S3-compatible object storage
+
+Requests are signed with AWS Signature Version 4, and sent using
+a pool of HTTP connections, so no extra dependencies are needed.
+"""
+
+import io
+import os
+import hmac
+import time
+import base64
+import queue
+import asyncio
+import hashlib
+import datetime
+import http.client
+import urllib.parse
+import concurrent.futures
+import xml.etree.ElementTree as ET
+from pathlib import PurePosixPath
+from typing import BinaryIO, Callable, Dict, List, Mapping, Optional, Set
+from typing import Any, Tuple, TypeVar, Union
+
+from .saver import Saver, SaverContent, iterate_content
+
+
+# Default number of requests sent at once
+DEFAULT_CONCURRENCY = 8
+# Files at least this big (in bytes) are uploaded in parts...
+DEFAULT_MULTIPART_THRESHOLD = 8 * 1024 * 1024
+# ... of this size (S3 requires at least 5 MiB, except for the last part)
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+# Requests that fail with a connection error or a server error (5xx)
+# are tried this many times in total
+MAX_ATTEMPTS = 3
+
+# Keys removed in one DeleteObjects request (the maximum allowed by S3)
+DELETE_BATCH_SIZE = 1000
+
+T = TypeVar('T')
+
+
+class S3Error(Exception):
+    """Error response from the object storage"""
+    def __init__(self, status: int, code: str, message: str):
+        super().__init__(f'{status} {code}: {message}')
+        self.status = status
+        self.code = code
+
+
+def sign_request(
+    method: str,
+    path: str,
+    query: Mapping[str, str],
+    headers: Dict[str, str],
+    payload_hash: str,
+    *,
+    access_key_id: str,
+    secret_access_key: str,
+    region: str,
+    timestamp: datetime.datetime,
+    service: str = 's3',
+) -> str:
+    """Return the Authorization header for a request (AWS Signature V4)
+
+    `path` is the URL path (not percent-encoded); `headers` must include
+    `host`, `x-amz-date` and `x-amz-content-sha256`, and all of them
+    are signed.
+    """
+    canonical_query = '&'.join(
+        f'{quote(key)}={quote(value)}'
+        for key, value in sorted(query.items())
+    )
+    signed_headers = sorted(name.lower() for name in headers)
+    header_values = {
+        name.lower(): ' '.join(str(value).split())
+        for name, value in headers.items()
+    }
+    canonical_request = '\n'.join([
+        method,
+        quote(path, safe='/~'),
+        canonical_query,
+        ''.join(f'{name}:{header_values[name]}\n' for name in signed_headers),
+        ';'.join(signed_headers),
+        payload_hash,
+    ])
+    date = timestamp.strftime('%Y%m%d')
+    scope = f'{date}/{region}/{service}/aws4_request'
+    string_to_sign = '\n'.join([
+        'AWS4-HMAC-SHA256',
+        timestamp.strftime('%Y%m%dT%H%M%SZ'),
+        scope,
+        hashlib.sha256(canonical_request.encode()).hexdigest(),
+    ])
+    key = ('AWS4' + secret_access_key).encode()
+    for part in date, region, service, 'aws4_request':
+        key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+    signature = hmac.new(
+        key, string_to_sign.encode(), hashlib.sha256,
+    ).hexdigest()
+    return (
+        f'AWS4-HMAC-SHA256 Credential={access_key_id}/{scope}, '
+        + f'SignedHeaders={";".join(signed_headers)}, '
+        + f'Signature={signature}'
+    )
+
+
+def quote(text: str, safe: str = '~') -> str:
+    """Percent-encode text as required for signing"""
+    return urllib.parse.quote(text, safe=safe)
+
+
+def compute_etag(content: bytes, multipart_threshold: int, part_size: int) -> str:
+    """Return the ETag S3 gives an object uploaded by S3Saver
+
+    For simple uploads, it's the MD5 of the content; for multipart
+    uploads, the MD5 of the parts' MD5s followed by the number of parts.
+    """
+    if len(content) < multipart_threshold:
+        return hashlib.md5(content).hexdigest()
+    digests = b''.join(
+        hashlib.md5(content[start:start + part_size]).digest()
+        for start in range(0, len(content), part_size)
+    )
+    part_count = -(-len(content) // part_size)
+    return f'{hashlib.md5(digests).hexdigest()}-{part_count}'
+
+
+def normalize_etag(etag: str) -> str:
+    """Return an ETag without quotes, in lowercase"""
+    return etag.strip('"').lower()
+
+
+def _local_name(element: ET.Element) -> str:
+    # Strip the XML namespace
+    return element.tag.rpartition('}')[2]
+
+
+def _child_text(element: ET.Element, name: str) -> Optional[str]:
+    for child in element:
+        if _local_name(child) == name:
+            return child.text or ''
+    return None
+
+
+class S3Client:
+    """Minimal S3 client, usable from several threads at once
+
+    Each thread takes a connection from a pool, so connections are reused
+    between requests.
+    """
+    def __init__(
+        self,
+        endpoint: str,
+        bucket: str,
+        *,
+        region: str,
+        access_key_id: str,
+        secret_access_key: str,
+        session_token: Optional[str] = None,
+        virtual_host: bool = False,
+        timeout: float = 60,
+    ):
+        split = urllib.parse.urlsplit(endpoint)
+        if split.scheme not in ('http', 'https') or not split.hostname:
+            raise ValueError(f'bad S3 endpoint: {endpoint!r}')
+        self.scheme = split.scheme
+        self.port = split.port
+        self.bucket = bucket
+        if virtual_host:
+            self.host = f'{bucket}.{split.hostname}'
+            self.base_path = split.path.rstrip('/') + '/'
+        else:
+            self.host = split.hostname
+            self.base_path = f'{split.path.rstrip("/")}/{bucket}/'
+        self.netloc = self.host if self.port is None else f'{self.host}:{self.port}'
+        self.region = region
+        self.access_key_id = access_key_id
+        self.secret_access_key = secret_access_key
+        self.session_token = session_token
+        self.timeout = timeout
+        self._connections: 'queue.LifoQueue[http.client.HTTPConnection]' = (
+            queue.LifoQueue()
+        )
+
+    def _new_connection(self) -> http.client.HTTPConnection:
+        if self.scheme == 'https':
+            return http.client.HTTPSConnection(
+                self.host, self.port, timeout=self.timeout,
+            )
+        return http.client.HTTPConnection(
+            self.host, self.port, timeout=self.timeout,
+        )
+
+    def request(
+        self,
+        method: str,
+        key: str = '',
+        *,
+        query: Optional[Mapping[str, str]] = None,
+        headers: Optional[Mapping[str, str]] = None,
+        body: Union[bytes, memoryview] = b'',
+        payload_hash: Optional[str] = None,
+        ok_statuses: Tuple[int, ...] = (200,),
+    ) -> Tuple[int, http.client.HTTPMessage, bytes]:
+        """Send a signed request for the given object key
+
+        Return the status, the response headers and the response body.
+        Raise S3Error for statuses not in `ok_statuses`.
+        """
+        query = dict(query or {})
+        path = self.base_path + key
+        if payload_hash is None:
+            payload_hash = hashlib.sha256(body).hexdigest()
+        url = quote(path, safe='/~')
+        if query:
+            url += '?' + '&'.join(
+                f'{quote(k)}={quote(v)}' for k, v in sorted(query.items())
+            )
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            request_headers = {
+                **(headers or {}),
+                'host': self.netloc,
+                'x-amz-date': datetime.datetime.now(
+                    datetime.timezone.utc,
+                ).strftime('%Y%m%dT%H%M%SZ'),
+                'x-amz-content-sha256': payload_hash,
+            }
+            if self.session_token is not None:
+                request_headers['x-amz-security-token'] = self.session_token
+            request_headers['Authorization'] = sign_request(
+                method, path, query, request_headers, payload_hash,
+                access_key_id=self.access_key_id,
+                secret_access_key=self.secret_access_key,
+                region=self.region,
+                timestamp=datetime.datetime.strptime(
+                    request_headers['x-amz-date'], '%Y%m%dT%H%M%SZ',
+                ),
+            )
+            try:
+                connection = self._connections.get_nowait()
+            except queue.Empty:
+                connection = self._new_connection()
+            try:
+                connection.request(
+                    method, url, body=body, headers=request_headers,
+                )
+                response = connection.getresponse()
+                response_body = response.read()
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                if attempt == MAX_ATTEMPTS:
+                    raise
+                time.sleep(0.1 * 2 ** attempt)
+                continue
+            if response.will_close:
+                connection.close()
+            else:
+                self._connections.put(connection)
+            if response.status >= 500 and attempt < MAX_ATTEMPTS:
+                time.sleep(0.1 * 2 ** attempt)
+                continue
+            if response.status not in ok_statuses:
+                raise self._error(response.status, response_body)
+            return response.status, response.headers, response_body
+        raise AssertionError('unreachable')
+
+    def _error(self, status: int, body: bytes) -> S3Error:
+        code = message = ''
+        try:
+            root = ET.fromstring(body)
+        except ET.ParseError:
+            message = body.decode('utf-8', 'replace')
+        else:
+            code = _child_text(root, 'Code') or ''
+            message = _child_text(root, 'Message') or ''
+        return S3Error(status, code, message)
+
+    def list_etags(self, prefix: str) -> Dict[str, str]:
+        """Return ETags of all objects whose keys start with prefix"""
+        etags = {}
+        query = {'list-type': '2', 'prefix': prefix}
+        while True:
+            status, headers, body = self.request('GET', query=query)
+            root = ET.fromstring(body)
+            for element in root:
+                if _local_name(element) == 'Contents':
+                    key = _child_text(element, 'Key')
+                    etag = _child_text(element, 'ETag')
+                    if key is not None and etag is not None:
+                        etags[key] = normalize_etag(etag)
+            token = _child_text(root, 'NextContinuationToken')
+            if _child_text(root, 'IsTruncated') != 'true' or not token:
+                return etags
+            query = {**query, 'continuation-token': token}
+
+    def close(self) -> None:
+        while True:
+            try:
+                connection = self._connections.get_nowait()
+            except queue.Empty:
+                return
+            connection.close()
+
+
+class S3Saver(Saver):
+    """Uploads frozen pages to a bucket in an S3-compatible object storage.
+
+    client - S3Client for the bucket
+    key_prefix - Prefix for keys of the uploaded objects (like 'site/')
+    guess_mimetype - Function that returns the MIME type for a filename,
+        sent as the Content-Type of each object
+    concurrency - Maximum number of requests sent at once
+    multipart_threshold - Files at least this big are uploaded in parts
+    part_size - Size of the parts
+    delete_stale - If true, objects under key_prefix that weren't saved
+        in this freeze are deleted after a successful freeze
+
+    Objects that already exist with the same content (as determined
+    by their ETag, from a listing made when the freeze starts)
+    are not uploaded again. If the storage doesn't use MD5-based ETags
+    (for example, for encrypted objects), all files are uploaded.
+    Uploads happen during the freeze, so a failed freeze leaves
+    the bucket partially updated.
+    """
+    def __init__(
+        self,
+        client: S3Client,
+        guess_mimetype: Callable[[str], str],
+        *,
+        key_prefix: str = '',
+        concurrency: int = DEFAULT_CONCURRENCY,
+        multipart_threshold: int = DEFAULT_MULTIPART_THRESHOLD,
+        part_size: int = DEFAULT_PART_SIZE,
+        delete_stale: bool = False,
+    ):
+        if key_prefix and not key_prefix.endswith('/'):
+            key_prefix += '/'
+        if part_size < MIN_PART_SIZE:
+            raise ValueError(f'part_size must be at least {MIN_PART_SIZE}')
+        if concurrency < 1:
+            raise ValueError('concurrency must be positive')
+        self.client = client
+        self.guess_mimetype = guess_mimetype
+        self.key_prefix = key_prefix
+        self.concurrency = concurrency
+        self.multipart_threshold = multipart_threshold
+        self.part_size = part_size
+        self.delete_stale = delete_stale
+        # ETags of existing objects, by key
+        self.existing_etags: Dict[str, str] = {}
+        # False once an upload shows that ETags aren't MD5-based
+        self.compare_etags = True
+        # Keys saved in this freeze: uploaded, or skipped as unchanged
+        self.uploaded_keys: Set[str] = set()
+        self.skipped_keys: Set[str] = set()
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @classmethod
+    def from_config(
+        cls, config: Mapping, guess_mimetype: Callable[[str], str],
+    ) -> 'S3Saver':
+        """Create an S3Saver for the `s3` output type
+
+        Credentials and region not given in the configuration are taken
+        from the usual AWS environment variables.
+        """
+        try:
+            bucket = config['bucket']
+        except KeyError:
+            raise ValueError('S3 bucket not specified')
+        region = config.get('region') or os.environ.get(
+            'AWS_REGION', os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'),
+        )
+        access_key_id = config.get(
+            'access_key_id', os.environ.get('AWS_ACCESS_KEY_ID'),
+        )
+        secret_access_key = config.get(
+            'secret_access_key', os.environ.get('AWS_SECRET_ACCESS_KEY'),
+        )
+        if not access_key_id or not secret_access_key:
+            raise ValueError(
+                'S3 credentials not specified: set access_key_id and '
+                + 'secret_access_key, or the AWS_ACCESS_KEY_ID and '
+                + 'AWS_SECRET_ACCESS_KEY environment variables'
+            )
+        client = S3Client(
+            config.get('endpoint', f'https://s3.{region}.amazonaws.com'),
+            bucket,
+            region=region,
+            access_key_id=access_key_id,
+            secret_access_key=secret_access_key,
+            session_token=config.get(
+                'session_token', os.environ.get('AWS_SESSION_TOKEN'),
+            ),
+            virtual_host=config.get('virtual_host', False),
+        )
+        kwargs = {}
+        for key in (
+            'key_prefix', 'concurrency', 'multipart_threshold', 'part_size',
+            'delete_stale',
+        ):
+            if key in config:
+                kwargs[key] = config[key]
+        return cls(client, guess_mimetype, **kwargs)
+
+    async def _run(self, function: Callable[..., T], *args: Any) -> T:
+        """Send a request (or do other blocking work) in a worker thread
+
+        At most `concurrency` of these run at once.
+        """
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                self.concurrency, thread_name_prefix='freezeyt-s3',
+            )
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        loop = asyncio.get_running_loop()
+        async with self._semaphore:
+            return await loop.run_in_executor(self._executor, function, *args)
+
+    async def prepare(self) -> None:
+        self.existing_etags = await self._run(
+            self.client.list_etags, self.key_prefix,
+        )
+
+    def _key(self, filename: PurePosixPath) -> str:
+        if filename.is_absolute():
+            raise ValueError('filename must be relative')
+        return self.key_prefix + str(filename)
+
+    async def save_to_filename(
+        self,
+        filename: PurePosixPath,
+        content_iterable: SaverContent,
+    ) -> None:
+        key = self._key(filename)
+        chunks = [chunk async for chunk in iterate_content(content_iterable)]
+        if len(chunks) == 1 and type(chunks[0]) is bytes:
+            content = chunks[0]
+        else:
+            content = b''.join(chunks)
+
+        etag = None
+        if self.compare_etags:
+            etag = compute_etag(
+                content, self.multipart_threshold, self.part_size,
+            )
+            if self.existing_etags.get(key) == etag:
+                self.skipped_keys.add(key)
+                self.uploaded_keys.discard(key)
+                return
+        headers = {'content-type': self.guess_mimetype(filename.name)}
+        if len(content) < self.multipart_threshold:
+            uploaded_etag = await self._run(self._put, key, content, headers)
+        else:
+            uploaded_etag = await self._upload_multipart(key, content, headers)
+        if uploaded_etag is None:
+            self.existing_etags.pop(key, None)
+        else:
+            if uploaded_etag != etag:
+                # The ETags can't be compared to the content; upload
+                # everything from now on
+                self.compare_etags = False
+            # If the file is saved again (for example, as a copy for
+            # a redirect), it's compared to what was just uploaded
+            self.existing_etags[key] = uploaded_etag
+        self.uploaded_keys.add(key)
+        self.skipped_keys.discard(key)
+
+    def _put(
+        self, key: str, content: bytes, headers: Dict[str, str],
+    ) -> Optional[str]:
+        """Upload an object; return its ETag, if the storage sent it"""
+        status, response_headers, body = self.client.request(
+            'PUT', key, body=content,
+            headers={
+                **headers,
+                'content-md5': base64.b64encode(
+                    hashlib.md5(content).digest(),
+                ).decode(),
+            },
+        )
+        etag = response_headers.get('ETag')
+        if etag is None:
+            return None
+        return normalize_etag(etag)
+
+    async def _upload_multipart(
+        self, key: str, content: bytes, headers: Dict[str, str],
+    ) -> Optional[str]:
+        """Upload an object in parts; return its ETag, if it was sent"""
+        status, response_headers, body = await self._run(
+            lambda: self.client.request(
+                'POST', key, query={'uploads': ''}, headers=headers,
+            ),
+        )
+        upload_id = _child_text(ET.fromstring(body), 'UploadId')
+        if not upload_id:
+            raise S3Error(status, 'NoUploadId', 'No UploadId in response')
+        view = memoryview(content)
+        try:
+            etags = await asyncio.gather(*(
+                self._run(
+                    self._upload_part, key, upload_id, number,
+                    view[start:start + self.part_size],
+                )
+                for number, start in enumerate(
+                    range(0, len(content), self.part_size), start=1,
+                )
+            ))
+            parts = ''.join(
+                f'<Part><PartNumber>{number}</PartNumber>'
+                + f'<ETag>{etag}</ETag></Part>'
+                for number, etag in enumerate(etags, start=1)
+            )
+            complete_body = (
+                f'<CompleteMultipartUpload>{parts}</CompleteMultipartUpload>'
+            ).encode()
+            status, response_headers, body = await self._run(
+                lambda: self.client.request(
+                    'POST', key, query={'uploadId': upload_id},
+                    body=complete_body,
+                ),
+            )
+            # Errors may be reported with the 200 status
+            root = ET.fromstring(body)
+            if _local_name(root) == 'Error':
+                raise self.client._error(status, body)
+        except BaseException:
+            await self._run(lambda: self.client.request(
+                'DELETE', key, query={'uploadId': upload_id},
+                ok_statuses=(200, 204, 404),
+            ))
+            raise
+        etag = _child_text(root, 'ETag')
+        if etag is None:
+            return None
+        return normalize_etag(etag)
+
+    def _upload_part(
+        self, key: str, upload_id: str, number: int, part: memoryview,
+    ) -> str:
+        """Upload one part of a multipart upload; return its ETag
+
+        The ETag is returned as sent by the storage, to be used
+        in CompleteMultipartUpload. (It's not always the MD5 of the part:
+        for example, it isn't for encrypted objects.)
+        """
+        status, headers, body = self.client.request(
+            'PUT', key,
+            query={'partNumber': str(number), 'uploadId': upload_id},
+            body=part,
+        )
+        etag = headers.get('ETag')
+        if not etag:
+            raise S3Error(status, 'NoETag', 'No ETag in UploadPart response')
+        return etag
+
+    async def open_filename(self, filename: PurePosixPath) -> BinaryIO:
+        key = self._key(filename)
+        try:
+            status, headers, body = await self._run(
+                lambda: self.client.request('GET', key),
+            )
+        except S3Error as e:
+            if e.status == 404:
+                raise FileNotFoundError(filename)
+            raise
+        return io.BytesIO(body)
+
+    async def finish(self, success: bool, cleanup: bool) -> None:
+        """Delete stale objects, if requested, and close connections"""
+        try:
+            if success and self.delete_stale:
+                saved = self.uploaded_keys | self.skipped_keys
+                stale = sorted(set(self.existing_etags) - saved)
+                for start in range(0, len(stale), DELETE_BATCH_SIZE):
+                    await self._run(
+                        self._delete, stale[start:start + DELETE_BATCH_SIZE],
+                    )
+        finally:
+            self.shutdown()
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        self.client.close()
+
+    def _delete(self, keys: List[str]) -> None:
+        root = ET.Element('Delete')
+        ET.SubElement(root, 'Quiet').text = 'true'
+        for key in keys:
+            ET.SubElement(ET.SubElement(root, 'Object'), 'Key').text = key
+        body = ET.tostring(root)
+        status, headers, response_body = self.client.request(
+            'POST', query={'delete': ''}, body=body,
+            headers={
+                'content-md5': base64.b64encode(
+                    hashlib.md5(body).digest(),
+                ).decode(),
+            },
+        )
+        errors = [
+            element for element in ET.fromstring(response_body)
+            if _local_name(element) == 'Error'
+        ]
+        if errors:
+            raise S3Error(
+                status,
+                _child_text(errors[0], 'Code') or '',
+                f'Could not delete {_child_text(errors[0], "Key")}: '
+                + (_child_text(errors[0], 'Message') or ''),
+            )
+        for key in keys:
+            self.existing_etags.pop(key, None)
@@ -1,8 +1,18 @@
 import abc
+import asyncio
+import collections
 from pathlib import PurePosixPath
-from typing import BinaryIO, Iterable
+from typing import BinaryIO, Iterable, AsyncIterable, AsyncIterator, Union
+from typing import Deque, Optional
 
 from freezeyt.types import SaverResult
+from freezeyt.incremental import FileStat
+
+
+# Content to save: chunks of bytes, given either all at once (for example,
+# a list or an open file), or as they are produced (a ContentStream).
+SaverContent = Union[Iterable[bytes], AsyncIterable[bytes]]
+
 
 class Saver(abc.ABC):
     async def prepare(self) -> None:
@@ -12,9 +22,14 @@ class Saver(abc.ABC):
     async def save_to_filename(
         self,
         filename: PurePosixPath,
-        content_iterable: "Iterable[bytes]",
+        content_iterable: SaverContent,
     ) -> None:
-        """Save the given bytes to the given path"""
+        """Save the given bytes to the given path
+
+        The content may be an asynchronous iterable. If iterating it raises
+        an exception, the saver should not leave a partial file behind,
+        and it should propagate the exception.
+        """
 
     @abc.abstractmethod
     async def open_filename(
@@ -23,6 +38,41 @@ class Saver(abc.ABC):
     ) -> BinaryIO:
         """Open the given path for reading bytes"""
 
+    async def copy_filename(
+        self,
+        source: PurePosixPath,
+        destination: PurePosixPath,
+    ) -> None:
+        """Save a copy of an already saved file under another name"""
+        with await self.open_filename(source) as f:
+            await self.save_to_filename(destination, f)
+
+    async def keep_filename(
+        self,
+        filename: PurePosixPath,
+        sha256: Optional[str] = None,
+        stat: Optional[FileStat] = None,
+    ) -> bool:
+        """Keep a file saved by a previous freeze, if possible
+
+        If `sha256` is given, the file is only kept if its content has
+        this SHA-256 hex digest (that is, if it wasn't changed since).
+        The content doesn't need to be checked if the file still has
+        the size and modification time given in `stat`.
+        Return true if the file was kept. Used for incremental freezing.
+        """
+        return False
+
+    async def stat_filename(
+        self,
+        filename: PurePosixPath,
+    ) -> Optional[FileStat]:
+        """Return the size and modification time of a saved file
+
+        Return None if the saver can't tell. Used for incremental freezing.
+        """
+        return None
+
     async def finish(self, success: bool, cleanup: bool) -> SaverResult:
         """Clean up after a freeze and return the result, if any.
 
@@ -30,3 +80,86 @@ class Saver(abc.ABC):
         cleanup: If true, clean up after failed freezes
         """
         return None
+
+    def shutdown(self) -> None:
+        """Release resources like thread pools and open files.
+
+        Called at the end of every freeze, including freezes that stopped
+        with an exception before (or while) calling `finish`.
+        It may be called more than once.
+        """
+
+
+async def iterate_content(content: SaverContent) -> AsyncIterator[bytes]:
+    """Iterate over SaverContent, which may be sync or async"""
+    if isinstance(content, AsyncIterable):
+        async for chunk in content:
+            yield chunk
+    else:
+        for chunk in content:
+            yield chunk
+
+
+class ContentStream:
+    """Chunks of a page's body, passed to a saver as the app produces them
+
+    At most `max_chunks` chunks are held; if the saver is slower than the
+    app, the app waits in `put`.
+    """
+    def __init__(self, max_chunks: int = 8):
+        self._chunks: Deque[bytes] = collections.deque()
+        self._max_chunks = max_chunks
+        self._closed = False
+        self._exception: Optional[BaseException] = None
+        self._abandoned = False
+        self._has_data = asyncio.Event()
+        self._has_space = asyncio.Event()
+
+    async def put(self, chunk: bytes) -> None:
+        """Add a chunk, waiting until there's space for it"""
+        if self._closed:
+            raise ValueError('ContentStream is closed')
+        while len(self._chunks) >= self._max_chunks and not self._abandoned:
+            self._has_space.clear()
+            await self._has_space.wait()
+        if self._abandoned:
+            # Nobody is reading the content any more. If the saver failed,
+            # the freezer gets the error from the saver.
+            return
+        self._chunks.append(chunk)
+        self._has_data.set()
+
+    def close(self) -> None:
+        """Signal that all chunks were added"""
+        self._closed = True
+        self._has_data.set()
+
+    def fail(self, exception: BaseException) -> None:
+        """Signal that the content is incomplete
+
+        The saver gets the exception when it reads the content.
+        """
+        self._exception = exception
+        self._has_data.set()
+
+    def abandon(self) -> None:
+        """Signal that the saver stopped reading the content"""
+        self._abandoned = True
+        self._chunks.clear()
+        self._has_space.set()
+
+    def __aiter__(self) -> 'ContentStream':
+        return self
+
+    async def __anext__(self) -> bytes:
+        while True:
+            if self._exception is not None:
+                raise self._exception
+            if self._chunks:
+                chunk = self._chunks.popleft()
+                self._has_space.set()
+                return chunk
+            if self._closed:
+                raise StopAsyncIteration
+            self._has_data.clear()
+            await self._has_data.wait()
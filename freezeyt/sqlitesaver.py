@@ -0,0 +1,340 @@
+"""Saver that outputs frozen pages into a SQLite database
+
+The database can be exported to a directory, or served over HTTP,
+using the command-line interface of this module:
+
+    python -m freezeyt.sqlitesaver export site.sqlite ./_build/
+    python -m freezeyt.sqlitesaver serve site.sqlite
+"""
+
+import io
+import os
+import asyncio
+import hashlib
+import sqlite3
+import urllib.parse
+import concurrent.futures
+from pathlib import Path, PurePosixPath
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+from typing import Any, Iterable, TypeVar
+
+import click
+
+import freezeyt
+from .saver import Saver, SaverContent, iterate_content
+from .urls import PrefixURL
+from .compat import WSGIApplication, WSGIEnvironment, StartResponse
+
+
+SCHEMA = """
+    CREATE TABLE files (
+        path TEXT PRIMARY KEY,
+        content BLOB NOT NULL,
+        content_type TEXT NOT NULL,
+        sha256 TEXT NOT NULL
+    );
+    CREATE TABLE metadata (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    );
+"""
+
+# Saved files are written to the database in batches of this many files...
+DEFAULT_BATCH_SIZE = 1000
+# ... or when their total size reaches this (in bytes)
+BATCH_BYTES = 32 * 1024 * 1024
+
+# Row of the `files` table, without the path
+FileRow = Tuple[bytes, str, str]
+
+T = TypeVar('T')
+
+
+class SQLiteSaver(Saver):
+    """Outputs frozen pages into a SQLite database.
+
+    database_path - Filesystem path of the database
+    prefix - Base URL of the site, stored in the database's metadata
+    guess_mimetype - Function that returns the MIME type for a filename,
+        stored with each file
+    batch_size - Number of files written in one transaction
+
+    The database is written under a temporary name and renamed when
+    the freeze is finished.
+    All database operations run in a single writer thread.
+    Saved files are held in memory until their batch is written.
+    """
+    def __init__(
+        self,
+        database_path: Path,
+        prefix: PrefixURL,
+        guess_mimetype: Callable[[str], str],
+        *,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ):
+        self.database_path = database_path.resolve()
+        self.tmp_path = self.database_path.with_name(
+            f'.{self.database_path.name}.freezeyt-tmp'
+        )
+        self.prefix = prefix
+        self.guess_mimetype = guess_mimetype
+        if batch_size < 1:
+            raise ValueError('batch_size must be positive')
+        self.batch_size = batch_size
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        # Only used in the writer thread
+        self._connection: Optional[sqlite3.Connection] = None
+        # Files that were not written to the database yet, by path
+        self._pending: Dict[str, FileRow] = {}
+        self._pending_size = 0
+
+    async def _run(self, function: Callable[..., T], *args: Any) -> T:
+        """Run a function in the writer thread"""
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                1, thread_name_prefix='freezeyt-sqlite',
+            )
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, function, *args)
+
+    async def prepare(self) -> None:
+        if self.database_path.is_dir():
+            raise IsADirectoryError(
+                f'Cannot write database to {self.database_path}: '
+                + 'it is a directory'
+            )
+        self.database_path.parent.mkdir(parents=True, exist_ok=True)
+        await self._run(self._connect)
+
+    def _connect(self) -> None:
+        # Remove leftovers of an interrupted freeze
+        for suffix in '', '-wal', '-shm', '-journal':
+            path = self.tmp_path.with_name(self.tmp_path.name + suffix)
+            if path.exists():
+                path.unlink()
+        connection = sqlite3.connect(self.tmp_path)
+        # Write-ahead logging makes the batched transactions faster
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        with connection:
+            connection.executescript(SCHEMA)
+            connection.executemany(
+                'INSERT INTO metadata (key, value) VALUES (?, ?)',
+                [
+                    ('prefix', str(self.prefix)),
+                    ('freezeyt_version', freezeyt.__version__),
+                ],
+            )
+        self._connection = connection
+
+    async def save_to_filename(
+        self,
+        filename: PurePosixPath,
+        content_iterable: SaverContent,
+    ) -> None:
+        chunks = [chunk async for chunk in iterate_content(content_iterable)]
+        if len(chunks) == 1 and type(chunks[0]) is bytes:
+            content = chunks[0]
+        else:
+            content = b''.join(chunks)
+        self._pending[str(filename)] = (
+            content,
+            self.guess_mimetype(filename.name),
+            hashlib.sha256(content).hexdigest(),
+        )
+        self._pending_size += len(content)
+        if (
+            len(self._pending) >= self.batch_size
+            or self._pending_size >= BATCH_BYTES
+        ):
+            await self._flush()
+
+    async def _flush(self) -> None:
+        if not self._pending:
+            return
+        rows = [(path, *row) for path, row in self._pending.items()]
+        self._pending = {}
+        self._pending_size = 0
+        # Jobs in the writer thread run in order, so files read after
+        # this point are found in the database
+        await self._run(self._write_rows, rows)
+
+    def _write_rows(self, rows: List[Tuple[str, bytes, str, str]]) -> None:
+        assert self._connection is not None
+        with self._connection:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO files '
+                + '(path, content, content_type, sha256) VALUES (?, ?, ?, ?)',
+                rows,
+            )
+
+    async def open_filename(self, filename: PurePosixPath) -> BinaryIO:
+        path = str(filename)
+        pending = self._pending.get(path)
+        if pending is not None:
+            return io.BytesIO(pending[0])
+        content = await self._run(self._read, path)
+        if content is None:
+            raise FileNotFoundError(filename)
+        return io.BytesIO(content)
+
+    def _read(self, path: str) -> Optional[bytes]:
+        assert self._connection is not None
+        row = self._connection.execute(
+            'SELECT content FROM files WHERE path = ?', (path,),
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0]
+
+    def _close(self) -> None:
+        if self._connection is not None:
+            # Leave a single file, without the write-ahead log
+            self._connection.execute('PRAGMA journal_mode=DELETE')
+            self._connection.close()
+            self._connection = None
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            if self._connection is not None:
+                # The connection can only be used in the writer thread
+                self._executor.submit(self._close)
+            self._executor.shutdown()
+            self._executor = None
+
+    async def finish(self, success: bool, cleanup: bool) -> None:
+        """Write remaining files, close the database and move it in place.
+
+        After a failed freeze, the database is removed if `cleanup` is true.
+        """
+        try:
+            if self._connection is not None:
+                await self._flush()
+                await self._run(self._close)
+        finally:
+            self.shutdown()
+        if not self.tmp_path.exists():
+            return
+        if success or not cleanup:
+            os.replace(self.tmp_path, self.database_path)
+        else:
+            self.tmp_path.unlink()
+
+
+def iter_files(
+    database_path: Path,
+) -> Iterator[Tuple[PurePosixPath, bytes]]:
+    """Iterate over paths and contents of files in a database"""
+    connection = sqlite3.connect(database_path)
+    try:
+        for path, content in connection.execute(
+            'SELECT path, content FROM files ORDER BY path',
+        ):
+            yield PurePosixPath(path), content
+    finally:
+        connection.close()
+
+
+def export(database_path: Path, output_path: Path) -> int:
+    """Write files from a database to a directory
+
+    Returns the number of files written.
+    """
+    count = 0
+    output_path = output_path.resolve()
+    for path, content in iter_files(database_path):
+        if path.is_absolute() or '..' in path.parts:
+            raise ValueError(f'Bad path in database: {path}')
+        destination = output_path / path
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        destination.write_bytes(content)
+        count += 1
+    return count
+
+
+def make_wsgi_app(database_path: Path) -> WSGIApplication:
+    """Return a WSGI application that serves files from a database
+
+    Like a static web server, it serves `index.html` for paths ending with
+    a slash, and redirects directory paths without the slash.
+    """
+    def get_file(
+        connection: sqlite3.Connection, path: str,
+    ) -> Optional[Tuple[bytes, str, str]]:
+        return connection.execute(
+            'SELECT content, content_type, sha256 FROM files WHERE path = ?',
+            (path,),
+        ).fetchone()
+
+    def app(
+        environ: WSGIEnvironment, start_response: StartResponse,
+    ) -> Iterable[bytes]:
+        # WSGI gives the path as bytes decoded as Latin-1;
+        # paths in the database are decoded as UTF-8
+        url_path = environ.get('PATH_INFO', '/')
+        try:
+            path = url_path.encode('latin-1').decode('utf-8').lstrip('/')
+        except UnicodeError:
+            start_response('404 Not Found', [('Content-Type', 'text/plain')])
+            return [b'Not found']
+        if path == '' or path.endswith('/'):
+            path += 'index.html'
+        connection = sqlite3.connect(database_path)
+        try:
+            row = get_file(connection, path)
+            if row is None and get_file(connection, path + '/index.html'):
+                # The Location is still in the "bytes as Latin-1" form;
+                # quote it so that it's valid in a header
+                location = urllib.parse.quote(
+                    environ.get('SCRIPT_NAME', '') + url_path + '/',
+                    encoding='latin-1',
+                )
+                start_response('301 Moved Permanently', [
+                    ('Location', location),
+                ])
+                return [b'']
+        finally:
+            connection.close()
+        if row is None:
+            start_response('404 Not Found', [('Content-Type', 'text/plain')])
+            return [b'Not found']
+        content, content_type, sha256 = row
+        start_response('200 OK', [
+            ('Content-Type', content_type),
+            ('Content-Length', str(len(content))),
+            ('ETag', f'"{sha256}"'),
+        ])
+        return [content]
+
+    return app
+
+
+@click.group()
+def main() -> None:
+    """Work with sites saved by freezeyt into a SQLite database"""
+
+
+@main.command('export')
+@click.argument('database', type=click.Path(exists=True, dir_okay=False))
+@click.argument('output', type=click.Path(file_okay=False))
+def export_command(database: str, output: str) -> None:
+    """Write the files in DATABASE to the directory OUTPUT"""
+    count = export(Path(database), Path(output))
+    click.echo(f'Exported {count} files to {output}')
+
+
+@main.command('serve')
+@click.argument('database', type=click.Path(exists=True, dir_okay=False))
+@click.option('--host', default='localhost', help='Host to listen on')
+@click.option('--port', default=8000, help='Port to listen on')
+def serve_command(database: str, host: str, port: int) -> None:
+    """Serve the files in DATABASE over HTTP (for testing)"""
+    from wsgiref.simple_server import make_server
+
+    with make_server(host, port, make_wsgi_app(Path(database))) as server:
+        click.echo(f'Serving {database} on http://{host}:{port}/')
+        server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""Timing statistics of a freeze"""
+
+import math
+import time
+from typing import Any, Dict, List, Optional
+
+from freezeyt.hooks import FreezeInfo, TaskInfo
+
+
+# Phases of handling a page, in order (see TaskInfo.timings)
+PHASES = ('queue', 'app', 'body', 'save', 'links', 'hooks', 'total')
+
+# Maximum number of intervals in the pages-per-second report
+MAX_THROUGHPUT_INTERVALS = 20
+
+
+class FreezeStats:
+    """Collects timings of frozen pages, and reports on them
+
+    An instance is a plugin: pass it in the `plugins` configuration,
+    and after the freeze, use `as_dict` or `format_report`.
+
+    slowest: the number of slowest pages to report
+    """
+    def __init__(self, slowest: int = 10):
+        self.slowest = slowest
+        self.pages: List[TaskInfo] = []
+        self._start = time.perf_counter()
+        # When each page was done, in seconds after the start
+        self._done_times: List[float] = []
+        self._freeze_info: Optional[FreezeInfo] = None
+
+    def __call__(self, freeze_info: FreezeInfo) -> None:
+        self._freeze_info = freeze_info
+        freeze_info.add_hook('start', self._freeze_started)
+        freeze_info.add_hook('page_frozen', self._page_done)
+        freeze_info.add_hook('page_failed', self._page_done)
+
+    def _freeze_started(self, freeze_info: FreezeInfo) -> None:
+        self._start = time.perf_counter()
+
+    def _page_done(self, task_info: TaskInfo) -> None:
+        self.pages.append(task_info)
+        self._done_times.append(time.perf_counter() - self._start)
+
+    @property
+    def duration(self) -> float:
+        """Time from the start of the freeze to the last page, in seconds"""
+        if not self._done_times:
+            return 0.0
+        return self._done_times[-1]
+
+    def throughput(self) -> List[Dict[str, float]]:
+        """Pages per second over time
+
+        The freeze is divided into intervals of whole seconds;
+        for each one, returns its start and the number of pages per second.
+        """
+        interval = max(
+            1, math.ceil(self.duration / MAX_THROUGHPUT_INTERVALS),
+        )
+        counts = [0] * (int(self.duration // interval) + 1)
+        for done_time in self._done_times:
+            counts[int(done_time // interval)] += 1
+        return [
+            {'start': i * interval, 'pages_per_second': count / interval}
+            for i, count in enumerate(counts)
+        ]
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the statistics as a JSON-serializable dict"""
+        pages: List[Dict[str, Any]] = [
+            {
+                'path': task_info.path,
+                'failed': task_info.exception is not None,
+                'timings': task_info.timings,
+            }
+            for task_info in self.pages
+        ]
+        slowest = sorted(
+            pages,
+            key=lambda page: page['timings'].get('total', 0),
+            reverse=True,
+        )
+        duration = self.duration
+        return {
+            'page_count': len(pages),
+            'failed_count': sum(page['failed'] for page in pages),
+            'duration': duration,
+            'pages_per_second': len(pages) / duration if duration else None,
+            'phase_totals': {
+                phase: sum(page['timings'].get(phase, 0) for page in pages)
+                for phase in PHASES
+            },
+            'slowest': slowest[:self.slowest],
+            'throughput': self.throughput(),
+            'caches': self.cache_stats(),
+            'pages': pages,
+        }
+
+    def cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return statistics of the freezer's caches"""
+        if self._freeze_info is None:
+            return {}
+        return {
+            name: {**info._asdict(), 'hit_rate': info.hit_rate}
+            for name, info in self._freeze_info.cache_info().items()
+        }
+
+    def format_report(self, stats: Optional[Dict[str, Any]] = None) -> str:
+        """Return a human-readable report"""
+        if stats is None:
+            stats = self.as_dict()
+        lines = []
+        summary = (
+            f'Frozen {stats["page_count"]} pages in {stats["duration"]:.2f} s'
+        )
+        if stats['pages_per_second'] is not None:
+            summary += f', {stats["pages_per_second"]:.1f} pages/s'
+        if stats['failed_count']:
+            summary += f' ({stats["failed_count"]} failed)'
+        lines.append(summary)
+
+        lines.append('')
+        lines.append('Time per phase (sum over all pages):')
+        for phase, total in stats['phase_totals'].items():
+            lines.append(f'  {phase:<6} {total:10.3f} s')
+
+        if stats['slowest']:
+            lines.append('')
+            lines.append('Slowest pages:')
+            for page in stats['slowest']:
+                total = page['timings'].get('total', 0)
+                lines.append(f'  {total:8.3f} s  {page["path"]}')
+
+        if stats['caches']:
+            lines.append('')
+            lines.append('Caches:')
+            for name, info in stats['caches'].items():
+                lines.append(
+                    f'  {name:<12} {info["hit_rate"]:6.1%} hits '
+                    + f'({info["hits"]} hits, {info["misses"]} misses, '
+                    + f'{info["currsize"]}/{info["maxsize"]} entries)'
+                )
+
+        lines.append('')
+        lines.append('Pages per second:')
+        for interval in stats['throughput']:
+            lines.append(
+                f'  {interval["start"]:6.0f} s  '
+                + f'{interval["pages_per_second"]:8.1f}'
+            )
+        return '\n'.join(lines)
@@ -1,6 +1,6 @@
 from typing import Any, Union, TYPE_CHECKING, Tuple, Callable
 from typing import List, Literal, TypedDict, Optional, BinaryIO, Dict, Iterable
-from typing import Coroutine
+from typing import Coroutine, Protocol
 from types import TracebackType
 
 from . import asgiref_typing
@@ -35,14 +35,64 @@ UrlFinder = Callable[
     Union[Iterable[str], Coroutine[Any, Any, Iterable[str]]],
 ]
 
+class UrlFinderParser(Protocol):
+    """Incremental link parser returned by a streaming URL finder's `stream`
+
+    `feed` is called with chunks of the page as they are received,
+    and `close` at the end. Both return links found so far.
+    """
+    def feed(self, data: bytes) -> Iterable[str]: ...
+    def close(self) -> Iterable[str]: ...
+
 ActionFunction = Callable[['hooks.TaskInfo'], str]
 
 class OutputConfig_dict(TypedDict):
     type: Literal['dict']
 
+class PrecompressConfig(TypedDict):
+    formats: NotRequired[List[Literal['gzip', 'br', 'zstd']]]
+    min_size: NotRequired[int]
+    mime_types: NotRequired[Union[List[str], Dict[str, List[str]]]]
+    workers: NotRequired[int]
+    levels: NotRequired[Dict[Literal['gzip', 'br', 'zstd'], int]]
+
 class OutputConfig_dir(TypedDict):
     type: Literal['dir']
     dir: Union[str, PathLike_str]
+    dedup: NotRequired[Literal['hardlink', 'symlink', 'reflink']]
+    precompress: NotRequired[PrecompressConfig]
+    writers: NotRequired[int]
+    restore_on_failure: NotRequired[bool]
+
+class OutputConfig_zip(TypedDict):
+    type: Literal['zip']
+    file: Union[str, PathLike_str]
+    compression: NotRequired[Literal['stored', 'deflated', 'bzip2', 'lzma']]
+
+class OutputConfig_tar(TypedDict):
+    type: Literal['tar']
+    file: Union[str, PathLike_str]
+    compression: NotRequired[Optional[Literal['gz', 'bz2', 'xz', 'zst']]]
+
+class OutputConfig_sqlite(TypedDict):
+    type: Literal['sqlite']
+    file: Union[str, PathLike_str]
+    batch_size: NotRequired[int]
+
+class OutputConfig_s3(TypedDict):
+    type: Literal['s3']
+    bucket: str
+    endpoint: NotRequired[str]
+    region: NotRequired[str]
+    access_key_id: NotRequired[str]
+    secret_access_key: NotRequired[str]
+    session_token: NotRequired[str]
+    virtual_host: NotRequired[bool]
+    key_prefix: NotRequired[str]
+    concurrency: NotRequired[int]
+    multipart_threshold: NotRequired[int]
+    part_size: NotRequired[int]
+    delete_stale: NotRequired[bool]
 
 class HooksConfig(TypedDict):
     start: NotRequired[Iterable[Union[str, Callable[['hooks.FreezeInfo'], object]]]]
@@ -63,6 +113,35 @@ class ExtraFileConfig_copy_from(TypedDict):
 
 ExtraFileConfig = Union[str, bytes, ExtraFileConfig_base64, ExtraFileConfig_copy_from]
 
+class IncrementalConfig(TypedDict):
+    manifest: Union[str, PathLike_str]
+    stale_pages: NotRequired[ExtraPagesConfig]
+
+class WSGIPoolConfig(TypedDict):
+    type: NotRequired[Literal['process', 'thread']]
+    workers: NotRequired[int]
+    app: NotRequired[str]
+
+class FinderPoolConfig(TypedDict):
+    workers: NotRequired[int]
+    max_inflight_bytes: NotRequired[int]
+    max_batch_bytes: NotRequired[int]
+    start_method: NotRequired[Literal['fork', 'spawn', 'forkserver']]
+
+class ConcurrencyConfig(TypedDict):
+    limit: NotRequired[int]
+    adaptive: NotRequired[bool]
+    min: NotRequired[int]
+    max: NotRequired[int]
+    latency_tolerance: NotRequired[float]
+    max_loop_lag: NotRequired[float]
+
+class ProfileAppConfig(TypedDict):
+    output: Union[str, PathLike_str]
+    format: NotRequired[Literal['pstats', 'collapsed']]
+    sample: NotRequired[float]
+    pattern: NotRequired[str]
+
 class Config(TypedDict):
     version: NotRequired[Union[int, str]]
     default_mimetype: NotRequired[str]
@@ -71,15 +150,25 @@ class Config(TypedDict):
     static_mode: NotRequired[bool]
     app: NotRequired[Union[str, AnyApp]]
     app_interface: NotRequired[Literal['wsgi', 'asgi']]
+    wsgi_pool: NotRequired[WSGIPoolConfig]
     fail_fast: NotRequired[bool]
     plugins: NotRequired[Iterable[Union[str, Callable[['hooks.FreezeInfo'], object]]]]
     use_default_url_finders: NotRequired[bool]
     url_finders: NotRequired[Dict[str, Union[str, UrlFinder]]]
+    finder_pool: NotRequired[FinderPoolConfig]
+    concurrency: NotRequired[Union[int, Literal['adaptive'], ConcurrencyConfig]]
+    profile_app: NotRequired[Union[str, PathLike_str, ProfileAppConfig]]
+    url_cache_size: NotRequired[int]
     status_handlers: NotRequired[Dict[str, Union[str, ActionFunction]]]
-    output: Union[str, PathLike_str, OutputConfig_dict, OutputConfig_dir]
+    output: Union[
+        str, PathLike_str,
+        OutputConfig_dict, OutputConfig_dir, OutputConfig_zip, OutputConfig_tar,
+        OutputConfig_sqlite, OutputConfig_s3,
+    ]
     hooks: NotRequired[HooksConfig]
     cleanup: NotRequired[bool]
     prefix: NotRequired[str]
     extra_pages: NotRequired[Iterable[str]]
     extra_files: NotRequired[Optional[Dict[str, ExtraFileConfig]]]
     gh_pages: NotRequired[bool]
+    incremental: NotRequired[Union[str, PathLike_str, IncrementalConfig]]
@@ -1,8 +1,12 @@
 import xml.etree.ElementTree
 from typing import Iterable, BinaryIO, Optional, Any, TYPE_CHECKING
-import asyncio
+from typing import List, Tuple
+from urllib.parse import urljoin
+import html.parser
+import re
 
 import html5lib
+import webencodings
 import tinycss2
 import tinycss2.ast
 import tinycss2_core_attributes
@@ -10,27 +14,28 @@ import tinycss2_core_attributes
 from werkzeug.datastructures import Headers
 from werkzeug.http import parse_options_header
 
-from .util import process_pool_executor
+from .finder_pool import get_finder_pool
 from .types import WSGIHeaderList, UrlFinder
 
 
 _Headers = Optional[WSGIHeaderList]
 
 
+def _get_transport_charset(headers: _Headers) -> Optional[str]:
+    if headers == None:
+        return None
+    content_type_header = Headers(headers).get('Content-Type')
+    cont_type, cont_options = parse_options_header(content_type_header)
+    return cont_options.get('charset')
+
+
 def _get_css_links(
     content: bytes, base_url: str, headers: _Headers,
 )  -> Iterable[str]:
     """Get all links from a CSS file."""
-    if headers == None:
-        cont_charset = None
-    else:
-        content_type_header = Headers(headers).get('Content-Type')
-        cont_type, cont_options = parse_options_header(content_type_header)
-        cont_charset = cont_options.get('charset')
-
     parsed, encoding = tinycss2.parse_stylesheet_bytes(
         content,
-        protocol_encoding=cont_charset,
+        protocol_encoding=_get_transport_charset(headers),
         skip_comments=True,
         skip_whitespace=True,
         # Ideally, we'd set `environment_encoding` to the encoding of the
@@ -81,16 +86,116 @@ def _get_html_links(
         for child in node:
             yield from get_links_from_node(child, base_url)
 
-    if headers == None:
-        cont_charset = None
-    else:
-        content_type_header = Headers(headers).get('Content-Type')
-        cont_type, cont_options = parse_options_header(content_type_header)
-        cont_charset = cont_options.get('charset')
-    document = html5lib.parse(page_content, transport_encoding=cont_charset)
+    document = html5lib.parse(
+        page_content, transport_encoding=_get_transport_charset(headers),
+    )
     return list(get_links_from_node(document, base_url))
 
 
+# Number of bytes searched for a <meta> charset declaration
+_PRESCAN_SIZE = 1024
+
+_META_CHARSET_RE = re.compile(
+    rb"""<meta[^>]*?charset\s*=\s*["']?\s*([-a-z0-9_:.]+)""",
+    re.IGNORECASE,
+)
+
+
+class _LinkCollector(html.parser.HTMLParser):
+    """HTMLParser that collects links from tags' attributes"""
+    def __init__(self, page_url: str):
+        super().__init__(convert_charrefs=True)
+        self.page_url = page_url
+        self.base_href: Optional[str] = None
+        self.links: List[str] = []
+
+    def handle_starttag(
+        self, tag: str, attrs: List[Tuple[str, Optional[str]]],
+    ) -> None:
+        # For duplicate attributes, the first one wins (as in html5lib)
+        attr_values = {}
+        for name, value in reversed(attrs):
+            attr_values[name] = value or ''
+        href = attr_values.get('href')
+        if tag == 'base' and href is not None and self.base_href is None:
+            self.links.append(href)
+            self.base_href = urljoin(self.page_url, href)
+            href = None
+        if href is not None:
+            self.add_link(href)
+        if 'src' in attr_values:
+            self.add_link(attr_values['src'])
+        if 'srcset' in attr_values:
+            for candidate in attr_values['srcset'].split(','):
+                url, *descriptors = candidate.split() or ['']
+                if url:
+                    self.add_link(url)
+
+    def add_link(self, link: str) -> None:
+        if self.base_href is not None:
+            link = urljoin(self.base_href, link)
+        self.links.append(link)
+
+
+class HTMLLinkParser:
+    """Incremental link finder for HTML, used by get_html_links_fast
+
+    Call `feed` with chunks of the page and `close` at the end;
+    both return the links found so far.
+    Links are resolved against the page's `<base href>`, if any.
+    """
+    def __init__(self, base_url: str, headers: _Headers = None):
+        self._collector = _LinkCollector(base_url)
+        self._encoding = _get_transport_charset(headers)
+        self._decoder: Optional[webencodings.IncrementalDecoder] = None
+        self._undecoded = b''
+
+    def _start_decoding(self) -> None:
+        # Like html5lib, without a declared encoding we search for
+        # a <meta> charset and then fall back to windows-1252.
+        # A byte order mark overrides all of these (the decoder handles it).
+        encoding = None
+        if self._encoding is not None:
+            encoding = webencodings.lookup(self._encoding)
+        if encoding is None:
+            prescan = self._undecoded[:_PRESCAN_SIZE]
+            match = _META_CHARSET_RE.search(prescan)
+            if match:
+                encoding = webencodings.lookup(match[1].decode('ascii'))
+                if encoding is not None and encoding.name.startswith('utf-16'):
+                    encoding = webencodings.UTF8
+        self._decoder = webencodings.IncrementalDecoder(
+            encoding or 'windows-1252', errors='replace',
+        )
+
+    def _take_links(self) -> List[str]:
+        links = self._collector.links
+        self._collector.links = []
+        return links
+
+    def feed(self, data: bytes) -> List[str]:
+        if self._decoder is None:
+            self._undecoded += data
+            if self._encoding is None and len(self._undecoded) < _PRESCAN_SIZE:
+                return []
+            self._start_decoding()
+            assert self._decoder is not None
+            data, self._undecoded = self._undecoded, b''
+        self._collector.feed(self._decoder.decode(data))
+        return self._take_links()
+
+    def close(self) -> List[str]:
+        if self._decoder is None:
+            self._start_decoding()
+            assert self._decoder is not None
+            data, self._undecoded = self._undecoded, b''
+        else:
+            data = b''
+        self._collector.feed(self._decoder.decode(data, final=True))
+        self._collector.close()
+        return self._take_links()
+
+
 def get_html_links(
     html_file: BinaryIO, base_url: str, headers: _Headers=None,
 ) -> Iterable[str]:
@@ -108,22 +213,41 @@ def get_css_links(
 async def get_css_links_async(
     css_file: BinaryIO, base_url: str, headers: _Headers=None,
 )  -> Iterable[str]:
-    loop = asyncio.get_running_loop()
     content = css_file.read()
-    return await loop.run_in_executor(
-        process_pool_executor, _get_css_links, content, base_url, headers,
+    return await get_finder_pool().run(
+        _get_css_links, content, base_url, headers,
     )
 
 
 async def get_html_links_async(
     html_file: BinaryIO, base_url: str, headers: _Headers=None,
 )  -> Iterable[str]:
-    loop = asyncio.get_running_loop()
     content = html_file.read()
-    return await loop.run_in_executor(
-        process_pool_executor, _get_html_links, content, base_url, headers,
+    return await get_finder_pool().run(
+        _get_html_links, content, base_url, headers,
     )
 
+def get_html_links_fast(
+    html_file: BinaryIO, base_url: str, headers: _Headers=None,
+) -> Iterable[str]:
+    """Get all links from HTML, without building a document tree
+
+    Faster than get_html_links. In addition to `href` and `src`,
+    finds URLs in `srcset`, and resolves links against `<base href>`.
+    """
+    parser = HTMLLinkParser(base_url, headers)
+    links = parser.feed(html_file.read())
+    links.extend(parser.close())
+    return links
+
+def _stream_html_links_fast(
+    base_url: str, headers: _Headers=None,
+) -> HTMLLinkParser:
+    return HTMLLinkParser(base_url, headers)
+
+# Freezeyt feeds the page to the parser as it is received
+get_html_links_fast.stream = _stream_html_links_fast  # type: ignore[attr-defined]
+
 def none(
     html_file: BinaryIO, base_url: str, headers: _Headers=None,
 )  -> Iterable[str]:
@@ -136,4 +260,5 @@ if TYPE_CHECKING:
     _ = get_css_links_async
     _ = get_html_links
     _ = get_html_links_async
+    _ = get_html_links_fast
     _ = none
@@ -1,3 +1,4 @@
+import sys
 import urllib.parse
 import functools
 from typing import Union
@@ -25,6 +26,10 @@ def get_port(port, scheme):
 class BaseURL:
     """An absolute IRI as used internally by Freezeyt
     """
+    # Many URLs are kept in memory while freezing a large site,
+    # so URL objects don't have a __dict__
+    __slots__ = ('_split_url', 'prefix')
+
     prefix: 'PrefixURL'
 
     def __init__(
@@ -87,6 +92,8 @@ class PrefixURL(BaseURL):
     For example:
         https://localhost/some-path/
     """
+    __slots__ = ()
+
     def __init__(self, str_or_splitresult: Union[str, urllib.parse.SplitResult], /):
         super().__init__(str_or_splitresult)
         _url = str_or_splitresult
@@ -142,7 +149,15 @@ class AppURL(BaseURL):
     It has the same netloc as the prefix, and its path is within the prefix
     path.
     Any fragment is discarded (it would not be sent to a server anyway).
+
+    AppURLs compare equal if they have the same relative path, query
+    and prefix object. The hash is computed once, and relative paths are
+    interned, so equal URLs found on many pages share one string.
     """
+    __slots__ = ('relative_path', '_hash')
+
+    relative_path: str
+
     def __init__(
         self,
         str_or_splitresult: Union[str, urllib.parse.SplitResult],
@@ -164,9 +179,9 @@ class AppURL(BaseURL):
         prefix_path = prefix.path
         app_path = split_url.path
         if app_path.startswith(prefix_path):
-            self.relative_path = app_path[len(prefix.path):]
+            relative_path = sys.intern(app_path[len(prefix_path):])
         elif app_path + '/' == prefix_path:
-            self.relative_path = ''
+            relative_path = ''
         else:
             raise ExternalURLError(
                 f"External URL: {_url!r} "
@@ -174,19 +189,25 @@ class AppURL(BaseURL):
             )
         self._split_url = split_url
         self.prefix = prefix
+        self.relative_path = relative_path
+        self._hash = hash(self._key)
 
     @property
     def _key(self):
         return self.relative_path, self.query, self.prefix
 
     def __eq__(self, other):
+        if self is other:
+            return True
+        if self._hash != other._hash:
+            return False
         return self._key == other._key
 
     def __le__(self, other):
         return self._key < other._key
 
     def __hash__(self):
-        return hash(self._key)
+        return self._hash
 
     @property
     def relative_path_with_query(self):
@@ -1,6 +1,7 @@
 import importlib
-import concurrent.futures
+import collections
 from typing import Sequence, TYPE_CHECKING, List, Optional, TypeVar
+from typing import Callable, Generic, Hashable, NamedTuple
 import enum
 
 from werkzeug.http import HTTP_STATUS_CODES
@@ -15,9 +16,6 @@ if TYPE_CHECKING:
     from freezeyt.urls import AppURL
 
 
-process_pool_executor = concurrent.futures.ProcessPoolExecutor()
-
-
 class InfiniteRedirection(Exception):
     """Infinite redirection was detected with redirect_policy='follow'"""
     def __init__(self, task: 'Task'):
@@ -112,6 +110,62 @@ class TaskStatus(enum.Enum):
 
 
 T = TypeVar('T')
+K = TypeVar('K', bound=Hashable)
+
+
+class CacheInfo(NamedTuple):
+    """Statistics of a cache, like those of functools.lru_cache"""
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups that were found in the cache"""
+        lookups = self.hits + self.misses
+        if not lookups:
+            return 0.0
+        return self.hits / lookups
+
+
+class LRUCache(Generic[K, T]):
+    """Remembers values for the most recently used keys
+
+    Unlike functools.lru_cache, the cache key doesn't need to contain
+    everything that's needed to compute the value.
+    With maxsize=0, nothing is remembered.
+    """
+    def __init__(self, maxsize: int):
+        if maxsize < 0:
+            raise ValueError('cache size must not be negative')
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: 'collections.OrderedDict[K, T]' = collections.OrderedDict()
+
+    def get(self, key: K, compute: Callable[[], T]) -> T:
+        """Return the value for `key`, calling `compute` if it's not cached
+
+        If `compute` raises an exception, nothing is cached.
+        """
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            value = compute()
+            if self.maxsize:
+                self._data[key] = value
+                if len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+            return value
+        self.hits += 1
+        self._data.move_to_end(key)
+        return value
+
+    def info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._data))
+
 
 def import_variable_from_module(
     name: str,
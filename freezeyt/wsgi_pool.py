@@ -0,0 +1,266 @@
+"""Pools for running WSGI applications outside the event loop
+
+By default, WSGIToASGIMiddleware calls the WSGI application directly,
+blocking the event loop (and using a single CPU core).
+A pool, selected by the `wsgi_pool` config key, runs the application in
+several worker processes or threads instead.
+"""
+
+import io
+import sys
+import asyncio
+import concurrent.futures
+from typing import Dict, List, Optional, Tuple, Mapping, Iterable, Union
+from typing import Iterator
+
+from freezeyt.types import asgi_types, WSGIExceptionInfo, WSGIStartResponseResult
+from freezeyt.util import import_variable_from_module
+from freezeyt.compat import WSGIApplication
+
+
+WSGIResult = Tuple[int, List[Tuple[bytes, bytes]], bytes]
+
+
+class StartResponse:
+    """WSGI start_response callable that records the status and headers
+
+    The application we are freezing calls this with the status line
+    (like '200 OK'), the headers, and information about a server error,
+    if any (which is raised).
+    See: https://www.python.org/dev/peps/pep-3333/#the-start-response-callable
+
+    After start_response is called, `status` and `headers` are set
+    (headers are encoded as for ASGI).
+    Data passed to the "write" function is collected in `written`.
+    """
+    status: Optional[int] = None
+    headers: List[Tuple[bytes, bytes]]
+
+    def __init__(self) -> None:
+        self.headers = []
+        self.written: List[bytes] = []
+
+    def __call__(
+        self,
+        status: str,
+        headers: List[Tuple[str, str]],
+        exc_info: WSGIExceptionInfo = None,
+    ) -> WSGIStartResponseResult:
+        if exc_info:
+            exc_type, value, traceback = exc_info
+            if value is not None:
+                raise value
+
+        if self.status is not None:
+            raise AssertionError(
+                'WSGI application called start_response twice')
+
+        self.status = int(status.split(maxsplit=1)[0])
+        self.headers = [
+            (key.encode('latin-1'), value.encode('latin-1'))
+            for key, value in headers
+        ]
+        return self.written.append
+
+    def get_start_event(self) -> asgi_types.HTTPResponseStartEvent:
+        if self.status is None:
+            raise AssertionError(
+                'WSGI application did not call start_response')
+        return {
+            'type': "http.response.start",
+            'status': self.status,
+            'headers': self.headers,
+        }
+
+
+class WSGIProcessPool:
+    """Runs a WSGI application in a pool of worker processes
+
+    The application is imported in each worker by its import string.
+    Each request is handled by one worker, and the complete response
+    is sent back to the main process.
+    """
+    def __init__(self, app_name: str, workers: Optional[int] = None):
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            workers,
+            initializer=_init_worker,
+            initargs=(app_name,),
+        )
+
+    async def handle(
+        self,
+        environ: Dict[str, object],
+        send: asgi_types.ASGISendCallable,
+    ) -> None:
+        # Streams can't be sent to another process; the worker will
+        # create its own.
+        environ = {
+            key: value for key, value in environ.items()
+            if key not in ('wsgi.input', 'wsgi.errors')
+        }
+        environ['wsgi.multiprocess'] = True
+
+        loop = asyncio.get_running_loop()
+        status, headers, body = await loop.run_in_executor(
+            self.executor, _call_app_in_worker, environ,
+        )
+        await send({
+            'type': "http.response.start",
+            'status': status,
+            'headers': headers,
+        })
+        await send({
+            'type': "http.response.body",
+            'body': body,
+            'more_body': False,
+        })
+
+    def shutdown(self) -> None:
+        self.executor.shutdown()
+
+
+# The app in a worker process (set by _init_worker)
+_worker_app: Optional[WSGIApplication] = None
+
+def _init_worker(app_name: str) -> None:
+    global _worker_app
+    _worker_app = import_variable_from_module(
+        app_name, default_variable_name='app',
+    )
+
+def _call_app_in_worker(environ: Dict[str, object]) -> WSGIResult:
+    assert _worker_app is not None
+    environ['wsgi.input'] = io.BytesIO()
+    environ['wsgi.errors'] = sys.stderr
+    return call_wsgi_app(_worker_app, environ)
+
+
+def call_wsgi_app(
+    wsgi_app: WSGIApplication,
+    environ: Dict[str, object],
+) -> WSGIResult:
+    """Call a WSGI application and return the complete response
+
+    Returns the status code, the headers (encoded as for ASGI)
+    and the body.
+    """
+    start_response = StartResponse()
+    result_iterable = wsgi_app(environ, start_response)
+    try:
+        # The app may call start_response (and write) when the result
+        # is iterated, so iterate before checking the status.
+        body_parts = start_response.written
+        body_parts.extend(result_iterable)
+        start_event = start_response.get_start_event()
+    finally:
+        close = getattr(result_iterable, 'close', None)
+        if close is not None:
+            close()
+    return start_event['status'], start_response.headers, b''.join(body_parts)
+
+
+class WSGIThreadPool:
+    """Runs a WSGI application in a pool of threads
+
+    The application is called, and its response is iterated, in the pool's
+    threads; the event loop is free to do other work in the meantime.
+    """
+    def __init__(
+        self,
+        wsgi_app: WSGIApplication,
+        workers: Optional[int] = None,
+    ):
+        self.wsgi_app = wsgi_app
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            workers,
+            thread_name_prefix='freezeyt-wsgi',
+        )
+
+    def _start_app(
+        self,
+        environ: Dict[str, object],
+        start_response: StartResponse,
+    ) -> Tuple[Iterable[bytes], Iterator[bytes], Optional[bytes]]:
+        """Call the app and get the first part of the body
+
+        The app may call start_response when the result is iterated,
+        so the first part is needed before the response can be started.
+        """
+        result_iterable = self.wsgi_app(environ, start_response)
+        try:
+            iterator = iter(result_iterable)
+            first_part = next(iterator, None)
+        except BaseException:
+            close = getattr(result_iterable, 'close', None)
+            if close is not None:
+                close()
+            raise
+        return result_iterable, iterator, first_part
+
+    async def handle(
+        self,
+        environ: Dict[str, object],
+        send: asgi_types.ASGISendCallable,
+    ) -> None:
+        environ['wsgi.multithread'] = True
+
+        loop = asyncio.get_running_loop()
+        start_response = StartResponse()
+        result_iterable, iterator, body_part = await loop.run_in_executor(
+            self.executor, self._start_app, environ, start_response,
+        )
+        try:
+            await send(start_response.get_start_event())
+            for written_part in start_response.written:
+                await send({
+                    'type': "http.response.body",
+                    'body': written_part,
+                    'more_body': True,
+                })
+            while body_part is not None:
+                await send({
+                    'type': "http.response.body",
+                    'body': body_part,
+                    'more_body': True,
+                })
+                body_part = await loop.run_in_executor(
+                    self.executor, next, iterator, None,
+                )
+            await send({
+                'type': "http.response.body",
+                'more_body': False,
+            })
+        finally:
+            close = getattr(result_iterable, 'close', None)
+            if close is not None:
+                await loop.run_in_executor(self.executor, close)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown()
+
+
+WSGIPool = Union[WSGIProcessPool, WSGIThreadPool]
+
+
+def get_wsgi_pool(
+    config: Mapping,
+    wsgi_app: WSGIApplication,
+) -> Optional[WSGIPool]:
+    """Create a pool as given by the `wsgi_pool` config key, if any"""
+    pool_config = config.get('wsgi_pool')
+    if pool_config is None:
+        return None
+    pool_type = pool_config.get('type', 'process')
+    workers = pool_config.get('workers')
+    if pool_type == 'process':
+        app_name = pool_config.get('app', config.get('app'))
+        if not isinstance(app_name, str):
+            raise ValueError(
+                'A process wsgi_pool needs the app as an import string; '
+                + 'set "app" in the configuration or in wsgi_pool'
+            )
+        return WSGIProcessPool(app_name, workers)
+    elif pool_type == 'thread':
+        return WSGIThreadPool(wsgi_app, workers)
+    else:
+        raise ValueError(f'unknown wsgi_pool type {pool_type!r}')
@@ -1,22 +1,34 @@
 import io
 import sys
 import itertools
-from typing import List, Dict, Tuple, Optional
+from typing import Dict, Optional
 
 import freezeyt
 from freezeyt.types import asgi_types
 from freezeyt.encoding import encode_wsgi_path
 from freezeyt.urls import PrefixURL
-from freezeyt.types import WSGIExceptionInfo, WSGIStartResponseResult
 from freezeyt.compat import WSGIApplication
+from freezeyt.wsgi_pool import WSGIPool, StartResponse
 
 
 class WSGIToASGIMiddleware:
     """Middleware that converts a WSGI app into an ASGI app."""
 
-    def __init__(self, wsgi_app: WSGIApplication, *, prefix: PrefixURL):
+    def __init__(
+        self,
+        wsgi_app: WSGIApplication,
+        *,
+        prefix: PrefixURL,
+        pool: Optional[WSGIPool] = None,
+    ):
         self.wsgi_app = wsgi_app
         self.prefix = prefix
+        self.pool = pool
+
+    def shutdown(self) -> None:
+        """Shut down the pool that runs the app, if any"""
+        if self.pool is not None:
+            self.pool.shutdown()
 
     async def __call__(
         self,
@@ -74,9 +86,13 @@ class WSGIToASGIMiddleware:
                 environ['HTTP_HOST'] = hostname + ':' + str(port)
             environ['SERVER_PORT'] = str(port)
 
+        if self.pool is not None:
+            await self.pool.handle(environ, send)
+            return
+
         # The WSGI application can output data in two ways:
         # - by a "write" function, which, in our case, will append
-        #   any data to a list, `wsgi_write_data`
+        #   any data to a list, `start_response.written`
         # - (preferably) by returning an iterable object.
 
         # See: https://www.python.org/dev/peps/pep-3333/#the-write-callable
@@ -86,62 +102,20 @@ class WSGIToASGIMiddleware:
         # We instead collect them and send them all at once, since we know
         # that the client (Freezeyt) won't mind.
 
-        wsgi_write_data: List[bytes] = []
-        start_event: Optional[asgi_types.HTTPResponseStartEvent] = None
-
-        def start_response(
-            status: str,
-            headers: List[Tuple[str, str]],
-            exc_info: WSGIExceptionInfo = None,
-        ) -> WSGIStartResponseResult:
-            """WSGI start_response hook
-
-            The application we are freezing will call this method
-            and supply the status, headers, exc_info arguments.
-            (self and wsgi_write are provided by freezeyt.)
-
-            See: https://www.python.org/dev/peps/pep-3333/#the-start-response-callable
-
-            Arguments:
-                status: HTTP status line, like '200 OK'
-                headers: HTTP headers (list of tuples)
-                exc_info: Information about a server error, if any.
-                    Will be raised if given.
-            """
-            nonlocal start_event
-
-            if exc_info:
-                exc_type, value, traceback = exc_info
-                if value is not None:
-                    raise value
-
-            if start_event:
-                raise AssertionError(
-                    'WSGI application called start_response twice')
-
-            start_event = asgi_types.HTTPResponseStartEvent(
-                type="http.response.start",
-                headers=[
-                    (key.encode('latin-1'), value.encode('latin-1'))
-                    for key, value in headers
-                ],
-                status=int(status.split(maxsplit=1)[0]),
-            )
-
-            return wsgi_write_data.append
-
-        # Call the application. All calls to write (wsgi_write_data.append)
-        # must be done as part of this call.
+        start_response = StartResponse()
+
+        # Call the application. All calls to write must be done as part
+        # of this call.
         result_iterable = self.wsgi_app(environ, start_response)
 
-        if not start_event:
-            raise AssertionError(
-                'WSGI application did not call start_response')
+        start_event = start_response.get_start_event()
         await send(start_event)
 
         try:
             event: asgi_types.HTTPResponseBodyEvent
-            for body_part in itertools.chain(wsgi_write_data, result_iterable):
+            for body_part in itertools.chain(
+                start_response.written, result_iterable,
+            ):
                 event = {
                     'type': "http.response.body",
                     'body': body_part,
@@ -0,0 +1,290 @@
+"""A small S3-compatible server for testing the S3 saver
+
+Supports path-style requests for: ListObjectsV2, PutObject, GetObject,
+multipart uploads and DeleteObjects. Request signatures (AWS Signature V4)
+and Content-MD5 headers are checked.
+
+With md5_etags=False, ETags are random, like the ETags S3 gives
+encrypted objects (SSE-KMS or SSE-C).
+"""
+
+import re
+import base64
+import secrets
+import hashlib
+import datetime
+import threading
+import contextlib
+import urllib.parse
+import xml.etree.ElementTree as ET
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from freezeyt.s3saver import sign_request
+
+
+ACCESS_KEY_ID = 'AKIAFAKEFAKEFAKE'
+SECRET_ACCESS_KEY = 'fake/secret/key'
+REGION = 'eu-test-1'
+
+AUTH_RE = re.compile(
+    r'AWS4-HMAC-SHA256 Credential=(?P<key_id>[^/]+)/(?P<scope>[^,]+), '
+    + r'SignedHeaders=(?P<headers>[^,]+), Signature=(?P<signature>[0-9a-f]+)'
+)
+
+
+class FakeS3Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, bucket, md5_etags=True):
+        super().__init__(('127.0.0.1', 0), FakeS3Handler)
+        self.bucket = bucket
+        self.md5_etags = md5_etags
+        # key -> (content, etag, content type)
+        self.objects = {}
+        # upload id -> (key, content type, {part number: (content, etag)})
+        self.uploads = {}
+        # (method, key, sorted query keys) of each request
+        self.requests = []
+        # Number of objects in one page of a listing
+        self.page_size = 1000
+        self.lock = threading.Lock()
+        self.running_requests = 0
+        self.max_running_requests = 0
+
+    @property
+    def endpoint(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def make_etag(self, content):
+        if self.md5_etags:
+            return hashlib.md5(content).hexdigest()
+        return secrets.token_hex(16)
+
+    def put_object(self, key, content, content_type='application/octet-stream'):
+        etag = self.make_etag(content)
+        self.objects[key] = content, etag, content_type
+
+    def requests_with(self, method, query=()):
+        return [
+            key for m, key, q in self.requests
+            if m == method and q == tuple(sorted(query))
+        ]
+
+
+class FakeS3Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: FakeS3Server
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle_one_request(self):
+        with self.server.lock:
+            self.server.running_requests += 1
+            self.server.max_running_requests = max(
+                self.server.max_running_requests,
+                self.server.running_requests,
+            )
+        try:
+            super().handle_one_request()
+        finally:
+            with self.server.lock:
+                self.server.running_requests -= 1
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_PUT(self):
+        self.handle_request('PUT')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def do_DELETE(self):
+        self.handle_request('DELETE')
+
+    def send(self, status, body=b'', headers=()):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_xml(self, status, code, message=''):
+        body = (
+            f'<?xml version="1.0" encoding="UTF-8"?><Error><Code>{code}</Code>'
+            + f'<Message>{message}</Message></Error>'
+        ).encode()
+        self.send(status, body, [('Content-Type', 'application/xml')])
+
+    def check_signature(self, method, path, query, body):
+        match = AUTH_RE.fullmatch(self.headers.get('Authorization', ''))
+        if not match or match['key_id'] != ACCESS_KEY_ID:
+            return False
+        payload_hash = self.headers['x-amz-content-sha256']
+        if payload_hash != hashlib.sha256(body).hexdigest():
+            return False
+        headers = {
+            name: self.headers[name] for name in match['headers'].split(';')
+        }
+        timestamp = datetime.datetime.strptime(
+            self.headers['x-amz-date'], '%Y%m%dT%H%M%SZ',
+        )
+        expected = sign_request(
+            method, path, query, headers, payload_hash,
+            access_key_id=ACCESS_KEY_ID,
+            secret_access_key=SECRET_ACCESS_KEY,
+            region=REGION,
+            timestamp=timestamp,
+        )
+        return expected == self.headers['Authorization']
+
+    def handle_request(self, method):
+        split = urllib.parse.urlsplit(self.path)
+        path = urllib.parse.unquote(split.path)
+        query = dict(urllib.parse.parse_qsl(
+            split.query, keep_blank_values=True,
+        ))
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        bucket_prefix = f'/{self.server.bucket}'
+        if path != bucket_prefix and not path.startswith(bucket_prefix + '/'):
+            return self.send_error_xml(404, 'NoSuchBucket')
+        key = path[len(bucket_prefix) + 1:]
+        self.server.requests.append((method, key, tuple(sorted(query))))
+
+        if not self.check_signature(method, path, query, body):
+            return self.send_error_xml(403, 'SignatureDoesNotMatch')
+        content_md5 = self.headers.get('Content-MD5')
+        if content_md5 is not None:
+            if base64.b64decode(content_md5) != hashlib.md5(body).digest():
+                return self.send_error_xml(400, 'BadDigest')
+
+        if not key:
+            if method == 'GET' and query.get('list-type') == '2':
+                return self.list_objects(query)
+            if method == 'POST' and 'delete' in query:
+                return self.delete_objects(body)
+        elif method == 'GET' and not query:
+            return self.get_object(key)
+        elif method == 'PUT' and not query:
+            content_type = self.headers.get(
+                'Content-Type', 'application/octet-stream',
+            )
+            self.server.put_object(key, body, content_type)
+            etag = self.server.objects[key][1]
+            return self.send(200, headers=[('ETag', f'"{etag}"')])
+        elif method == 'POST' and 'uploads' in query:
+            upload_id = f'upload-{len(self.server.uploads)}'
+            content_type = self.headers.get(
+                'Content-Type', 'application/octet-stream',
+            )
+            self.server.uploads[upload_id] = key, content_type, {}
+            return self.send(200, (
+                '<InitiateMultipartUploadResult><Bucket>'
+                + f'{self.server.bucket}</Bucket><Key>{key}</Key>'
+                + f'<UploadId>{upload_id}</UploadId>'
+                + '</InitiateMultipartUploadResult>'
+            ).encode())
+        elif 'uploadId' in query:
+            return self.handle_upload(method, key, query, body)
+        return self.send_error_xml(400, 'NotImplemented', 'fake S3')
+
+    def list_objects(self, query):
+        prefix = query.get('prefix', '')
+        keys = sorted(k for k in self.server.objects if k.startswith(prefix))
+        token = query.get('continuation-token')
+        if token is not None:
+            keys = [k for k in keys if k > token]
+        page = keys[:self.server.page_size]
+        truncated = len(keys) > len(page)
+        contents = ''.join(
+            f'<Contents><Key>{key}</Key>'
+            + f'<ETag>&quot;{self.server.objects[key][1]}&quot;</ETag>'
+            + f'<Size>{len(self.server.objects[key][0])}</Size></Contents>'
+            for key in page
+        )
+        next_token = ''
+        if truncated:
+            next_token = f'<NextContinuationToken>{page[-1]}</NextContinuationToken>'
+        body = (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            + '<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+            + f'<Name>{self.server.bucket}</Name><Prefix>{prefix}</Prefix>'
+            + f'<KeyCount>{len(page)}</KeyCount>'
+            + f'<IsTruncated>{str(truncated).lower()}</IsTruncated>'
+            + next_token + contents + '</ListBucketResult>'
+        ).encode()
+        self.send(200, body, [('Content-Type', 'application/xml')])
+
+    def get_object(self, key):
+        try:
+            content, etag, content_type = self.server.objects[key]
+        except KeyError:
+            return self.send_error_xml(404, 'NoSuchKey')
+        self.send(200, content, [
+            ('ETag', f'"{etag}"'), ('Content-Type', content_type),
+        ])
+
+    def handle_upload(self, method, key, query, body):
+        try:
+            upload_key, content_type, parts = (
+                self.server.uploads[query['uploadId']]
+            )
+        except KeyError:
+            return self.send_error_xml(404, 'NoSuchUpload')
+        assert upload_key == key
+        if method == 'PUT' and 'partNumber' in query:
+            etag = self.server.make_etag(body)
+            parts[int(query['partNumber'])] = body, etag
+            return self.send(200, headers=[('ETag', f'"{etag}"')])
+        if method == 'DELETE':
+            del self.server.uploads[query['uploadId']]
+            return self.send(204)
+        if method == 'POST':
+            root = ET.fromstring(body)
+            numbers = [int(part.findtext('PartNumber')) for part in root]
+            if numbers != sorted(parts):
+                return self.send_error_xml(400, 'InvalidPart')
+            for number in numbers[:-1]:
+                if len(parts[number][0]) < 5 * 1024 * 1024:
+                    return self.send_error_xml(400, 'EntityTooSmall')
+            for part in root:
+                number = int(part.findtext('PartNumber'))
+                if part.findtext('ETag') != f'"{parts[number][1]}"':
+                    return self.send_error_xml(400, 'InvalidPart')
+            content = b''.join(parts[number][0] for number in numbers)
+            digests = b''.join(
+                bytes.fromhex(parts[number][1]) for number in numbers
+            )
+            etag = f'{hashlib.md5(digests).hexdigest()}-{len(numbers)}'
+            self.server.objects[key] = content, etag, content_type
+            del self.server.uploads[query['uploadId']]
+            return self.send(200, (
+                '<CompleteMultipartUploadResult>'
+                + f'<Key>{key}</Key><ETag>&quot;{etag}&quot;</ETag>'
+                + '</CompleteMultipartUploadResult>'
+            ).encode())
+        return self.send_error_xml(400, 'NotImplemented', 'fake S3')
+
+    def delete_objects(self, body):
+        root = ET.fromstring(body)
+        for obj in root.iter('Object'):
+            self.server.objects.pop(obj.findtext('Key'), None)
+        self.send(200, b'<DeleteResult></DeleteResult>')
+
+
+@contextlib.contextmanager
+def fake_s3_server(bucket='test-bucket', md5_etags=True):
+    """Run a FakeS3Server in a background thread"""
+    server = FakeS3Server(bucket, md5_etags)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
@@ -73,3 +73,24 @@ def test_as_app_url(prefix_str):
     app_url = prefix.as_app_url()
     assert str(app_url) == prefix_str
     assert app_url.relative_path == ''
+
+
+def test_equal_urls():
+    prefix = PrefixURL('http://localhost:8000/a/')
+    url1 = AppURL('http://localhost:8000/a/b/c?q=1#fragment', prefix)
+    url2 = prefix.as_app_url().join('b/' + 'c?q=1')
+    assert url1 == url2
+    assert hash(url1) == hash(url2)
+    assert url1.relative_path is url2.relative_path
+    assert len({url1, url2}) == 1
+    assert url1 != AppURL('http://localhost:8000/a/b/c?q=2', prefix)
+    assert url1 != AppURL('http://localhost:8000/a/b/c?q=1', PrefixURL(
+        'http://localhost:8000/a/',
+    ))
+
+
+def test_no_instance_dict():
+    prefix = PrefixURL('http://localhost:8000/')
+    for url in prefix, prefix.as_app_url():
+        with pytest.raises(AttributeError):
+            url.__dict__
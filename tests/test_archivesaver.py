@@ -0,0 +1,162 @@
+import io
+import asyncio
+import tarfile
+import zipfile
+from pathlib import PurePosixPath
+
+import pytest
+
+from freezeyt import freeze
+from freezeyt.archivesaver import ArchiveSaver
+from testutil import context_for_test
+
+
+ARCHIVE_CONFIGS = {
+    'zip': {'type': 'zip'},
+    'zip_stored': {'type': 'zip', 'compression': 'stored'},
+    'zip_lzma': {'type': 'zip', 'compression': 'lzma'},
+    'tar': {'type': 'tar'},
+    'tar_gz': {'type': 'tar', 'compression': 'gz'},
+    'tar_xz': {'type': 'tar', 'compression': 'xz'},
+}
+
+
+def read_archive(path):
+    """Read an archive into a dict like DictSaver's output"""
+    result = {}
+
+    def add(name, content):
+        *dirs, filename = PurePosixPath(name).parts
+        directory = result
+        for part in dirs:
+            directory = directory.setdefault(part, {})
+        directory[filename] = content
+
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for name in archive.namelist():
+                add(name, archive.read(name))
+    else:
+        with tarfile.open(path) as archive:
+            for member in archive.getmembers():
+                add(member.name, archive.extractfile(member).read())
+    return result
+
+
+@pytest.mark.parametrize('archive', ARCHIVE_CONFIGS)
+def test_archive_output(tmp_path, archive):
+    output_path = tmp_path / 'site.archive'
+    with context_for_test('app_2pages') as module:
+        config = {
+            'output': {**ARCHIVE_CONFIGS[archive], 'file': str(output_path)},
+        }
+        freeze(module.app, config)
+        assert read_archive(output_path) == module.expected_dict
+    # The temporary file is gone
+    assert [p.name for p in tmp_path.iterdir()] == ['site.archive']
+
+
+@pytest.mark.parametrize('archive', ARCHIVE_CONFIGS)
+def test_archive_redirect_policy_follow(tmp_path, archive):
+    output_path = tmp_path / 'site.archive'
+    with context_for_test('app_redirects') as module:
+        config = {
+            **module.freeze_config,
+            'output': {**ARCHIVE_CONFIGS[archive], 'file': str(output_path)},
+            'status_handlers': {'3xx': 'follow'},
+        }
+        freeze(module.app, config)
+        assert read_archive(output_path) == module.expected_dict_follow
+
+
+def test_tar_redirects_are_hardlinks(tmp_path):
+    output_path = tmp_path / 'site.tar'
+    with context_for_test('app_redirects') as module:
+        config = {
+            **module.freeze_config,
+            'output': {'type': 'tar', 'file': str(output_path)},
+            'status_handlers': {'3xx': 'follow'},
+        }
+        freeze(module.app, config)
+    with tarfile.open(output_path) as archive:
+        member = archive.getmember('absolute/301/index.html')
+        assert member.islnk()
+        assert member.linkname == 'index.html'
+
+
+@pytest.mark.parametrize(['archive', 'compression'], (
+    ('zip', None), ('tar', None), ('tar', 'gz'), ('tar', 'xz'),
+))
+def test_open_filename(tmp_path, archive, compression):
+    async def main():
+        saver = ArchiveSaver(tmp_path / 'site', archive, compression)
+        await saver.prepare()
+        await saver.save_to_filename(PurePosixPath('a/b.html'), [b'a', b'b'])
+        await saver.save_to_filename(PurePosixPath('c.html'), [b'c'])
+        await saver.copy_filename(
+            PurePosixPath('a/b.html'), PurePosixPath('d.html'),
+        )
+        for name, expected in (
+            ('a/b.html', b'ab'), ('c.html', b'c'), ('d.html', b'ab'),
+        ):
+            with await saver.open_filename(PurePosixPath(name)) as f:
+                assert f.read() == expected
+        with pytest.raises(FileNotFoundError):
+            await saver.open_filename(PurePosixPath('missing.html'))
+        await saver.finish(success=True, cleanup=True)
+
+    asyncio.run(main())
+
+
+def test_failed_freeze_removes_archive(tmp_path):
+    output_path = tmp_path / 'site.zip'
+    with context_for_test('app_broken_link') as module:
+        config = {'output': {'type': 'zip', 'file': str(output_path)}}
+        with pytest.raises(Exception):
+            freeze(module.app, config)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_failed_freeze_without_cleanup(tmp_path):
+    output_path = tmp_path / 'site.zip'
+    with context_for_test('app_broken_link') as module:
+        config = {
+            'output': {'type': 'zip', 'file': str(output_path)},
+            'cleanup': False,
+        }
+        with pytest.raises(Exception):
+            freeze(module.app, config)
+    assert read_archive(output_path)['index.html']
+
+
+@pytest.mark.parametrize('output', (
+    {'type': 'zip'},
+    {'type': 'zip', 'file': 'x.zip', 'compression': 'gz'},
+    {'type': 'tar', 'file': 'x.tar', 'compression': 'deflated'},
+))
+def test_bad_archive_config(output):
+    with context_for_test('app_2pages') as module:
+        with pytest.raises(ValueError):
+            freeze(module.app, {'output': output})
+
+
+def test_zst(tmp_path):
+    if 'zst' not in tarfile.TarFile.OPEN_METH:
+        pytest.importorskip('zstandard')
+    output_path = tmp_path / 'site.tar.zst'
+    with context_for_test('app_2pages') as module:
+        config = {
+            'output': {
+                'type': 'tar', 'file': str(output_path), 'compression': 'zst',
+            },
+        }
+        freeze(module.app, config)
+    if 'zst' in tarfile.TarFile.OPEN_METH:
+        assert read_archive(output_path) == module.expected_dict
+    else:
+        import zstandard
+        data = zstandard.ZstdDecompressor().stream_reader(
+            output_path.open('rb'),
+        ).read()
+        with tarfile.open(fileobj=io.BytesIO(data)) as archive:
+            assert 'index.html' in archive.getnames()
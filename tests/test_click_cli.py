@@ -1,3 +1,4 @@
+import json
 from textwrap import dedent
 
 import pytest
@@ -399,3 +400,92 @@ def test_multierror_output_redirect(tmp_path):
         """,
     ):
         assert dedent(message).strip() in result.output
+
+
+@pytest.mark.parametrize('concurrency', ('5', 'adaptive'))
+def test_cli_concurrency_option(tmp_path, concurrency):
+    app_name = 'app_2pages'
+    build_dir = tmp_path / 'build'
+    cli_args = ['app', str(build_dir), '--concurrency', concurrency]
+
+    with context_for_test(app_name):
+        run_and_check(cli_args, app_name, build_dir)
+
+
+def test_cli_bad_concurrency_option(tmp_path):
+    app_name = 'app_2pages'
+    cli_args = ['app', str(tmp_path / 'build'), '--concurrency', 'many']
+
+    with context_for_test(app_name):
+        result = run_freezeyt_cli(cli_args, app_name, check=False)
+    assert result.exit_code == 2
+
+
+def test_cli_stats(tmp_path):
+    app_name = 'app_2pages'
+    build_dir = tmp_path / 'build'
+    stats_path = tmp_path / 'stats.json'
+    cli_args = [
+        'app', str(build_dir), '--stats', '--stats-json', str(stats_path),
+    ]
+
+    with context_for_test(app_name):
+        result = run_freezeyt_cli(cli_args, app_name)
+    assert 'Slowest pages:' in result.output
+
+    with open(stats_path) as f:
+        stats = json.load(f)
+    assert stats['page_count'] == 2
+    assert {page['path'] for page in stats['pages']} == {
+        'index.html', 'second_page.html',
+    }
+
+
+def test_cli_profile_app(tmp_path):
+    app_name = 'app_2pages'
+    build_dir = tmp_path / 'build'
+    profile_path = tmp_path / 'app.pstats'
+    cli_args = [
+        'app', str(build_dir),
+        '--profile-app', str(profile_path), '--profile-pattern', '/*',
+    ]
+
+    with context_for_test(app_name):
+        run_and_check(cli_args, app_name, build_dir)
+    assert profile_path.exists()
+
+
+def test_cli_profile_app_merged_with_config(tmp_path):
+    app_name = 'app_2pages'
+    build_dir = tmp_path / 'build'
+    profile_path = tmp_path / 'app.prof'
+    config_file = tmp_path / 'config.yaml'
+    config_content = {
+        'profile_app': {
+            'output': str(tmp_path / 'config.prof'),
+            'format': 'collapsed',
+        },
+    }
+    with open(config_file, mode='w') as file:
+        safe_dump(config_content, stream=file)
+    cli_args = [
+        'app', str(build_dir), '--config', config_file,
+        '--profile-app', str(profile_path),
+    ]
+
+    with context_for_test(app_name):
+        run_and_check(cli_args, app_name, build_dir)
+    assert not (tmp_path / 'config.prof').exists()
+    # The format from the config is kept: lines of "stack count"
+    lines = profile_path.read_text().splitlines()
+    assert lines
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+
+
+def test_cli_profile_sample_needs_output(tmp_path):
+    app_name = 'app_2pages'
+    cli_args = ['app', str(tmp_path / 'build'), '--profile-sample', '0.5']
+
+    with context_for_test(app_name):
+        result = run_freezeyt_cli(cli_args, app_name, check=False)
+    assert result.exit_code == 2
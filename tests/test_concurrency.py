@@ -1,5 +1,10 @@
+import asyncio
+
+import pytest
+
 from freezeyt import freeze
 from freezeyt.freezer import MAX_RUNNING_TASKS
+from freezeyt.concurrency import ConcurrencyLimit
 
 
 
@@ -32,3 +37,128 @@ def test_tasks_are_limited(tmp_path):
     }
 
     freeze(app, config)
+
+
+def test_asyncio_tasks_scale_with_concurrency(tmp_path):
+    """The number of asyncio tasks doesn't grow with the number of pages"""
+    NUM_PAGES = MAX_RUNNING_TASKS * 10
+    max_asyncio_tasks = 0
+
+    def app(environ, start_response):
+        nonlocal max_asyncio_tasks
+        max_asyncio_tasks = max(max_asyncio_tasks, len(asyncio.all_tasks()))
+        start_response('200 OK', [('Content-type', 'text/html')])
+        return [b'page']
+
+    config = {
+        'output': {'type': 'dict'},
+        'extra_pages': [f'{n}.html' for n in range(NUM_PAGES)],
+    }
+
+    result = freeze(app, config)
+    assert len(result) == NUM_PAGES + 1
+    # Workers, plus one task for saving each page being handled
+    assert max_asyncio_tasks <= MAX_RUNNING_TASKS * 2 + 1
+
+
+def test_concurrency_config(tmp_path):
+    NUM_PAGES = 50
+    currently_processed_pages = 0
+    max_processed_pages = 0
+
+    async def app(scope, receive, send):
+        nonlocal currently_processed_pages, max_processed_pages
+        currently_processed_pages += 1
+        max_processed_pages = max(
+            max_processed_pages, currently_processed_pages,
+        )
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [(b'content-type', b'text/html')],
+        })
+        await asyncio.sleep(0.001)
+        currently_processed_pages -= 1
+        await send({'type': 'http.response.body', 'body': b'page'})
+
+    limits = []
+    config = {
+        'output': {'type': 'dict'},
+        'app_interface': 'asgi',
+        'extra_pages': [f'{n}.html' for n in range(NUM_PAGES)],
+        'concurrency': 5,
+        'hooks': {'start': [lambda info: limits.append(info.concurrency_limit)]},
+    }
+
+    result = freeze(app, config)
+    assert len(result) == NUM_PAGES + 1
+    assert max_processed_pages == 5
+    assert limits == [5]
+
+
+def test_adaptive_concurrency_freeze(tmp_path):
+    NUM_PAGES = 300
+    limits = []
+
+    def app(environ, start_response):
+        start_response('200 OK', [('Content-type', 'text/html')])
+        return [b'page']
+
+    config = {
+        'output': {'type': 'dict'},
+        'extra_pages': [f'{n}.html' for n in range(NUM_PAGES)],
+        'concurrency': {'adaptive': True, 'limit': 10, 'min': 2, 'max': 20},
+        'hooks': {
+            'page_frozen': [
+                lambda info: limits.append(info.freeze_info.concurrency_limit),
+            ],
+        },
+    }
+
+    result = freeze(app, config)
+    assert len(result) == NUM_PAGES + 1
+    assert all(2 <= limit <= 20 for limit in limits)
+
+
+def test_adaptive_limit_increases():
+    limit = ConcurrencyLimit(4, adaptive=True, max_limit=6)
+    for i in range(100):
+        limit.record_latency(0.1)
+    assert limit.limit == 6
+
+
+def test_adaptive_limit_decreases_with_latency():
+    limit = ConcurrencyLimit(40, adaptive=True, min_limit=10)
+    for i in range(40):
+        limit.record_latency(0.1)
+    assert limit.limit == 41
+    for i in range(41):
+        limit.record_latency(1)
+    assert limit.limit == 30
+    for i in range(200):
+        limit.record_latency(100)
+    assert limit.limit == 10
+
+
+def test_adaptive_limit_decreases_with_loop_lag():
+    limit = ConcurrencyLimit(40, adaptive=True)
+    limit.record_loop_lag(1)
+    for i in range(40):
+        limit.record_latency(0.1)
+    assert limit.limit == 30
+
+
+def test_fixed_limit_does_not_change():
+    limit = ConcurrencyLimit(40)
+    limit.record_loop_lag(1)
+    for i in range(100):
+        limit.record_latency(i)
+    assert limit.limit == 40
+
+
+@pytest.mark.parametrize('concurrency', (
+    0, 'many', True, {'limit': 5, 'max': 4}, {'min': 0, 'adaptive': True},
+))
+def test_bad_concurrency_config(concurrency):
+    with pytest.raises(ValueError):
+        ConcurrencyLimit.from_config(concurrency, default=MAX_RUNNING_TASKS)
@@ -0,0 +1,186 @@
+import os
+import asyncio
+import threading
+from pathlib import PurePosixPath
+
+import pytest
+
+from freezeyt import freeze
+from freezeyt.filesaver import FileSaver
+from freezeyt.urls import PrefixURL
+
+
+PAGES = {
+    '/': b'<a href="tag/a.html">a</a> <a href="tag/b.html">b</a>'
+         + b'<a href="tag/c.html">c</a> <a href="favicon.ico">icon</a>',
+    '/tag/a.html': b'no articles',
+    '/tag/b.html': b'no articles',
+    '/tag/c.html': b'one article',
+    '/favicon.ico': b'no articles',
+}
+
+
+def app(environ, start_response):
+    path = environ['PATH_INFO']
+    if path.endswith('.ico'):
+        content_type = 'image/vnd.microsoft.icon'
+    else:
+        content_type = 'text/html'
+    start_response('200 OK', [('Content-Type', content_type)])
+    return [PAGES[path]]
+
+
+def freeze_with_dedup(output_path, dedup):
+    freeze(app, {
+        'output': {'type': 'dir', 'dir': str(output_path), 'dedup': dedup},
+    })
+
+
+def check_content(output_path):
+    assert (output_path / 'index.html').read_bytes() == PAGES['/']
+    for name in 'tag/a.html', 'tag/b.html', 'tag/c.html', 'favicon.ico':
+        assert (output_path / name).read_bytes() == PAGES['/' + name]
+
+
+def test_hardlink(tmp_path):
+    output_path = tmp_path / 'output'
+    freeze_with_dedup(output_path, 'hardlink')
+    check_content(output_path)
+
+    inodes = {
+        name: (output_path / name).stat().st_ino
+        for name in ('tag/a.html', 'tag/b.html', 'favicon.ico', 'tag/c.html')
+    }
+    assert inodes['tag/a.html'] == inodes['tag/b.html'] == inodes['favicon.ico']
+    assert inodes['tag/c.html'] != inodes['tag/a.html']
+    assert (output_path / 'tag/a.html').stat().st_nlink == 3
+
+
+def test_symlink(tmp_path):
+    output_path = tmp_path / 'output'
+    freeze_with_dedup(output_path, 'symlink')
+    check_content(output_path)
+
+    links = sorted(
+        str(path.relative_to(output_path))
+        for path in output_path.glob('**/*') if path.is_symlink()
+    )
+    assert len(links) == 2
+    # Links are relative, so the output can be moved
+    output_path.rename(tmp_path / 'moved')
+    check_content(tmp_path / 'moved')
+
+
+def test_reflink(tmp_path):
+    # Reflinks are not supported on all filesystems; if they are not,
+    # files are saved normally
+    output_path = tmp_path / 'output'
+    freeze_with_dedup(output_path, 'reflink')
+    check_content(output_path)
+
+
+def test_unknown_dedup_method(tmp_path):
+    with pytest.raises(ValueError):
+        freeze_with_dedup(tmp_path / 'output', 'bad')
+
+
+def test_overwritten_file_is_not_linked(tmp_path):
+    async def main():
+        saver = FileSaver(
+            tmp_path, PrefixURL('http://example.com/'), dedup='hardlink',
+        )
+        await saver.save_to_filename(PurePosixPath('a.html'), [b'old'])
+        await saver.save_to_filename(PurePosixPath('a.html'), [b'new'])
+        await saver.save_to_filename(PurePosixPath('b.html'), [b'old'])
+        await saver.save_to_filename(PurePosixPath('c.html'), [b'new'])
+
+    asyncio.run(main())
+    assert (tmp_path / 'a.html').read_bytes() == b'new'
+    assert (tmp_path / 'b.html').read_bytes() == b'old'
+    assert (tmp_path / 'c.html').read_bytes() == b'new'
+    assert (tmp_path / 'b.html').stat().st_nlink == 1
+    assert (tmp_path / 'a.html').stat().st_ino == (
+        (tmp_path / 'c.html').stat().st_ino
+    )
+
+
+def test_links_made_in_writer_threads(tmp_path, monkeypatch):
+    threads = set()
+    original_link = os.link
+    original_replace = os.replace
+
+    def link(*args, **kwargs):
+        threads.add(threading.current_thread().name.split('_')[0])
+        return original_link(*args, **kwargs)
+
+    def replace(*args, **kwargs):
+        threads.add(threading.current_thread().name.split('_')[0])
+        return original_replace(*args, **kwargs)
+
+    monkeypatch.setattr(os, 'link', link)
+    monkeypatch.setattr(os, 'replace', replace)
+    output_path = tmp_path / 'output'
+    freeze_with_dedup(output_path, 'hardlink')
+    check_content(output_path)
+    assert threads == {'freezeyt-writer'}
+
+
+@pytest.mark.parametrize('dedup', ('hardlink', 'symlink'))
+def test_overwritten_original_keeps_links(tmp_path, dedup):
+    async def main():
+        saver = FileSaver(
+            tmp_path, PrefixURL('http://example.com/'), dedup=dedup,
+        )
+        await saver.save_to_filename(PurePosixPath('a.html'), [b'old'])
+        await saver.save_to_filename(PurePosixPath('b.html'), [b'old'])
+        await saver.save_to_filename(PurePosixPath('dir/c.html'), [b'old'])
+        await saver.save_to_filename(PurePosixPath('a.html'), [b'new'])
+        # Files with the old content can still be deduplicated
+        await saver.save_to_filename(PurePosixPath('d.html'), [b'old'])
+        await saver.finish(True, True)
+
+    asyncio.run(main())
+    assert (tmp_path / 'a.html').read_bytes() == b'new'
+    assert (tmp_path / 'b.html').read_bytes() == b'old'
+    assert (tmp_path / 'dir/c.html').read_bytes() == b'old'
+    assert (tmp_path / 'd.html').read_bytes() == b'old'
+    if dedup == 'symlink':
+        assert not (tmp_path / 'a.html').is_symlink()
+        assert not (tmp_path / 'b.html').is_symlink()
+        assert (tmp_path / 'dir/c.html').is_symlink()
+        assert (tmp_path / 'd.html').is_symlink()
+    else:
+        assert (tmp_path / 'b.html').stat().st_nlink == 3
+
+
+def test_incremental_symlinks(tmp_path):
+    """Symlinks kept from a previous freeze keep their content"""
+    async def freeze_files(files, kept=()):
+        saver = FileSaver(
+            tmp_path, PrefixURL('http://example.com/'),
+            dedup='symlink', incremental=True,
+        )
+        await saver.prepare()
+        for name in kept:
+            assert await saver.keep_filename(PurePosixPath(name))
+        for name, content in files.items():
+            await saver.save_to_filename(PurePosixPath(name), [content])
+        await saver.finish(True, True)
+
+    asyncio.run(freeze_files({
+        'index.html': b'index', 'a.html': b'old', 'b.html': b'old',
+        'c.html': b'old', 'd.html': b'other', 'e.html': b'other',
+    }))
+    assert (tmp_path / 'b.html').is_symlink()
+    assert (tmp_path / 'e.html').is_symlink()
+
+    # a.html is changed; d.html is no longer part of the site
+    asyncio.run(freeze_files(
+        {'a.html': b'new'},
+        kept=['index.html', 'b.html', 'c.html', 'e.html'],
+    ))
+    assert (tmp_path / 'a.html').read_bytes() == b'new'
+    assert (tmp_path / 'b.html').read_bytes() == b'old'
+    assert (tmp_path / 'c.html').read_bytes() == b'old'
+    assert not (tmp_path / 'd.html').exists()
+    assert (tmp_path / 'e.html').read_bytes() == b'other'
@@ -165,3 +165,43 @@ def test_save_file_to_dir():
     asyncio.run(saver.save_to_filename(PurePosixPath('t/f'), [b'f']))
     with pytest.raises(IsADirectoryError):
         asyncio.run(saver.save_to_filename(PurePosixPath('t'), [b't']))
+
+
+def test_single_chunk_not_copied():
+    saver = DictSaver()
+    content = b'x' * 1000
+    asyncio.run(saver.save_to_filename(PurePosixPath('a/t'), [content]))
+    result = asyncio.run(saver.finish(True, True))
+    assert result['a']['t'] is content
+
+
+def test_walk_files():
+    saver = DictSaver()
+    asyncio.run(saver.save_to_filename(PurePosixPath('a/b/t'), [b'1']))
+    asyncio.run(saver.save_to_filename(PurePosixPath('t'), [b'2', b'3']))
+    result = asyncio.run(saver.finish(True, True))
+    assert list(result.walk_files()) == [('a/b/t', b'1'), ('t', b'23')]
+    # The nested dicts are not built for walk_files
+    assert result._root is None
+
+    # The result can be modified like a dict
+    del result['a']
+    assert result == {'t': b'23'}
+    assert list(result.walk_files()) == [('t', b'23')]
+
+
+def test_to_dict():
+    saver = DictSaver()
+    asyncio.run(saver.save_to_filename(PurePosixPath('a/b/t'), [b'1']))
+    asyncio.run(saver.save_to_filename(PurePosixPath('t'), [b'2']))
+    result = asyncio.run(saver.finish(True, True))
+    assert not isinstance(result, dict)
+
+    result_dict = result.to_dict()
+    assert type(result_dict) is dict
+    assert result_dict == {'a': {'b': {'t': b'1'}}, 't': b'2'}
+    assert type(result_dict['a']) is dict
+
+    # Changes show in both
+    result_dict['u'] = b'3'
+    assert result['u'] == b'3'
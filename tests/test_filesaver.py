@@ -0,0 +1,155 @@
+import os
+import asyncio
+import threading
+from pathlib import Path, PurePosixPath
+
+import pytest
+
+from freezeyt import freeze
+import freezeyt.filesaver
+from freezeyt.filesaver import FileSaver, WRITE_BUFFER_SIZE, write_all
+from freezeyt.urls import PrefixURL
+
+
+def test_write_all_partial_writes(tmp_path, monkeypatch):
+    """write_all handles writes that don't write everything at once"""
+    real_write = os.write
+    real_writev = getattr(os, 'writev', None)
+    calls = []
+
+    def short_write(fd, data):
+        calls.append(1)
+        return real_write(fd, data[:3])
+
+    def short_writev(fd, buffers):
+        calls.append(len(buffers))
+        assert real_writev is not None
+        return real_writev(fd, [buffers[0], buffers[1][:2]])
+
+    monkeypatch.setattr(os, 'write', short_write)
+    if real_writev is not None:
+        monkeypatch.setattr(os, 'writev', short_writev)
+    chunks = [b'abcdefg', b'', b'hijklm', b'nopqrstuvw', b'xyz']
+    with open(tmp_path / 'out', 'wb', buffering=0) as f:
+        write_all(f.fileno(), chunks)
+    assert (tmp_path / 'out').read_bytes() == b''.join(chunks)
+    assert len(calls) > 1
+
+
+def test_directories_created_once(tmp_path, monkeypatch):
+    mkdir_calls = []
+    real_mkdir = Path.mkdir
+
+    def mkdir(self, *args, **kwargs):
+        mkdir_calls.append(self)
+        return real_mkdir(self, *args, **kwargs)
+
+    monkeypatch.setattr(Path, 'mkdir', mkdir)
+
+    async def main():
+        saver = FileSaver(tmp_path, PrefixURL('http://example.com/'))
+        await saver.save_to_filename(PurePosixPath('a/b/1.html'), [b'x'])
+        assert mkdir_calls
+        mkdir_calls.clear()
+        # Directories that were already created (or that are parents
+        # of them) are not created again
+        for name in 'a/b/2.html', 'a/3.html', '4.html':
+            await saver.save_to_filename(PurePosixPath(name), [b'x', b'y'])
+        assert mkdir_calls == []
+        await saver.save_to_filename(PurePosixPath('c/5.html'), [b'x'])
+        assert mkdir_calls == [tmp_path / 'c']
+        await saver.finish(success=True, cleanup=True)
+
+    asyncio.run(main())
+    assert (tmp_path / 'a/b/2.html').read_bytes() == b'xy'
+    assert (tmp_path / 'a/3.html').read_bytes() == b'xy'
+
+
+async def failing_large_content():
+    yield b'a' * WRITE_BUFFER_SIZE
+    yield b'b' * WRITE_BUFFER_SIZE
+    raise ZeroDivisionError()
+
+
+def test_failure_after_partial_write(tmp_path):
+    async def main():
+        saver = FileSaver(tmp_path, PrefixURL('http://example.com/'))
+        with pytest.raises(ZeroDivisionError):
+            await saver.save_to_filename(
+                PurePosixPath('page.html'), failing_large_content(),
+            )
+
+    asyncio.run(main())
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_writers_config(tmp_path):
+    def app(environ, start_response):
+        start_response('200 OK', [('Content-type', 'text/html')])
+        if environ['PATH_INFO'] == '/':
+            return [
+                b'<a href="page%d/">page</a>' % i for i in range(20)
+            ]
+        return [b'page', b' ', b'content']
+
+    freeze(app, {'output': {'type': 'dir', 'dir': tmp_path, 'writers': 2}})
+    assert (tmp_path / 'page13/index.html').read_bytes() == b'page content'
+
+
+@pytest.mark.parametrize(['size', 'expected_files'], (
+    # A small file is written and renamed in a single job, so it's complete
+    (10, ['page.html']),
+    # A large file is written by several jobs; only the first one ran
+    (WRITE_BUFFER_SIZE * 2, []),
+))
+def test_cancel_during_write(tmp_path, monkeypatch, size, expected_files):
+    started = threading.Event()
+    release = threading.Event()
+    descriptors = []
+
+    def slow_write_all(fd, chunks):
+        descriptors.append(fd)
+        started.set()
+        release.wait()
+        write_all(fd, chunks)
+
+    monkeypatch.setattr(freezeyt.filesaver, 'write_all', slow_write_all)
+
+    async def main():
+        saver = FileSaver(tmp_path, PrefixURL('http://example.com/'))
+        task = asyncio.create_task(saver.save_to_filename(
+            PurePosixPath('page.html'), [b'a' * size, b'b' * size],
+        ))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait)
+        task.cancel()
+        await asyncio.sleep(0.01)
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        saver.shutdown()
+
+    asyncio.run(main())
+    # No temporary file is left
+    assert [p.name for p in tmp_path.iterdir()] == expected_files
+    # The file was closed
+    with pytest.raises(OSError):
+        os.fstat(descriptors[0])
+
+
+def thread_names(prefix):
+    return [t.name for t in threading.enumerate() if t.name.startswith(prefix)]
+
+
+def test_writers_shut_down_after_error(tmp_path, monkeypatch):
+    async def failing_finish(self, success, cleanup):
+        raise ZeroDivisionError()
+
+    monkeypatch.setattr(FileSaver, 'finish', failing_finish)
+
+    def app(environ, start_response):
+        start_response('200 OK', [('Content-type', 'text/html')])
+        return [b'page']
+
+    with pytest.raises(ZeroDivisionError):
+        freeze(app, {'output': {'type': 'dir', 'dir': tmp_path / 'out'}})
+    assert thread_names('freezeyt-writer') == []
@@ -0,0 +1,140 @@
+import asyncio
+import concurrent.futures
+
+import pytest
+
+from freezeyt import freeze
+from freezeyt.finder_pool import FinderPool
+from freezeyt.url_finders import _get_css_links
+from testutil import context_for_test
+
+
+class CountingExecutor(concurrent.futures.ThreadPoolExecutor):
+    """Executor that records the calls submitted to it"""
+    def __init__(self, workers):
+        super().__init__(workers)
+        self.submitted = []
+
+    def submit(self, function, *args):
+        self.submitted.append(args)
+        return super().submit(function, *args)
+
+
+def find_words(content, base_url, headers):
+    if content == b'error':
+        raise ZeroDivisionError()
+    return content.decode().split()
+
+
+def run_pages(pool, pages):
+    async def main():
+        return await asyncio.gather(*(
+            pool.run(find_words, page, 'http://example.com/', None)
+            for page in pages
+        ))
+    return asyncio.run(main())
+
+
+def test_small_pages_are_batched():
+    pool = FinderPool(workers=1)
+    pool._executor = executor = CountingExecutor(1)
+    pages = [b'page %d' % i for i in range(20)]
+    try:
+        results = run_pages(pool, pages)
+    finally:
+        pool.shutdown()
+    assert results == [['page', str(i)] for i in range(20)]
+    # The first page is sent alone, the rest wait for the worker together
+    assert [len(calls) for (calls,) in executor.submitted] == [1, 19]
+
+
+def test_batch_size_limit():
+    pool = FinderPool(workers=1, max_batch_bytes=20)
+    pool._executor = executor = CountingExecutor(1)
+    pages = [b'0123456789'] * 7
+    try:
+        run_pages(pool, pages)
+    finally:
+        pool.shutdown()
+    assert [len(calls) for (calls,) in executor.submitted] == [1, 2, 2, 2]
+
+
+def test_max_inflight_bytes():
+    pool = FinderPool(workers=4, max_inflight_bytes=25)
+    pool._executor = executor = CountingExecutor(4)
+    pages = [b'0123456789'] * 7
+    try:
+        run_pages(pool, pages)
+    finally:
+        pool.shutdown()
+    # At most 2 pages fit in the limit at once
+    assert all(len(calls) <= 2 for (calls,) in executor.submitted)
+    assert sum(len(calls) for (calls,) in executor.submitted) == 7
+
+
+def test_error_in_batch():
+    pool = FinderPool(workers=1)
+    pool._executor = CountingExecutor(1)
+
+    async def main():
+        return await asyncio.gather(
+            pool.run(find_words, b'first', 'http://example.com/', None),
+            pool.run(find_words, b'error', 'http://example.com/', None),
+            pool.run(find_words, b'third', 'http://example.com/', None),
+            return_exceptions=True,
+        )
+
+    try:
+        first, error, third = asyncio.run(main())
+    finally:
+        pool.shutdown()
+    assert first == ['first']
+    assert isinstance(error, ZeroDivisionError)
+    assert third == ['third']
+
+
+def test_process_pool():
+    pool = FinderPool(workers=2, start_method='spawn')
+    content = b'a { background: url(image.png) }'
+
+    async def main():
+        return await asyncio.gather(*(
+            pool.run(_get_css_links, content, 'http://example.com/', None)
+            for i in range(5)
+        ))
+
+    try:
+        assert asyncio.run(main()) == [['image.png']] * 5
+    finally:
+        pool.shutdown()
+
+
+def test_bad_start_method():
+    with pytest.raises(ValueError):
+        FinderPool(start_method='bad')
+
+
+def test_freeze_with_finder_pool_config():
+    with context_for_test('app_links_css') as module:
+        config = {
+            **module.freeze_config,
+            'output': {'type': 'dict'},
+            'finder_pool': {'workers': 1, 'max_inflight_bytes': 1000},
+        }
+        result = freeze(module.app, config)
+        assert 'style.css' in result['static']
+
+
+def test_pool_not_started_without_async_finders(monkeypatch):
+    def fail(self):
+        raise AssertionError('the pool should not be started')
+
+    monkeypatch.setattr(FinderPool, '_get_executor', fail)
+    with context_for_test('app_2pages') as module:
+        config = {
+            'output': {'type': 'dict'},
+            'url_finders': {'text/html': 'get_html_links'},
+            'use_default_url_finders': False,
+        }
+        result = freeze(module.app, config)
+        assert result == module.expected_dict
@@ -1,10 +1,13 @@
 import asyncio
 from io import BytesIO
+from pathlib import Path
 from typing import Dict, Tuple, List
+from urllib.parse import urljoin
 
 import pytest
 
 from freezeyt.url_finders import get_html_links, get_html_links_async
+from freezeyt.url_finders import get_html_links_fast, HTMLLinkParser
 
 
 TEST_DATA: Dict[str, Tuple[Tuple, List[str]]] = {
@@ -113,3 +116,100 @@ def test_links_css_async(test_name):
     f = BytesIO(content)
     links = asyncio.run(get_html_links_async(f, *args))
     assert sorted(links) == expected
+
+
+@pytest.mark.parametrize("test_name", TEST_DATA)
+def test_links_fast(test_name):
+    (content, *args), expected = TEST_DATA[test_name]
+    f = BytesIO(content)
+    links = get_html_links_fast(f, *args)
+    assert sorted(links) == expected
+
+
+FAST_TEST_DATA: Dict[str, Tuple[bytes, List[str]]] = {
+    'srcset': (
+        b"""<img src="a.png" srcset="a-2x.png 2x, /b.png 100w,c.png">""",
+        ['/b.png', 'a-2x.png', 'a.png', 'c.png'],
+    ),
+    'base': (
+        b"""
+            <head><base href="/sub/dir/"></head>
+            <a href="page.html">1</a>
+            <a href="../up.html">2</a>
+            <a href="https://example.com/ext.html">3</a>
+        """,
+        [
+            '/sub/dir/',
+            'http://localhost:8000/sub/dir/page.html',
+            'http://localhost:8000/sub/up.html',
+            'https://example.com/ext.html',
+        ],
+    ),
+    'meta_charset': (
+        b"""<meta charset="iso-8859-2"><a href='/\xe8au'>LINK</a>""",
+        ['/čau'],
+    ),
+    'bom': (
+        b"""\xef\xbb\xbf<a href='/\xc4\x8dau'>LINK</a>""",
+        ['/čau'],
+    ),
+    'entities': (
+        b"""<a href="/a?b=1&amp;c=2">""",
+        ['/a?b=1&c=2'],
+    ),
+    'script': (
+        b"""<script>document.write('<a href="/not-a-link">')</script>""",
+        [],
+    ),
+}
+
+
+@pytest.mark.parametrize("test_name", FAST_TEST_DATA)
+def test_links_fast_extra(test_name):
+    content, expected = FAST_TEST_DATA[test_name]
+    links = get_html_links_fast(BytesIO(content), 'http://localhost:8000/')
+    assert sorted(links) == expected
+
+
+@pytest.mark.parametrize("chunk_size", (1, 7, 1000))
+def test_links_fast_streaming(chunk_size):
+    content = b"""
+        <html>
+            <head><meta charset="utf-8"></head>
+            <body>
+                <a href='/\xc4\x8dau'>LINK</a>
+    """ + b'<p>more content</p>' * 100 + b"""
+                <img src="/image.png">
+            </body>
+        </html>
+    """
+    middle = len(content) // 2
+    parser = HTMLLinkParser('http://localhost:8000/')
+    links = []
+    for start in range(0, middle, chunk_size):
+        links.extend(parser.feed(content[start:min(start+chunk_size, middle)]))
+    # The first link is found before the page ends
+    assert links == ['/čau']
+    links.extend(parser.feed(content[middle:]))
+    links.extend(parser.close())
+    assert links == ['/čau', '/image.png']
+
+
+FIXTURES_PATH = Path(__file__).parent / 'fixtures'
+FIXTURE_PAGES = sorted(
+    str(path.relative_to(FIXTURES_PATH))
+    for path in FIXTURES_PATH.glob('*/test_expected_output/**/*.html')
+)
+
+
+@pytest.mark.parametrize("page", FIXTURE_PAGES)
+def test_links_fast_conformance(page):
+    """get_html_links_fast finds the same links as get_html_links"""
+    content = (FIXTURES_PATH / page).read_bytes()
+    base_url = 'http://localhost:8000/' + page.split('/', 2)[-1]
+
+    def get_urls(finder):
+        links = finder(BytesIO(content), base_url)
+        return sorted(urljoin(base_url, link) for link in links)
+
+    assert get_urls(get_html_links_fast) == get_urls(get_html_links)
@@ -302,6 +302,28 @@ def test_task_counts():
     ]
 
 
+def test_task_status_matches_collections():
+    """Each task's status matches the freezer collection it is in"""
+    def check_statuses(task_info):
+        freezer = task_info.freeze_info._freezer
+        all_paths = set()
+        for status, collection in freezer.task_collections.items():
+            for path, task in collection.items():
+                assert task.status == status
+                assert freezer.tasks[path] is task
+                all_paths.add(path)
+        assert all_paths == set(freezer.tasks)
+
+    with context_for_test('app_redirects') as module:
+        config = {
+            **module.freeze_config,
+            'output': {'type': 'dict'},
+            'status_handlers': {'3xx': 'follow'},
+            'hooks': {'page_frozen': [check_statuses]},
+        }
+        freeze(module.app, config)
+
+
 def test_task_counts_extra_page():
     recorded_done_counts = []
     recorded_paths = set()
@@ -0,0 +1,313 @@
+import os
+import json
+import mimetypes
+
+from flask import Flask, Response
+import pytest
+
+from freezeyt import freeze, MultiError
+import freezeyt.filesaver
+
+
+def make_app(pages):
+    """Make an app that serves pages from the given dict
+
+    The dict maps URL paths to page content.
+    Requested paths are recorded in app.requested.
+    """
+    app = Flask(__name__)
+    app.requested = []
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def page(path):
+        app.requested.append(path)
+        mimetype = mimetypes.guess_type(path)[0] or 'text/html'
+        return Response(pages[path], mimetype=mimetype)
+
+    return app
+
+
+PAGES = {
+    '': '<a href="first.html">1</a> <a href="style.css">css</a>',
+    'first.html': '<a href="second.html">2</a>',
+    'second.html': 'second page',
+    'style.css': 'body { background: url(image.png) }',
+    'image.png': 'not really an image',
+}
+
+
+def make_config(tmp_path, **incremental):
+    return {
+        'output': str(tmp_path / 'output'),
+        'prefix': 'http://example.com/',
+        'incremental': {
+            'manifest': str(tmp_path / 'manifest.json'),
+            **incremental,
+        },
+    }
+
+
+def read_output(path):
+    return {
+        str(p.relative_to(path)): p.read_text()
+        for p in sorted(path.glob('**/*')) if p.is_file()
+    }
+
+
+EXPECTED_OUTPUT = {
+    'first.html': '<a href="second.html">2</a>',
+    'image.png': 'not really an image',
+    'index.html': '<a href="first.html">1</a> <a href="style.css">css</a>',
+    'second.html': 'second page',
+    'style.css': 'body { background: url(image.png) }',
+}
+
+
+def test_first_freeze_writes_manifest(tmp_path):
+    app = make_app(PAGES)
+    freeze(app, make_config(tmp_path))
+
+    assert read_output(tmp_path / 'output') == EXPECTED_OUTPUT
+    assert sorted(app.requested) == sorted(PAGES)
+
+    manifest = json.loads((tmp_path / 'manifest.json').read_text())
+    assert manifest['prefix'] == 'http://example.com/'
+    assert sorted(manifest['pages']) == sorted(EXPECTED_OUTPUT)
+    index_entry = manifest['pages']['index.html']
+    assert index_entry['url'] == 'http://example.com/'
+    assert index_entry['status'] == '200'
+    assert sorted(index_entry['links']) == [
+        'http://example.com/first.html',
+        'http://example.com/style.css',
+    ]
+    assert ['Content-Type', 'text/html; charset=utf-8'] in (
+        index_entry['headers']
+    )
+    index_stat = (tmp_path / 'output' / 'index.html').stat()
+    assert index_entry['stat'] == {
+        'size': index_stat.st_size,
+        'mtime_ns': index_stat.st_mtime_ns,
+    }
+
+
+def test_unchanged_pages_are_kept(tmp_path):
+    freeze(make_app(PAGES), make_config(tmp_path))
+    manifest_text = (tmp_path / 'manifest.json').read_text()
+
+    app = make_app(PAGES)
+    freeze(app, make_config(tmp_path))
+
+    assert app.requested == []
+    assert read_output(tmp_path / 'output') == EXPECTED_OUTPUT
+    assert (tmp_path / 'manifest.json').read_text() == manifest_text
+
+
+def test_stale_pages(tmp_path):
+    freeze(make_app(PAGES), make_config(tmp_path))
+
+    app = make_app({**PAGES, 'second.html': 'updated'})
+    freeze(app, make_config(tmp_path, stale_pages=['second.html']))
+
+    assert app.requested == ['second.html']
+    assert read_output(tmp_path / 'output') == {
+        **EXPECTED_OUTPUT,
+        'second.html': 'updated',
+    }
+
+
+def test_stale_pages_generator(tmp_path):
+    freeze(make_app(PAGES), make_config(tmp_path))
+
+    def get_stale_pages(app):
+        assert app is new_app
+        yield 'first.html'
+
+    new_first = '<a href="second.html">updated</a>'
+    new_app = make_app({**PAGES, 'first.html': new_first})
+    config = make_config(
+        tmp_path, stale_pages=[{'generator': get_stale_pages}],
+    )
+    freeze(new_app, config)
+
+    assert new_app.requested == ['first.html']
+    assert read_output(tmp_path / 'output') == {
+        **EXPECTED_OUTPUT,
+        'first.html': new_first,
+    }
+
+
+@pytest.mark.parametrize('url', ('style.css', 'http://example.com/style.css'))
+def test_mark_stale_in_start_hook(tmp_path, url):
+    freeze(make_app(PAGES), make_config(tmp_path))
+
+    def start_hook(freeze_info):
+        freeze_info.mark_stale(url)
+
+    app = make_app(PAGES)
+    config = make_config(tmp_path)
+    config['hooks'] = {'start': [start_hook]}
+    freeze(app, config)
+
+    assert app.requested == ['style.css']
+    assert read_output(tmp_path / 'output') == EXPECTED_OUTPUT
+
+
+def test_missing_file_is_frozen_again(tmp_path):
+    freeze(make_app(PAGES), make_config(tmp_path))
+    (tmp_path / 'output' / 'image.png').unlink()
+
+    app = make_app(PAGES)
+    freeze(app, make_config(tmp_path))
+
+    assert app.requested == ['image.png']
+    assert read_output(tmp_path / 'output') == EXPECTED_OUTPUT
+
+
+def test_changed_file_is_frozen_again(tmp_path):
+    freeze(make_app(PAGES), make_config(tmp_path))
+    (tmp_path / 'output' / 'second.html').write_text('edited by hand')
+    (tmp_path / 'output' / 'image.png').write_text('')
+
+    app = make_app(PAGES)
+    freeze(app, make_config(tmp_path))
+
+    assert sorted(app.requested) == ['image.png', 'second.html']
+    assert read_output(tmp_path / 'output') == EXPECTED_OUTPUT
+
+
+def test_failed_freeze_keeps_previous_output(tmp_path):
+    freeze(make_app(PAGES), make_config(tmp_path))
+
+    broken_first = '<a href="second.html">2</a> <a href="missing.html">?</a>'
+    app = make_app({**PAGES, 'first.html': broken_first})
+    with pytest.raises(MultiError):
+        freeze(app, make_config(tmp_path, stale_pages=['first.html']))
+
+    # Only the file written in the failed freeze is removed
+    expected = dict(EXPECTED_OUTPUT)
+    del expected['first.html']
+    assert read_output(tmp_path / 'output') == expected
+
+    app = make_app(PAGES)
+    freeze(app, make_config(tmp_path))
+    assert app.requested == ['first.html']
+    assert read_output(tmp_path / 'output') == EXPECTED_OUTPUT
+
+
+def test_failed_first_freeze_is_cleaned_up(tmp_path):
+    app = make_app({**PAGES, 'second.html': '<a href="missing.html">?</a>'})
+    with pytest.raises(MultiError):
+        freeze(app, make_config(tmp_path))
+
+    assert not (tmp_path / 'output').exists()
+    assert not (tmp_path / 'manifest.json').exists()
+
+
+def test_unchanged_files_are_not_hashed(tmp_path, monkeypatch):
+    freeze(make_app(PAGES), make_config(tmp_path))
+
+    hashed = []
+    def file_sha256(path):
+        hashed.append(path.name)
+        return original_file_sha256(path)
+    original_file_sha256 = freezeyt.filesaver.file_sha256
+    monkeypatch.setattr(freezeyt.filesaver, 'file_sha256', file_sha256)
+
+    freeze(make_app(PAGES), make_config(tmp_path))
+    assert hashed == []
+
+    # A touched file is hashed, and kept if its content is the same
+    second_path = tmp_path / 'output' / 'second.html'
+    second_stat = second_path.stat()
+    os.utime(
+        second_path,
+        ns=(second_stat.st_atime_ns, second_stat.st_mtime_ns + 10**9),
+    )
+    app = make_app(PAGES)
+    freeze(app, make_config(tmp_path))
+    assert hashed == ['second.html']
+    assert app.requested == []
+
+    # The new modification time is recorded
+    hashed.clear()
+    freeze(make_app(PAGES), make_config(tmp_path))
+    assert hashed == []
+
+
+def test_changed_file_with_same_size_is_frozen_again(tmp_path):
+    freeze(make_app(PAGES), make_config(tmp_path))
+    second_path = tmp_path / 'output' / 'second.html'
+    second_path.write_text('SECOND PAGE')
+    second_stat = second_path.stat()
+    os.utime(
+        second_path,
+        ns=(second_stat.st_atime_ns, second_stat.st_mtime_ns + 10**9),
+    )
+
+    app = make_app(PAGES)
+    freeze(app, make_config(tmp_path))
+
+    assert app.requested == ['second.html']
+    assert read_output(tmp_path / 'output') == EXPECTED_OUTPUT
+
+
+def test_unlinked_pages_are_removed(tmp_path):
+    freeze(make_app(PAGES), make_config(tmp_path))
+
+    app = make_app({**PAGES, 'first.html': 'no more links'})
+    freeze(app, make_config(tmp_path, stale_pages=['first.html']))
+
+    assert app.requested == ['first.html']
+    expected = dict(EXPECTED_OUTPUT, **{'first.html': 'no more links'})
+    del expected['second.html']
+    assert read_output(tmp_path / 'output') == expected
+
+    manifest = json.loads((tmp_path / 'manifest.json').read_text())
+    assert sorted(manifest['pages']) == sorted(expected)
+
+
+def test_changed_prefix_freezes_everything(tmp_path):
+    freeze(make_app(PAGES), make_config(tmp_path))
+
+    app = make_app(PAGES)
+    config = make_config(tmp_path)
+    config['prefix'] = 'http://example.net/'
+    freeze(app, config)
+
+    assert sorted(app.requested) == sorted(PAGES)
+
+
+def test_manifest_shortcut(tmp_path):
+    config = {
+        'output': str(tmp_path / 'output'),
+        'incremental': str(tmp_path / 'manifest.json'),
+    }
+    freeze(make_app(PAGES), config)
+
+    app = make_app(PAGES)
+    freeze(app, config)
+    assert app.requested == []
+    assert read_output(tmp_path / 'output') == EXPECTED_OUTPUT
+
+
+def test_dict_output_freezes_everything(tmp_path):
+    config = {
+        'output': {'type': 'dict'},
+        'incremental': str(tmp_path / 'manifest.json'),
+    }
+    freeze(make_app(PAGES), config)
+
+    app = make_app(PAGES)
+    result = freeze(app, config)
+    assert sorted(app.requested) == sorted(PAGES)
+    assert result['second.html'] == b'second page'
+
+
+def test_missing_manifest_path(tmp_path):
+    config = {
+        'output': str(tmp_path / 'output'),
+        'incremental': {},
+    }
+    with pytest.raises(ValueError):
+        freeze(make_app(PAGES), config)
@@ -0,0 +1,161 @@
+import gzip
+import json
+
+import pytest
+
+from freezeyt import freeze
+
+
+BIG_HTML = b'<html><body>' + b'<p>Hello world!</p>' * 200 + b'</body></html>'
+BIG_JSON = json.dumps({'items': list(range(1000))}).encode()
+
+PAGES = {
+    '/': (
+        'text/html',
+        BIG_HTML.replace(
+            b'<body>',
+            b'<body><a href="small.html">small</a>'
+            + b'<a href="data.json">data</a><a href="image.png">image</a>',
+        ),
+    ),
+    '/small.html': ('text/html', b'<p>small</p>'),
+    '/data.json': ('application/json', BIG_JSON),
+    '/image.png': ('image/png', b'\x89PNG' + b'\0' * 5000),
+}
+
+
+def app(environ, start_response):
+    content_type, body = PAGES[environ['PATH_INFO']]
+    start_response('200 OK', [('Content-Type', content_type)])
+    # Send the body in several chunks
+    return [body[i:i+1000] for i in range(0, len(body), 1000)]
+
+
+def freeze_with_precompress(tmp_path, **precompress):
+    output_path = tmp_path / 'output'
+    config = {
+        'output': {
+            'type': 'dir',
+            'dir': str(output_path),
+            'precompress': precompress,
+        },
+    }
+    freeze(app, config)
+    return output_path
+
+
+def get_files(path):
+    return sorted(
+        str(p.relative_to(path)) for p in path.glob('**/*') if p.is_file()
+    )
+
+
+def test_gzip(tmp_path):
+    output_path = freeze_with_precompress(tmp_path)
+    assert get_files(output_path) == [
+        'data.json', 'data.json.gz',
+        'image.png',
+        'index.html', 'index.html.gz',
+        'small.html',
+    ]
+    for name in 'index.html', 'data.json':
+        compressed = (output_path / (name + '.gz')).read_bytes()
+        assert gzip.decompress(compressed) == (output_path / name).read_bytes()
+
+
+def test_brotli(tmp_path):
+    brotli = pytest.importorskip('brotli')
+    output_path = freeze_with_precompress(tmp_path, formats=['gzip', 'br'])
+    assert 'index.html.br' in get_files(output_path)
+    assert 'index.html.gz' in get_files(output_path)
+    compressed = (output_path / 'index.html.br').read_bytes()
+    assert brotli.decompress(compressed) == (
+        (output_path / 'index.html').read_bytes()
+    )
+
+
+def test_zstd(tmp_path):
+    zstandard = pytest.importorskip('zstandard')
+    output_path = freeze_with_precompress(tmp_path, formats=['zstd'])
+    compressed = (output_path / 'data.json.zst').read_bytes()
+    decompressed = zstandard.ZstdDecompressor().decompressobj().decompress(
+        compressed,
+    )
+    assert decompressed == BIG_JSON
+
+
+def test_min_size(tmp_path):
+    output_path = freeze_with_precompress(tmp_path, min_size=1)
+    assert 'small.html.gz' in get_files(output_path)
+    assert gzip.decompress(
+        (output_path / 'small.html.gz').read_bytes()
+    ) == b'<p>small</p>'
+
+
+def test_mime_type_list(tmp_path):
+    output_path = freeze_with_precompress(tmp_path, mime_types=['image/*'])
+    assert get_files(output_path) == [
+        'data.json',
+        'image.png', 'image.png.gz',
+        'index.html',
+        'small.html',
+    ]
+
+
+def test_mime_type_policy(tmp_path):
+    pytest.importorskip('brotli')
+    output_path = freeze_with_precompress(
+        tmp_path,
+        formats=['gzip', 'br'],
+        mime_types={'text/html': ['br'], 'application/*': ['gzip', 'br']},
+    )
+    assert get_files(output_path) == [
+        'data.json', 'data.json.br', 'data.json.gz',
+        'image.png',
+        'index.html', 'index.html.br',
+        'small.html',
+    ]
+
+
+@pytest.mark.parametrize(['levels', 'extra_flags'], (
+    # The gzip header records if the fastest or best compression was used
+    ({}, 0),
+    ({'gzip': 1}, 4),
+    ({'gzip': 9}, 2),
+))
+def test_gzip_level(tmp_path, levels, extra_flags):
+    output_path = freeze_with_precompress(tmp_path, levels=levels)
+    compressed = (output_path / 'index.html.gz').read_bytes()
+    assert compressed[8] == extra_flags
+    assert gzip.decompress(compressed) == (
+        (output_path / 'index.html').read_bytes()
+    )
+
+
+@pytest.mark.parametrize('precompress', (
+    {'formats': ['bad']},
+    {'formats': ['gzip'], 'mime_types': {'text/*': ['br']}},
+    {'formats': ['gzip'], 'levels': {'gzip': 10}},
+    {'formats': ['gzip'], 'levels': {'gzip': 'best'}},
+    {'formats': ['gzip'], 'levels': {'br': 5}},
+))
+def test_bad_config(tmp_path, precompress):
+    with pytest.raises(ValueError):
+        freeze_with_precompress(tmp_path, **precompress)
+
+
+def test_incremental_keeps_sidecars(tmp_path):
+    config = {
+        'output': {
+            'type': 'dir',
+            'dir': str(tmp_path / 'output'),
+            'precompress': {},
+        },
+        'incremental': str(tmp_path / 'manifest.json'),
+    }
+    freeze(app, config)
+    files = get_files(tmp_path / 'output')
+    assert 'index.html.gz' in files
+
+    freeze(app, config)
+    assert get_files(tmp_path / 'output') == files
@@ -0,0 +1,98 @@
+import pstats
+
+import pytest
+
+from freezeyt import freeze
+from freezeyt.profiling import AppProfiler
+
+
+def render_blog_post():
+    return b'<p>A blog post</p>'
+
+
+def render_page():
+    return b'<a href="blog/1.html">1</a> <a href="blog/2.html">2</a>'
+
+
+def app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/html')])
+    if environ['PATH_INFO'].startswith('/blog/'):
+        return [render_blog_post()]
+    return [render_page()]
+
+
+def profiled_functions(path):
+    stats = pstats.Stats(str(path))
+    return {name for filename, line, name in stats.stats}
+
+
+def test_pstats(tmp_path):
+    output = tmp_path / 'app.pstats'
+    freeze(app, {'output': {'type': 'dict'}, 'profile_app': str(output)})
+    functions = profiled_functions(output)
+    assert 'render_page' in functions
+    assert 'render_blog_post' in functions
+    # freezeyt's own code that runs between app calls isn't profiled
+    assert 'handle_one_task' not in functions
+    assert 'run_worker' not in functions
+
+
+def test_pattern(tmp_path):
+    output = tmp_path / 'app.pstats'
+    freeze(app, {
+        'output': {'type': 'dict'},
+        'profile_app': {'output': str(output), 'pattern': '/blog/*'},
+    })
+    functions = profiled_functions(output)
+    assert 'render_page' not in functions
+    assert 'render_blog_post' in functions
+
+
+@pytest.mark.parametrize('sample', (0, 1))
+def test_sample(sample):
+    profiler = AppProfiler('app.pstats', sample=sample)
+    paths = [f'/{i}.html' for i in range(100)]
+    assert sum(profiler.should_profile(p) for p in paths) == sample * 100
+
+
+def test_sample_is_deterministic():
+    profiler = AppProfiler('app.pstats', sample=0.3)
+    paths = [f'/{i}.html' for i in range(1000)]
+    selected = [p for p in paths if profiler.should_profile(p)]
+    assert 200 < len(selected) < 400
+    assert selected == [p for p in paths if profiler.should_profile(p)]
+
+
+def test_collapsed(tmp_path):
+    output = tmp_path / 'app.collapsed'
+    freeze(app, {'output': {'type': 'dict'}, 'profile_app': str(output)})
+    lines = output.read_text().splitlines()
+    assert lines
+    for line in lines:
+        stack, microseconds = line.rsplit(' ', 1)
+        assert int(microseconds) > 0
+    assert any('render_blog_post' in line for line in lines)
+    assert not any('run_worker' in line for line in lines)
+
+
+def test_profile_failed_freeze(tmp_path):
+    def broken_app(environ, start_response):
+        raise ValueError('broken')
+
+    output = tmp_path / 'app.pstats'
+    with pytest.raises(Exception):
+        freeze(broken_app, {
+            'output': {'type': 'dict'},
+            'profile_app': str(output),
+        })
+    # Results are saved even if the freeze fails
+    assert output.exists()
+
+
+@pytest.mark.parametrize('profile_app', (
+    {'output': 'x', 'format': 'bad'},
+    {'output': 'x', 'sample': 2},
+))
+def test_bad_config(profile_app):
+    with pytest.raises(ValueError):
+        freeze(app, {'output': {'type': 'dict'}, 'profile_app': profile_app})
@@ -80,3 +80,30 @@ def test_reason_link():
     assert str(e.value.url) == 'http://localhost/404.html'
     assert e.value.status[:3] == '404'
     assert e.freezeyt_task.reasons == ['linked from: index.html']
+
+
+def test_reason_link_from_many_pages():
+    app = Flask(__name__)
+
+    @app.route('/')
+    def index():
+        return ''.join(f'<a href="page{i}.html">page</a>' for i in range(3))
+
+    @app.route('/page<int:i>.html')
+    def page(i):
+        return '<a href="/">home</a> <a href="404.html">link to 404</a>'
+
+    config = {
+        'prefix': 'http://localhost/',
+        'output': {'type': 'dict'},
+        'extra_pages': ['404.html'],
+    }
+
+    with raises_multierror_with_one_exception(UnexpectedStatus) as e:
+        freeze(app, config)
+    assert e.freezeyt_task.reasons == [
+        'extra page',
+        'linked from: page0.html',
+        'linked from: page1.html',
+        'linked from: page2.html',
+    ]
@@ -1,8 +1,10 @@
 import pytest
 import os
 import shutil
+from pathlib import Path
 
-from freezeyt import freeze, DirectoryExistsError
+from freezeyt import freeze, DirectoryExistsError, MultiError
+from freezeyt import UnexpectedStatus
 from freezeyt.filesaver import FileSaver
 
 from fixtures.app_with_extra_files.app import app, freeze_config
@@ -78,6 +80,157 @@ def test_rm_output_dir_with_protected_file(tmp_path):
     freeze(app, config)
     assert not protected_file.exists()
 
+def make_old_output(builddir):
+    builddir.mkdir()
+    (builddir / 'index.html').write_text('old index')
+    (builddir / 'dir').mkdir()
+    (builddir / 'dir' / 'old.dat').write_text('1234')
+
+
+def get_siblings(builddir):
+    return sorted(p.name for p in builddir.parent.iterdir())
+
+
+@pytest.mark.parametrize('restore_on_failure', (True, False))
+def test_old_output_removed(tmp_path, restore_on_failure):
+    builddir = tmp_path / 'build'
+    make_old_output(builddir)
+    config = {
+        **freeze_config,
+        'output': {
+            'type': 'dir', 'dir': builddir,
+            'restore_on_failure': restore_on_failure,
+        },
+    }
+    freeze(app, config)
+    assert (builddir / 'index.html').read_text() != 'old index'
+    assert not (builddir / 'dir').exists()
+    # Nothing is left next to the output directory
+    assert get_siblings(builddir) == ['build']
+
+
+def failing_app(environ, start_response):
+    if environ['PATH_INFO'] == '/':
+        start_response('200 OK', [('Content-type', 'text/html')])
+        return [b'<a href="missing.html">broken link</a>']
+    start_response('404 Not Found', [('Content-type', 'text/html')])
+    return [b'not found']
+
+
+@pytest.mark.parametrize('cleanup', (True, False))
+def test_restore_on_failure(tmp_path, cleanup):
+    builddir = tmp_path / 'build'
+    make_old_output(builddir)
+    config = {
+        'output': {
+            'type': 'dir', 'dir': builddir, 'restore_on_failure': True,
+        },
+        'cleanup': cleanup,
+    }
+    with pytest.raises(MultiError):
+        freeze(failing_app, config)
+    if cleanup:
+        assert (builddir / 'index.html').read_text() == 'old index'
+        assert (builddir / 'dir' / 'old.dat').read_text() == '1234'
+    else:
+        # The incomplete output is kept for debugging
+        assert (builddir / 'index.html').read_text() != 'old index'
+        assert not (builddir / 'dir').exists()
+    assert get_siblings(builddir) == ['build']
+
+
+@pytest.mark.parametrize('cleanup', (True, False))
+def test_restore_on_failure_fail_fast(tmp_path, cleanup):
+    builddir = tmp_path / 'build'
+    make_old_output(builddir)
+    config = {
+        'output': {
+            'type': 'dir', 'dir': builddir, 'restore_on_failure': True,
+        },
+        'fail_fast': True,
+        'cleanup': cleanup,
+    }
+    with pytest.raises(UnexpectedStatus):
+        freeze(failing_app, config)
+    if cleanup:
+        assert (builddir / 'index.html').read_text() == 'old index'
+        assert (builddir / 'dir' / 'old.dat').read_text() == '1234'
+    else:
+        assert not (builddir / 'dir').exists()
+    assert get_siblings(builddir) == ['build']
+
+
+def test_restore_on_failure_in_hook(tmp_path):
+    builddir = tmp_path / 'build'
+    make_old_output(builddir)
+
+    def start_hook(freeze_info):
+        raise KeyError('failing hook')
+
+    config = {
+        'output': {
+            'type': 'dir', 'dir': builddir, 'restore_on_failure': True,
+        },
+        'hooks': {'start': [start_hook]},
+    }
+    with pytest.raises(KeyError):
+        freeze(failing_app, config)
+    assert (builddir / 'index.html').read_text() == 'old index'
+    assert (builddir / 'dir' / 'old.dat').read_text() == '1234'
+    assert get_siblings(builddir) == ['build']
+
+
+def test_fail_fast_removes_incomplete_output(tmp_path):
+    builddir = tmp_path / 'build'
+    make_old_output(builddir)
+    config = {
+        'output': {'type': 'dir', 'dir': builddir},
+        'fail_fast': True,
+    }
+    with pytest.raises(UnexpectedStatus):
+        freeze(failing_app, config)
+    assert get_siblings(builddir) == []
+
+
+def test_no_restore_by_default(tmp_path):
+    builddir = tmp_path / 'build'
+    make_old_output(builddir)
+    config = {'output': {'type': 'dir', 'dir': builddir}}
+    with pytest.raises(MultiError):
+        freeze(failing_app, config)
+    assert get_siblings(builddir) == []
+
+
+def test_leftover_old_output_removed(tmp_path):
+    """Old output left by an interrupted freeze is removed"""
+    builddir = tmp_path / 'build'
+    leftover = tmp_path / '.build.freezeyt-old-123456'
+    make_old_output(leftover)
+    config = {
+        **freeze_config,
+        'output': {'type': 'dir', 'dir': builddir},
+    }
+    freeze(app, config)
+    assert get_siblings(builddir) == ['build']
+
+
+def test_output_dir_cannot_be_renamed(tmp_path, monkeypatch):
+    builddir = tmp_path / 'build'
+    make_old_output(builddir)
+
+    def fail_rename(self, target):
+        raise PermissionError('cannot rename')
+
+    monkeypatch.setattr(Path, 'rename', fail_rename)
+    config = {
+        **freeze_config,
+        'output': {'type': 'dir', 'dir': builddir},
+    }
+    freeze(app, config)
+    assert not (builddir / 'dir').exists()
+    assert get_siblings(builddir) == ['build']
+
+
 if os.name == "nt": # this test will run only on Windows systems
     def test_add_write_flag_on_windows(tmp_path):
         """We are testing that we need to use the add_write_flag method (as an onerror
@@ -0,0 +1,223 @@
+import asyncio
+import sqlite3
+import threading
+from pathlib import PurePosixPath
+
+import pytest
+from click.testing import CliRunner
+from werkzeug.test import Client
+
+from freezeyt import freeze
+from freezeyt.sqlitesaver import SQLiteSaver, iter_files, make_wsgi_app
+from freezeyt.sqlitesaver import main
+from freezeyt.urls import PrefixURL
+from testutil import context_for_test
+
+
+def read_database(path):
+    """Read a database into a dict like DictSaver's output"""
+    result = {}
+    for path, content in iter_files(path):
+        *dirs, filename = path.parts
+        directory = result
+        for part in dirs:
+            directory = directory.setdefault(part, {})
+        directory[filename] = content
+    return result
+
+
+@pytest.mark.parametrize('batch_size', (1, 2, 1000))
+def test_sqlite_output(tmp_path, batch_size):
+    output_path = tmp_path / 'site.sqlite'
+    with context_for_test('app_2pages') as module:
+        config = {
+            'output': {
+                'type': 'sqlite', 'file': str(output_path),
+                'batch_size': batch_size,
+            },
+        }
+        freeze(module.app, config)
+        assert read_database(output_path) == module.expected_dict
+    # The temporary files are gone
+    assert [p.name for p in tmp_path.iterdir()] == ['site.sqlite']
+
+    connection = sqlite3.connect(output_path)
+    content_type, = connection.execute(
+        "SELECT content_type FROM files WHERE path = 'index.html'"
+    ).fetchone()
+    assert content_type == 'text/html'
+    metadata = dict(connection.execute('SELECT key, value FROM metadata'))
+    assert metadata['prefix'] == 'http://localhost:8000/'
+    connection.close()
+
+
+@pytest.mark.parametrize('batch_size', (1, 1000))
+def test_sqlite_redirect_policy_follow(tmp_path, batch_size):
+    output_path = tmp_path / 'site.sqlite'
+    with context_for_test('app_redirects') as module:
+        config = {
+            **module.freeze_config,
+            'output': {
+                'type': 'sqlite', 'file': str(output_path),
+                'batch_size': batch_size,
+            },
+            'status_handlers': {'3xx': 'follow'},
+        }
+        freeze(module.app, config)
+        assert read_database(output_path) == module.expected_dict_follow
+
+
+@pytest.mark.parametrize('batch_size', (1, 1000))
+def test_open_filename(tmp_path, batch_size):
+    async def main():
+        saver = SQLiteSaver(
+            tmp_path / 'site.sqlite', PrefixURL('http://localhost/'),
+            lambda name: 'text/html', batch_size=batch_size,
+        )
+        await saver.prepare()
+        await saver.save_to_filename(PurePosixPath('a/b.html'), [b'a', b'b'])
+        await saver.save_to_filename(PurePosixPath('c.html'), [b'c'])
+        await saver.copy_filename(
+            PurePosixPath('a/b.html'), PurePosixPath('d.html'),
+        )
+        for name, expected in (
+            ('a/b.html', b'ab'), ('c.html', b'c'), ('d.html', b'ab'),
+        ):
+            with await saver.open_filename(PurePosixPath(name)) as f:
+                assert f.read() == expected
+        with pytest.raises(FileNotFoundError):
+            await saver.open_filename(PurePosixPath('missing.html'))
+        await saver.finish(success=True, cleanup=True)
+
+    asyncio.run(main())
+
+
+def test_failed_freeze_removes_database(tmp_path):
+    output_path = tmp_path / 'site.sqlite'
+    with context_for_test('app_broken_link') as module:
+        config = {'output': {'type': 'sqlite', 'file': str(output_path)}}
+        with pytest.raises(Exception):
+            freeze(module.app, config)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_failed_freeze_without_cleanup(tmp_path):
+    output_path = tmp_path / 'site.sqlite'
+    with context_for_test('app_broken_link') as module:
+        config = {
+            'output': {'type': 'sqlite', 'file': str(output_path)},
+            'cleanup': False,
+        }
+        with pytest.raises(Exception):
+            freeze(module.app, config)
+    assert read_database(output_path)['index.html']
+
+
+def test_writer_shut_down_after_error(tmp_path, monkeypatch):
+    async def failing_finish(self, success, cleanup):
+        raise ZeroDivisionError()
+
+    monkeypatch.setattr(SQLiteSaver, 'finish', failing_finish)
+    output_path = tmp_path / 'site.sqlite'
+    with context_for_test('app_2pages') as module:
+        config = {'output': {'type': 'sqlite', 'file': str(output_path)}}
+        with pytest.raises(ZeroDivisionError):
+            freeze(module.app, config)
+    assert not [
+        t for t in threading.enumerate() if t.name.startswith('freezeyt-sqlite')
+    ]
+
+
+def app_with_dir(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/html')])
+    if environ['PATH_INFO'] == '/':
+        return [b'<a href="dir/">dir</a>']
+    return [b'in dir']
+
+
+def test_serve(tmp_path):
+    output_path = tmp_path / 'site.sqlite'
+    freeze(app_with_dir, {
+        'output': {'type': 'sqlite', 'file': str(output_path)},
+    })
+
+    client = Client(make_wsgi_app(output_path))
+    response = client.get('/')
+    assert response.status_code == 200
+    assert response.headers['Content-Type'] == 'text/html'
+    assert response.data == b'<a href="dir/">dir</a>'
+    response = client.get('/dir')
+    assert response.status_code == 301
+    assert response.headers['Location'].endswith('/dir/')
+    response = client.get('/dir/')
+    assert response.data == b'in dir'
+    assert client.get('/missing.html').status_code == 404
+
+
+def app_with_unicode(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/html')])
+    path = environ['PATH_INFO'].encode('latin-1').decode('utf-8')
+    if path == '/':
+        return [b'<a href="%C4%8Dau.html">page</a><a href="%C5%BElut%C3%BD/">dir</a>']
+    return [path.encode('utf-8')]
+
+
+def test_serve_unicode_paths(tmp_path):
+    output_path = tmp_path / 'site.sqlite'
+    freeze(app_with_unicode, {
+        'output': {'type': 'sqlite', 'file': str(output_path)},
+    })
+    assert read_database(output_path)['žlutý']['index.html']
+
+    client = Client(make_wsgi_app(output_path))
+    response = client.get('/%C4%8Dau.html')
+    assert response.status_code == 200
+    assert response.data == '/čau.html'.encode('utf-8')
+    response = client.get('/%C5%BElut%C3%BD/')
+    assert response.status_code == 200
+    response = client.get('/%C5%BElut%C3%BD')
+    assert response.status_code == 301
+    assert response.headers['Location'] == '/%C5%BElut%C3%BD/'
+    # Not valid UTF-8
+    assert client.get('/%C4.html').status_code == 404
+
+
+def test_serve_with_script_name(tmp_path):
+    output_path = tmp_path / 'site.sqlite'
+    freeze(app_with_dir, {
+        'output': {'type': 'sqlite', 'file': str(output_path)},
+    })
+
+    client = Client(make_wsgi_app(output_path))
+    response = client.get('/dir', base_url='http://localhost/site/')
+    assert response.status_code == 301
+    assert response.headers['Location'] == '/site/dir/'
+    response = client.get('/dir/', base_url='http://localhost/site/')
+    assert response.data == b'in dir'
+
+
+def test_export(tmp_path):
+    output_path = tmp_path / 'site.sqlite'
+    freeze(app_with_dir, {
+        'output': {'type': 'sqlite', 'file': str(output_path)},
+    })
+
+    result = CliRunner().invoke(
+        main, ['export', str(output_path), str(tmp_path / 'build')],
+    )
+    assert result.exit_code == 0, result.output
+    assert 'Exported 2 files' in result.output
+    assert (tmp_path / 'build/index.html').read_bytes() == (
+        b'<a href="dir/">dir</a>'
+    )
+    assert (tmp_path / 'build/dir/index.html').read_bytes() == b'in dir'
+
+
+def test_bad_config():
+    with context_for_test('app_2pages') as module:
+        with pytest.raises(ValueError):
+            freeze(module.app, {'output': {'type': 'sqlite'}})
+        with pytest.raises(ValueError):
+            freeze(module.app, {'output': {
+                'type': 'sqlite', 'file': 'x.sqlite', 'batch_size': 0,
+            }})
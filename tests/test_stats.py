@@ -0,0 +1,80 @@
+import json
+import time
+
+from freezeyt import freeze
+from freezeyt.stats import FreezeStats, PHASES
+from testutil import context_for_test
+
+
+def slow_app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/html')])
+    if environ['PATH_INFO'] == '/slow.html':
+        time.sleep(0.05)
+    return [b'<a href="slow.html">slow</a> <a href="fast.html">fast</a>']
+
+
+def test_task_info_timings():
+    timings = {}
+
+    def page_frozen(task_info):
+        timings[task_info.path] = task_info.timings
+
+    freeze(slow_app, {
+        'output': {'type': 'dict'},
+        'hooks': {'page_frozen': [page_frozen]},
+    })
+    assert set(timings) == {'index.html', 'slow.html', 'fast.html'}
+    for page_timings in timings.values():
+        # 'hooks' and 'total' are not known yet when the hook is called
+        assert set(page_timings) == {'queue', 'app', 'body', 'save', 'links'}
+        assert all(value >= 0 for value in page_timings.values())
+    assert timings['slow.html']['app'] >= 0.05
+
+
+def test_freeze_stats():
+    stats = FreezeStats(slowest=2)
+    freeze(slow_app, {'output': {'type': 'dict'}, 'plugins': [stats]})
+
+    result = stats.as_dict()
+    assert result['page_count'] == 3
+    assert result['failed_count'] == 0
+    assert set(result['phase_totals']) == set(PHASES)
+    assert result['phase_totals']['total'] >= 0.05
+    # (The fast page is handled at the same time as the slow one, so it
+    # may be slow too)
+    assert {page['path'] for page in result['slowest']} == {
+        'slow.html', 'fast.html',
+    }
+    assert sum(
+        interval['pages_per_second'] for interval in result['throughput']
+    ) == 3
+    for page in result['pages']:
+        assert set(page['timings']) == set(PHASES)
+    # The result can be saved as JSON
+    json.dumps(result)
+
+    report = stats.format_report()
+    assert 'Frozen 3 pages' in report
+    assert 'slow.html' in report
+
+
+def test_freeze_stats_failed_page():
+    stats = FreezeStats()
+    with context_for_test('app_broken_link') as module:
+        try:
+            freeze(module.app, {'output': {'type': 'dict'}, 'plugins': [stats]})
+        except Exception:
+            pass
+    result = stats.as_dict()
+    assert result['failed_count'] == 1
+    failed, = [page for page in result['pages'] if page['failed']]
+    assert 'total' in failed['timings']
+
+
+def test_stats_plugin(capsys):
+    freeze(slow_app, {
+        'output': {'type': 'dict'},
+        'plugins': ['freezeyt.plugins:StatsPlugin'],
+    })
+    captured = capsys.readouterr()
+    assert 'Frozen 3 pages' in captured.err
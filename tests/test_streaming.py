@@ -0,0 +1,116 @@
+import asyncio
+from pathlib import Path, PurePosixPath
+
+import pytest
+
+from freezeyt import freeze
+from freezeyt.filesaver import FileSaver
+from freezeyt.saver import ContentStream
+from freezeyt.urls import PrefixURL
+
+
+def test_content_stream():
+    async def produce(stream):
+        for i in range(20):
+            await stream.put(b'%d,' % i)
+        stream.close()
+
+    async def main():
+        stream = ContentStream(max_chunks=3)
+        producer = asyncio.create_task(produce(stream))
+        chunks = []
+        async for chunk in stream:
+            # The producer may not get ahead of the consumer by more
+            # than max_chunks
+            assert len(stream._chunks) <= 3
+            chunks.append(chunk)
+            await asyncio.sleep(0)
+        await producer
+        return chunks
+
+    chunks = asyncio.run(main())
+    assert b''.join(chunks) == b''.join(b'%d,' % i for i in range(20))
+
+
+def test_content_stream_fail():
+    async def main():
+        stream = ContentStream()
+        await stream.put(b'a')
+        stream.fail(ZeroDivisionError())
+        with pytest.raises(ZeroDivisionError):
+            async for chunk in stream:
+                pass
+
+    asyncio.run(main())
+
+
+def test_content_stream_abandon():
+    async def main():
+        stream = ContentStream(max_chunks=1)
+        await stream.put(b'a')
+        put_task = asyncio.create_task(stream.put(b'b'))
+        await asyncio.sleep(0)
+        assert not put_task.done()  # waiting for space
+        stream.abandon()
+        await put_task  # does not block any more
+        await stream.put(b'c')
+
+    asyncio.run(main())
+
+
+async def failing_content():
+    yield b'partial'
+    raise ZeroDivisionError()
+
+
+def test_filesaver_does_not_save_incomplete_file(tmp_path):
+    async def main():
+        saver = FileSaver(tmp_path, PrefixURL('http://example.com/'))
+        await saver.save_to_filename(PurePosixPath('a/page.html'), [b'old'])
+        with pytest.raises(ZeroDivisionError):
+            await saver.save_to_filename(
+                PurePosixPath('a/page.html'), failing_content(),
+            )
+
+    asyncio.run(main())
+    assert [p.name for p in (tmp_path / 'a').iterdir()] == ['page.html']
+    assert (tmp_path / 'a/page.html').read_bytes() == b'old'
+
+
+def test_large_page_in_chunks(tmp_path):
+    chunks = [bytes([i % 256]) * 1000 for i in range(500)]
+
+    def app(environ, start_response):
+        if environ['PATH_INFO'] == '/':
+            start_response('200 OK', [('Content-type', 'text/html')])
+            return [b'<a href="big.pdf">download</a>']
+        start_response('200 OK', [('Content-type', 'application/pdf')])
+        return iter(chunks)
+
+    freeze(app, {'output': str(tmp_path)})
+    assert (tmp_path / 'big.pdf').read_bytes() == b''.join(chunks)
+
+
+@pytest.mark.parametrize('output', ('dir', 'dict'))
+def test_app_failing_in_body(tmp_path, output):
+    def app(environ, start_response):
+        start_response('200 OK', [('Content-type', 'text/html')])
+        return failing_body()
+
+    def failing_body():
+        yield b'partial content'
+        raise ZeroDivisionError()
+
+    if output == 'dir':
+        output_config = {'type': 'dir', 'dir': tmp_path / 'output'}
+    else:
+        output_config = {'type': 'dict'}
+    with pytest.raises(ZeroDivisionError):
+        freeze(app, {
+            'output': output_config,
+            'fail_fast': True,
+            'cleanup': False,
+        })
+    if output == 'dir':
+        output_path = Path(tmp_path / 'output')
+        assert not output_path.exists() or not any(output_path.iterdir())
@@ -0,0 +1,86 @@
+import pytest
+
+from freezeyt import freeze
+from freezeyt.util import LRUCache
+
+
+NAV = (
+    b'<a href="/">home</a> <a href="/about.html">about</a>'
+    + b'<a href="http://localhost:8000/contact.html">contact</a>'
+    + b'<a href="https://example.com/">external</a>'
+    + b'<a href="../up.html">relative</a>'
+)
+
+
+def app(environ, start_response):
+    path = environ['PATH_INFO']
+    start_response('200 OK', [('Content-Type', 'text/html')])
+    body = NAV
+    if path == '/':
+        body += b''.join(
+            b'<a href="section%d/">section</a>' % i for i in range(10)
+        )
+    elif path.startswith('/section'):
+        body += b'<a href="page.html">page</a>'
+    return [body]
+
+
+def freeze_and_get_caches(config):
+    cache_info = {}
+
+    def get_cache_info(freeze_info):
+        cache_info.update(freeze_info.cache_info())
+
+    result = freeze(app, {
+        'output': {'type': 'dict'},
+        'hooks': {'success': [get_cache_info]},
+        **config,
+    })
+    return result, cache_info
+
+
+def test_cached_result_is_the_same():
+    result, cache_info = freeze_and_get_caches({})
+    uncached_result, uncached_info = freeze_and_get_caches({
+        'url_cache_size': 0,
+    })
+    assert result == uncached_result
+    # Relative links are resolved against each page
+    assert set(result['section3']) == {'index.html', 'page.html'}
+    assert 'up.html' in result
+
+    assert cache_info['url_join'].hits > 50
+    assert cache_info['url_to_path'].hits > 50
+    assert uncached_info['url_join'].hits == 0
+    assert uncached_info['url_join'].currsize == 0
+
+
+def test_cache_size_limit():
+    result, cache_info = freeze_and_get_caches({'url_cache_size': 3})
+    assert cache_info['url_join'].currsize == 3
+    assert cache_info['url_join'].maxsize == 3
+    assert cache_info['url_join'].misses > 3
+
+
+def test_lru_cache():
+    cache = LRUCache(2)
+    assert cache.get('a', lambda: 1) == 1
+    assert cache.get('b', lambda: 2) == 2
+    assert cache.get('a', lambda: 'not called') == 1
+    # 'b' is the least recently used
+    assert cache.get('c', lambda: 3) == 3
+    assert cache.get('a', lambda: 'not called') == 1
+    assert cache.get('b', lambda: 'new') == 'new'
+    assert cache.info() == (2, 4, 2, 2)
+
+
+def test_lru_cache_exception():
+    cache = LRUCache(2)
+
+    def fail():
+        raise ValueError()
+
+    with pytest.raises(ValueError):
+        cache.get('a', fail)
+    assert cache.get('a', lambda: 1) == 1
+    assert cache.info().misses == 2
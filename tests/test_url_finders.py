@@ -5,6 +5,7 @@ import pytest
 from flask import Flask
 
 from freezeyt import freeze
+from freezeyt.dictsaver import DictSaver
 from freezeyt.freezer import parse_handlers as parse_url_finders
 from freezeyt.url_finders import get_html_links
 from freezeyt.url_finders import get_css_links
@@ -421,3 +422,106 @@ def test_link_header_disabled(link):
         'index.html': b'<a href="second.html">...</a>',
         'second.html': b'second',
     }
+
+
+def test_finder_does_not_read_saved_file(monkeypatch):
+    """URL finders get the page body without the saver reading it back"""
+
+    async def fail_open(self, filename):
+        raise AssertionError('saved file should not be read')
+
+    monkeypatch.setattr(DictSaver, 'open_filename', fail_open)
+
+    with context_for_test('app_2pages') as module:
+        config = {'output': {'type': 'dict'}}
+        result = freeze(module.app, config)
+        assert result == module.expected_dict
+
+
+class StreamingFinder:
+    """A URL finder that finds words starting with "/" as they arrive"""
+    def __init__(self):
+        self.chunks = []
+
+    def __call__(self, page_content, base_url, headers=None):
+        raise AssertionError('the streaming interface should be used')
+
+    def stream(self, base_url, headers):
+        return StreamingParser(self.chunks)
+
+
+class StreamingParser:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.buffer = b''
+
+    def feed(self, data):
+        self.chunks.append(data)
+        self.buffer += data
+        *words, self.buffer = self.buffer.split(b' ')
+        return [w.decode() for w in words if w.startswith(b'/')]
+
+    def close(self):
+        words = self.buffer.split(b' ')
+        return [w.decode() for w in words if w.startswith(b'/')]
+
+
+def test_streaming_finder():
+    finder = StreamingFinder()
+    pages = {
+        '/': [b'see /pa', b'ge1.html and /page2.html'],
+        '/page1.html': [b'nothing here'],
+        '/page2.html': [b'back to /'],
+    }
+
+    def app(environ, start_response):
+        start_response('200 OK', [('Content-type', 'text/html')])
+        return pages[environ['PATH_INFO']]
+
+    config = {
+        'output': {'type': 'dict'},
+        'url_finders': {'text/html': finder},
+    }
+    result = freeze(app, config)
+    assert result == {
+        'index.html': b'see /page1.html and /page2.html',
+        'page1.html': b'nothing here',
+        'page2.html': b'back to /',
+    }
+    # The finder got each chunk separately
+    assert sorted(finder.chunks) == sorted(
+        chunk for body in pages.values() for chunk in body
+    )
+
+
+def test_streaming_finder_incomplete_page():
+    finder = StreamingFinder()
+    requested = []
+
+    def app(environ, start_response):
+        requested.append(environ['PATH_INFO'])
+        start_response('200 OK', [('Content-type', 'text/html')])
+        return body()
+
+    def body():
+        yield b'see /page1.html and '
+        raise ValueError('page not finished')
+
+    config = {
+        'output': {'type': 'dict'},
+        'url_finders': {'text/html': finder},
+    }
+    with raises_multierror_with_one_exception(ValueError):
+        freeze(app, config)
+    # Links from the incomplete page were not followed
+    assert requested == ['/']
+
+
+def test_get_html_links_fast():
+    with context_for_test('app_2pages') as module:
+        config = {
+            'output': {'type': 'dict'},
+            'url_finders': {'text/html': 'get_html_links_fast'},
+        }
+        result = freeze(module.app, config)
+        assert result == module.expected_dict
@@ -0,0 +1,158 @@
+import threading
+
+import pytest
+
+from freezeyt import freeze, UnexpectedStatus
+from freezeyt.wsgi_pool import call_wsgi_app
+from testutil import context_for_test, raises_multierror_with_one_exception
+
+
+def test_process_pool():
+    with context_for_test('app_2pages') as module:
+        config = {
+            'app': 'fixtures.app_2pages.app',
+            'output': {'type': 'dict'},
+            'wsgi_pool': {'type': 'process', 'workers': 2},
+        }
+        result = freeze(None, config)
+        assert result == module.expected_dict
+
+
+def test_process_pool_app_in_pool_config():
+    with context_for_test('app_2pages') as module:
+        config = {
+            'output': {'type': 'dict'},
+            'wsgi_pool': {'app': 'fixtures.app_2pages.app:app'},
+        }
+        result = freeze(module.app, config)
+        assert result == module.expected_dict
+
+
+def test_process_pool_error():
+    config = {
+        'app': 'fixtures.app_broken_link.app',
+        'output': {'type': 'dict'},
+        'wsgi_pool': {'type': 'process', 'workers': 1},
+    }
+    with raises_multierror_with_one_exception(UnexpectedStatus):
+        freeze(None, config)
+
+
+def test_process_pool_needs_app_name():
+    with context_for_test('app_2pages') as module:
+        config = {
+            'output': {'type': 'dict'},
+            'wsgi_pool': {'type': 'process'},
+        }
+        with pytest.raises(ValueError):
+            freeze(module.app, config)
+
+
+def test_unknown_pool_type():
+    config = {
+        'app': 'fixtures.app_2pages.app',
+        'output': {'type': 'dict'},
+        'wsgi_pool': {'type': 'bad'},
+    }
+    with pytest.raises(ValueError):
+        freeze(None, config)
+
+
+def test_pool_with_asgi_app():
+    async def app(scope, receive, send):
+        raise AssertionError('should not be called')
+
+    config = {
+        'output': {'type': 'dict'},
+        'app_interface': 'asgi',
+        'wsgi_pool': {'type': 'process'},
+    }
+    with pytest.raises(ValueError):
+        freeze(app, config)
+
+
+def test_call_wsgi_app():
+    def app(environ, start_response):
+        write = start_response('200 OK', [('Content-Type', 'text/plain')])
+        write(b'written ')
+        return [b'returned', b' body']
+
+    status, headers, body = call_wsgi_app(app, {})
+    assert status == 200
+    assert headers == [(b'Content-Type', b'text/plain')]
+    assert body == b'written returned body'
+
+
+def test_call_wsgi_app_without_start_response():
+    closed = False
+
+    class Result:
+        def __iter__(self):
+            return iter([b'body'])
+        def close(self):
+            nonlocal closed
+            closed = True
+
+    def app(environ, start_response):
+        return Result()
+
+    with pytest.raises(AssertionError):
+        call_wsgi_app(app, {})
+    assert closed
+
+
+def test_thread_pool():
+    with context_for_test('app_2pages') as module:
+        config = {
+            'output': {'type': 'dict'},
+            'wsgi_pool': {'type': 'thread'},
+        }
+        result = freeze(module.app, config)
+        assert result == module.expected_dict
+
+
+def test_thread_pool_runs_pages_concurrently():
+    # Each page waits until all pages are being handled at the same time.
+    # This would time out if the pages were handled one by one.
+    pages = ['index.html', 'a.html', 'b.html']
+    barrier = threading.Barrier(len(pages), timeout=10)
+    seen_environ = []
+
+    def app(environ, start_response):
+        seen_environ.append(environ)
+        start_response('200 OK', [('Content-Type', 'text/html')])
+        yield b'waiting...'
+        barrier.wait()
+        yield b'done'
+
+    config = {
+        'output': {'type': 'dict'},
+        'extra_pages': pages[1:],
+        'wsgi_pool': {'type': 'thread', 'workers': len(pages)},
+    }
+    result = freeze(app, config)
+    assert result == {page: b'waiting...done' for page in pages}
+    assert all(environ['wsgi.multithread'] for environ in seen_environ)
+
+
+def test_thread_pool_closes_result():
+    closed = []
+
+    class Result:
+        def __iter__(self):
+            return iter([b'body'])
+        def close(self):
+            closed.append(threading.current_thread())
+
+    def app(environ, start_response):
+        start_response('200 OK', [('Content-Type', 'text/html')])
+        return Result()
+
+    config = {
+        'output': {'type': 'dict'},
+        'wsgi_pool': {'type': 'thread', 'workers': 1},
+    }
+    result = freeze(app, config)
+    assert result == {'index.html': b'body'}
+    assert len(closed) == 1
+    assert closed[0] is not threading.current_thread()